@@ -1,6 +1,7 @@
 import asyncio
 import os
 import sys
+import time
 from pathlib import Path
 from rich.console import Console
 from rich.panel import Panel
@@ -16,6 +17,9 @@ from src.monitor import WorldMonitor
 from src.config import SimulationConfig
 from src.simulations import SIMULATIONS
 
+# Event history on disk, so a resumed run's agents can re-index their older turns
+EVENT_LOG_DIR = os.path.join(".worldmorph", "events")
+
 async def main():
     console = Console()
     
@@ -40,27 +44,42 @@ async def main():
             border_style="cyan"
         ))
     
-    # Get simulation choice
-    choice = Prompt.ask(
-        "\nChoose simulation type",
-        choices=["organization", "economic", "urban", "custom"],
-        default="organization"
-    )
-    
-    # Get world description
-    if choice == "custom":
-        world_prompt = Prompt.ask("\nEnter your world description")
+    # Offer to pick up a previous run
+    controller = SimulationController(event_log_dir=EVENT_LOG_DIR)
+    if controller.has_checkpoint("world_1") and Prompt.ask(
+        "\nResume the saved simulation?", choices=["y", "n"], default="y"
+    ) == "y":
+        world = await controller.restore("world_1", checkpoint_every=1)
     else:
-        world_prompt = SIMULATIONS[choice]["content"]
-    
-    # Create simulation config
-    console.print("\n[bold cyan]Initializing Simulation...[/bold cyan]")
-    config = await SimulationConfig.from_prompt(world_prompt)
-    
-    # Create and run simulation
-    controller = SimulationController()
-    world = await controller.create_world("world_1", config=config)
+        world = None
+
+    if world is None:
+        # A new run starts its own history; the previous one is kept under another name
+        previous_events = os.path.join(EVENT_LOG_DIR, "world_1")
+        if os.path.isdir(previous_events):
+            os.rename(previous_events, f"{previous_events}-{int(time.time())}")
+
+        # Get simulation choice
+        choice = Prompt.ask(
+            "\nChoose simulation type",
+            choices=["organization", "economic", "urban", "custom"],
+            default="organization"
+        )
+        
+        # Get world description
+        if choice == "custom":
+            world_prompt = Prompt.ask("\nEnter your world description")
+        else:
+            world_prompt = SIMULATIONS[choice]["content"]
+        
+        # Create simulation config
+        console.print("\n[bold cyan]Initializing Simulation...[/bold cyan]")
+        config = await SimulationConfig.from_prompt(world_prompt)
+        
+        # Create and run simulation, saving progress after every tick
+        world = await controller.create_world("world_1", config=config, checkpoint_every=1)
     monitor = WorldMonitor("world_1", world.state)
+    world.stream_listeners.append(monitor.handle_stream)
     
     console.print("\n[bold green]Starting Simulation![/bold green]")
     console.print("[dim]Press Ctrl+C to stop[/dim]\n")
@@ -71,14 +90,16 @@ async def main():
             monitor.start(),
             controller.run_all()
         )
-    except KeyboardInterrupt:
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        # Python 3.11+ delivers Ctrl+C to this task as a cancellation
         console.print("\n[yellow]Stopping simulation...[/yellow]")
-        await controller.stop_all()
     except Exception as e:
         console.print(f"\n[red]Error: {str(e)}[/red]")
         console.print("[dim]Full error:[/dim]")
         import traceback
         console.print(traceback.format_exc())
+    finally:
+        await controller.checkpoint("world_1")
         await controller.stop_all()
 
 if __name__ == "__main__":
@@ -38,6 +38,7 @@ async def main():
     
     # Create monitor for the world
     monitor = WorldMonitor("monitored_world", world.state)
+    world.stream_listeners.append(monitor.handle_stream)
     
     try:
         print("Starting monitored simulation...")
@@ -19,6 +19,7 @@ async def main():
     
     # Create monitor to watch the interactions
     monitor = WorldMonitor("interactive_world", world.state)
+    world.stream_listeners.append(monitor.handle_stream)
     
     try:
         print("Starting multi-agent simulation...")
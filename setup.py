@@ -6,6 +6,7 @@ setup(
     packages=find_packages(),
     install_requires=[
         "anthropic",
+        "httpx",
         "python-dotenv",
         "rich",
         "asyncio",
@@ -0,0 +1,112 @@
+import json
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, List
+
+from .llm.jsonparse import JsonRepairError, parse_json
+
+MAX_STATE_CHANGES = 5  # Shared state keys one action may write
+# Bookkeeping that actions must not overwrite; agent_<id> records are protected as well
+PROTECTED_KEYS = frozenset({
+    "agents", "world_state", "world_description", "world_analysis", "active_agents", "simulation_status"
+})
+
+# What an agent may do in one turn, as the arguments of the take_action tool
+ACTION_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "required": ["verb", "message", "thought"],
+    "properties": {
+        "verb": {"type": "string", "description": "One word for what you do, e.g. talk, work, meet, rest"},
+        "message": {"type": "string", "description": "What you do or say, in the first person"},
+        "thought": {"type": "string", "description": "What you think but keep to yourself"},
+        "targets": {
+            "type": "array",
+            "items": {"type": "string"},
+            "description": "Names of the people your action is directed at; they will be notified"
+        },
+        "state": {
+            "type": "object",
+            "description": "Shared world facts your action changes, as key: new value"
+        }
+    }
+}
+
+ACTION_TOOL: Dict[str, Any] = {
+    "name": "take_action",
+    "description": "Take your next action in the simulation.",
+    "input_schema": ACTION_SCHEMA
+}
+
+def batch_tool(agent_ids: List[str]) -> Dict[str, Any]:
+    """A tool taking one action per agent, as a list of actions tagged with their agent_id.
+
+    Agent names are values, never property keys: providers restrict keys
+    to a few characters, and configured names contain spaces.
+    """
+    item = {
+        **ACTION_SCHEMA,
+        "required": ["agent_id", *ACTION_SCHEMA["required"]],
+        "properties": {
+            "agent_id": {"type": "string", "enum": list(agent_ids), "description": "Whose action this is"},
+            **ACTION_SCHEMA["properties"]
+        }
+    }
+    return {
+        "name": "take_actions",
+        "description": "Take the next action for each agent, one entry per agent_id.",
+        "input_schema": {
+            "type": "object",
+            "required": ["actions"],
+            "properties": {"actions": {"type": "array", "items": item, "minItems": len(agent_ids)}}
+        }
+    }
+
+def check_action(arguments: Dict[str, Any]) -> None:
+    """Reject action arguments with a required field missing or empty, as a truncated answer has"""
+    missing = []
+    for key in ACTION_SCHEMA["required"]:
+        value = arguments.get(key)
+        if key == "message" and not value:
+            value = arguments.get("action")  # Older free-form answers
+        if not isinstance(value, str) or not value.strip():
+            missing.append(key)
+    if missing:
+        raise ValueError(f"Incomplete action: no {', '.join(missing)}")
+
+@dataclass
+class AgentAction:
+    """One turn of an agent: what it does, to whom, and which shared state it changes"""
+    verb: str
+    message: str = ""
+    thought: str = ""
+    targets: List[str] = field(default_factory=list)
+    state: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "AgentAction":
+        """Coerce tool arguments, or a free-form JSON answer, into an action"""
+        message = data.get("message") or data.get("action") or ""
+        targets = data.get("targets") or []
+        if isinstance(targets, str):
+            targets = [targets]
+        state = data.get("state")
+        return cls(
+            verb=str(data.get("verb") or "act").strip().lower(),
+            message=message if isinstance(message, str) else json.dumps(message),
+            thought=str(data.get("thought") or ""),
+            targets=[str(target) for target in targets if target],
+            state=state if isinstance(state, dict) else {}
+        )
+
+    @classmethod
+    def from_content(cls, content: str) -> "AgentAction":
+        """The action recorded in an action's content; plain text becomes the message"""
+        try:
+            parsed, _ = parse_json(content)
+        except JsonRepairError:
+            parsed = None
+        if isinstance(parsed, dict):
+            return cls.from_dict(parsed)
+        return cls(verb="act", message=str(content))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
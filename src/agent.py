@@ -1,19 +1,59 @@
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from collections import OrderedDict
+import json
+from dataclasses import dataclass, field
 import asyncio
 import time
 from rich.console import Console
 
-from .state.interface import WorldState, Event
-from .llm import get_claude_response
+from .state.interface import WorldState, Event, EventType
+from .state.codec import encode_event, decode_event
+from .llm import LLMBackend, LLMResponse, get_default_backend
+from .llm.budget import PromptSection, JSON_WRAPPER_TOKENS, assemble, budget_for, compact
+from .clock import WorldClock
+from .relevance import RelevanceIndex, summarize_action, summarize_content
+from .agent_memory import AgentMemory, Memory
+from .actions import ACTION_SCHEMA, ACTION_TOOL, MAX_STATE_CHANGES, PROTECTED_KEYS, AgentAction, check_action
+from .llm.schema import validate
 
 console = Console()
 
+# Called with (agent_id, text, None) for each piece of a streamed decision, then once with
+# (agent_id, None, response) when it ends; response is None if the decision failed
+StreamListener = Callable[[str, Optional[str], Optional[LLMResponse]], None]
+
+DEFAULT_MAX_IDLE_TICKS = 10  # Quiet agents still act now and then; 1 would make every agent act every tick
+
+@dataclass
+class WakeConditions:
+    on_targeted_events: bool = True  # Wake when an event lists this agent in its targets
+    watch_keys: Set[str] = field(default_factory=set)  # State keys whose changes wake the agent
+    max_idle_ticks: Optional[int] = DEFAULT_MAX_IDLE_TICKS  # Act at least this often; None waits for events only
+
 class Agent:
-    def __init__(self, agent_id: str, state: WorldState, config=None):
+    def __init__(self, agent_id: str, state: WorldState, config=None, backend: Optional[LLMBackend] = None,
+                 clock: Optional[WorldClock] = None, wake: Optional[WakeConditions] = None,
+                 relevance: Optional[RelevanceIndex] = None, resync_every: int = 10,
+                 memory: Optional[AgentMemory] = None, stream_listeners: Optional[List[StreamListener]] = None):
         console.print(f"[cyan]Initializing agent {agent_id}[/cyan]")
         self.agent_id = agent_id
         self.state = state
+        self.config = config
         self.running = False
+        self.backend = backend or get_default_backend()
+        self.clock = clock
+        self.interval_ticks = 1  # Act every N ticks of the world clock
+        self.last_tick: Optional[int] = None
+        self.wake = wake or WakeConditions()
+        self.relevance = relevance  # Limits observations to nearby agents when set
+        self.resync_every = resync_every  # Full observation every N turns, deltas in between
+        self.seen_version: Optional[int] = None  # State version of the last observation
+        self.seen_seq = 0  # Last headline already shown
+        self.turns_since_resync = 0
+        self.memory = memory or AgentMemory()
+        self.stream_listeners = stream_listeners if stream_listeners is not None else []
+        # Undelivered events, coalesced so only the latest per (type, subject) is kept
+        self.mailbox: "OrderedDict[Tuple[str, str], Event]" = OrderedDict()
         
         # Extract agent info from config
         if config and hasattr(config, 'agents'):
@@ -27,66 +67,284 @@ class Agent:
         # Set up role-specific prompt
         if self.agent_info:
             self.system_prompt = f"""You are {self.agent_id} at Canva.
-Role: {self.agent_info.get('description', '')}
-Properties: {self.agent_info.get('properties', {})}
-Relationships: {self.agent_info.get('relationships', [])}
+Role: {compact(self.agent_info.get('description', ''))}
+Properties: {compact(self.agent_info.get('properties', {}))}
+Relationships: {compact(self.agent_info.get('relationships', []))}
 
 Respond with your actions and thoughts in character. Be specific about your daily activities and interactions."""
         else:
             self.system_prompt = f"You are {self.agent_id} in the simulation."
 
+        # Peers this agent has a relationship with wake it when they act
+        if self.agent_info:
+            for relationship in self.agent_info.get('relationships', []):
+                if isinstance(relationship, dict) and relationship.get('to'):
+                    self.wake.watch_keys.add(f"agent_{relationship['to']}")
+
+    def prompt_prefix(self) -> List[str]:
+        """Stable context sent ahead of every prompt: the world's system prompt, then this agent's persona"""
+        world = getattr(self.config, 'system_prompt', None)
+        return [world, self.system_prompt] if world else [self.system_prompt]
+
+    def current_time(self) -> str:
+        """Simulated time if the agent lives in a clocked world, else wall-clock time"""
+        if self.clock:
+            return self.clock.strftime("%Y-%m-%d %H:%M")
+        return time.strftime("%H:%M:%S")
+
+    def is_due(self, tick: int) -> bool:
+        """Whether the agent should act on this tick"""
+        if self.last_tick is None:
+            return True
+        idle = tick - self.last_tick
+        if idle < self.interval_ticks:
+            return False
+        if self.mailbox:
+            return True
+        return self.wake.max_idle_ticks is not None and idle >= self.wake.max_idle_ticks
+
+    def topics(self) -> List[str]:
+        """Broadcast topics that can wake this agent; targeted events always arrive"""
+        return [f"state_changed:{key}" for key in sorted(self.wake.watch_keys)]
+
+    async def receive(self, event: Event):
+        """Put events that match the wake conditions into the mailbox"""
+        if event.source == self.agent_id:
+            return
+
+        if event.type == EventType.STATE_CHANGED:
+            key = event.data.get("key")
+            if key not in self.wake.watch_keys:
+                return
+            subject = key
+        elif event.targets and self.agent_id in event.targets and self.wake.on_targeted_events:
+            subject = event.source
+        else:
+            return
+
+        mailbox_key = (event.type, subject)
+        self.mailbox.pop(mailbox_key, None)
+        self.mailbox[mailbox_key] = event
+
+    def loop_state(self) -> Dict[str, Any]:
+        """Where the agent is in its loop, for checkpoints"""
+        return {
+            "last_tick": self.last_tick,
+            "interval_ticks": self.interval_ticks,
+            "on_targeted_events": self.wake.on_targeted_events,
+            "watch_keys": sorted(self.wake.watch_keys),
+            "max_idle_ticks": self.wake.max_idle_ticks,
+            "mailbox": [encode_event(event) for event in self.mailbox.values()],
+            "memory": self.memory.to_dict()
+        }
+
+    def restore_loop_state(self, loop_state: Dict[str, Any]):
+        """Resume from ``loop_state`` output"""
+        self.last_tick = loop_state["last_tick"]
+        self.interval_ticks = loop_state["interval_ticks"]
+        self.wake = WakeConditions(
+            on_targeted_events=loop_state["on_targeted_events"],
+            watch_keys=set(loop_state["watch_keys"]),
+            max_idle_ticks=loop_state["max_idle_ticks"]
+        )
+        self.mailbox.clear()
+        for data in loop_state["mailbox"]:
+            event = decode_event(data)
+            self.mailbox[(event.type, event.data.get("key") or event.source)] = event
+        if "memory" in loop_state:
+            self.memory.restore(loop_state["memory"])
+
+    async def recover_memory(self):
+        """Re-index archived turns from this agent's own actions in the event history"""
+        events = await self.state.query_events(source=self.agent_id, type=EventType.AGENT_ACTION)
+        first_turn = self.memory.turns - len(events) + 1
+        archived = list(enumerate(events, first_turn))[:max(len(events) - len(self.memory.recent), 0)]
+        for turn, event in archived[-(self.memory.archive.max_documents or len(archived)):]:
+            action = event.data.get("action", {})
+            memory = Memory(turn, str(action.get("timestamp", "")), summarize_content(action.get("content", ""), 300))
+            self.memory.archive.add(memory, memory.text)
+
+    def take_mailbox(self) -> List[Event]:
+        """Remove and return pending events, oldest first"""
+        events = list(self.mailbox.values())
+        self.mailbox.clear()
+        return events
+
     async def observe(self) -> Dict[str, Any]:
         """Get agent's view of the world"""
-        world_state = await self.state.get("world_state") or {}
-        other_agents = await self.state.get_agents() or {}
-        
-        if self.agent_id in other_agents:
-            del other_agents[self.agent_id]
+        # Snapshots share structure with the live state, so this costs no copying
+        snapshot = await self.state.snapshot()
+        peers = self.relevance.neighbourhood(self.agent_id) if self.relevance else None
+        changes = None
+        if self.seen_version is not None and self.turns_since_resync < self.resync_every:
+            changes = await self.state.changes_since(self.seen_version, agents=peers)
         
         observation = {
-            "time": time.strftime("%H:%M:%S"),
-            "world_state": world_state,
-            "other_agents": other_agents
+            "time": self.current_time(),
+            "version": snapshot.version,
+            "mode": "full" if changes is None else "delta",
+            "events": self.take_mailbox()
         }
         
+        if changes is None:
+            observation["world_state"] = await self.state.get("world_state") or {}
+            if peers is not None:
+                # Only the neighbourhood in detail; the rest of the world as headlines
+                observation["other_agents"] = {
+                    peer: snapshot.agents[peer] for peer in peers if peer in snapshot.agents
+                }
+            else:
+                observation["other_agents"] = snapshot.agents.delete(self.agent_id)
+            self.turns_since_resync = 0
+        else:
+            # Only what changed since the last turn, minus what the mailbox already reports
+            reported = {event.data.get("key") for event in observation["events"]}
+            observation["other_agents"] = {
+                peer: snapshot.agents[peer] for peer in changes.agents
+                if peer != self.agent_id and peer in snapshot.agents and f"agent_{peer}" not in reported
+            }
+            world_keys = [key for key in sorted(changes.state) if key != "agents" and key not in reported]
+            observation["world_changes"] = {
+                key: snapshot.state[key] if snapshot.state is not None else await self.state.get(key)
+                for key in world_keys
+            }
+        
+        if self.relevance:
+            since_seq = self.seen_seq if changes is not None else None
+            observation["headlines"] = self.relevance.headlines(self.agent_id, exclude=peers, since_seq=since_seq)
+            self.seen_seq = self.relevance.last_seq
+        
+        self.seen_version = snapshot.version
+        self.turns_since_resync += 1
         return observation
 
+    def build_prompt(self, observation: Dict[str, Any]) -> str:
+        """Build the per-turn part of the decision prompt, trimmed to the agent_action input budget"""
+        # Who the agent is lives in the cached prefix; this is only what changes from turn to turn
+        sections = [
+            PromptSection("header", [
+                f"Time: {observation['time']}",
+                "",
+                f"As {self.agent_id} at Canva, what are you doing right now? Consider:",
+                "- Your role",
+                "- The time of day",
+                "- Your current tasks and priorities",
+                "- Your relationships with the team"
+            ])
+        ]
+        situation = self.observation_sections(observation) + [
+            PromptSection("events", self.event_lines(observation.get('events', [])),
+                          title="What has happened since you last acted:", priority=1,
+                          min_lines=1, oldest_first=True)
+        ]
+        # Recall the past turns that best match what is going on now
+        query = "\n".join(line for section in situation for line in section.lines)
+        sections += self.memory.prompt_sections(query) + situation + [
+            PromptSection("footer", ["Decide what you do next, staying in character, and take that action."])
+        ]
+        return assemble(sections, budget_for("agent_action").max_input_tokens - JSON_WRAPPER_TOKENS)
+
+    def observation_sections(self, observation: Dict[str, Any]) -> List[PromptSection]:
+        """Nearby agents, world changes and headlines, least important trimmed first"""
+        delta = observation.get("mode") == "delta"
+        if "headlines" not in observation and not delta:
+            return []
+        peers = []
+        for peer, record in observation.get("other_agents", {}).items():
+            last_action = record.get("last_action") if isinstance(record, dict) else None
+            peers.append(f"- {peer}: {summarize_content(last_action) if last_action else 'no recent activity'}")
+        world = [
+            f"- {key}: {compact(value, 200)}" for key, value in observation.get("world_changes", {}).items()
+        ]
+        headlines = [f"- {line}" for line in observation.get("headlines", [])]
+        if delta and not (peers or world or headlines or observation.get("events")):
+            return [PromptSection("peers", ["Nothing around you has changed since your last turn."])]
+        return [
+            PromptSection("peers", peers, priority=3,
+                          title="Changes around you since your last turn:" if delta else "People around you:"),
+            PromptSection("world", world, title="World updates:", priority=4),
+            PromptSection("headlines", headlines, title="Elsewhere:", priority=5)
+        ]
+
+    def event_lines(self, events: List[Event]) -> List[str]:
+        """Mailbox events for the prompt, oldest first"""
+        lines = []
+        for event in events:
+            if event.type == EventType.STATE_CHANGED:
+                value = event.data.get("value")
+                if isinstance(value, dict) and "last_action" in value:
+                    lines.append(f"- {value.get('id', event.data['key'])}: {summarize_content(value['last_action'], 200)}")
+                else:
+                    lines.append(f"- {event.data['key']} changed")
+            elif event.type == EventType.AGENT_ACTION:
+                lines.append(f"- {event.source}, to you: {summarize_action(event, 200)}")
+            else:
+                lines.append(f"- {event.source} ({event.type}): {compact(event.data, 200)}")
+        return lines
+
+    def make_action(self, decision: AgentAction) -> Dict[str, Any]:
+        """Wrap a decision as an action; ``content`` holds the typed action as JSON"""
+        return {
+            "type": "action",
+            "content": json.dumps(decision.to_dict()),
+            "agent_id": self.agent_id,
+            "timestamp": self.current_time()
+        }
+
     async def decide_action(self) -> Dict[str, Any]:
         """Determine next action based on observations"""
         console.print(f"[yellow]{self.agent_id} deciding action...[/yellow]")
         observation = await self.observe()
-        
-        prompt = f"""Time: {observation['time']}
+        return await self.decide(self.build_prompt(observation))
 
-As {self.agent_id} at Canva, what are you doing right now? Consider:
-- Your role: {self.agent_info.get('description', '') if self.agent_info else 'Unknown'}
-- The time of day
-- Your current tasks and priorities
-- Your relationships with the team
+    async def decide(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """Ask the backend for an action given an already built prompt.
 
-Describe your current actions and thoughts naturally, staying in character."""
+        Observing consumes the mailbox, so a prompt built once must be
+        reused rather than observing again.
+        """
+        def forward(text: str):
+            for listener in self.stream_listeners:
+                listener(self.agent_id, text, None)
 
+        response = None
         try:
-            response = await get_claude_response(prompt)
-            console.print(f"[green]{self.agent_id} got response from Claude[/green]")
+            try:
+                response = await self.backend.complete_tool(
+                    prompt, ACTION_TOOL, max_tokens=budget_for("agent_action").max_output_tokens,
+                    prefix=self.prompt_prefix(), on_text=forward if self.stream_listeners else None,
+                    check=check_action
+                )
+            finally:
+                # Listeners always hear the end, so a failed decision doesn't stay "in progress"
+                for listener in self.stream_listeners:
+                    listener(self.agent_id, None, response)
+            console.print(f"[green]{self.agent_id} got response from Claude{response.timing()}[/green]")
             
-            return {
-                "type": "action",
-                "content": response,
-                "agent_id": self.agent_id,
-                "timestamp": time.strftime("%H:%M:%S")
-            }
+            errors = validate(response.tool_input, ACTION_SCHEMA)
+            if errors:
+                console.print(f"[yellow]{self.agent_id} action coerced: {'; '.join(map(str, errors))}[/yellow]")
+            return self.make_action(AgentAction.from_dict(response.tool_input))
         except Exception as e:
             console.print(f"[red]Error getting action for {self.agent_id}: {str(e)}[/red]")
             return None
 
+    def state_changes(self, decision: AgentAction) -> Dict[str, Any]:
+        """The shared state an action may change: no world bookkeeping or agent records, at most a few keys"""
+        changes = {
+            key: value for key, value in decision.state.items()
+            if key not in PROTECTED_KEYS and not key.startswith("agent_")
+        }
+        return dict(list(changes.items())[:MAX_STATE_CHANGES])
+
     async def act(self, action: Dict[str, Any]):
-        """Execute an action and update state"""
+        """Execute an action: update the agent's record, apply its state changes and notify its targets"""
         if not action:
             return
 
         try:
             console.print(f"[cyan]{self.agent_id} executing action...[/cyan]")
+            decision = AgentAction.from_content(action["content"])
             
             # Update agent state
             await self.state.update(f"agent_{self.agent_id}", {
@@ -95,37 +353,50 @@ Describe your current actions and thoughts naturally, staying in character."""
                 "active": True,
                 "last_action": action["content"]
             })
+            self.memory.add(action["timestamp"], summarize_content(action["content"], 300))
+
+            for key, value in self.state_changes(decision).items():
+                await self.state.update(key, value)
+
+            # Only agents that exist can be woken
+            agents = (await self.state.snapshot()).agents
+            targets = {target for target in decision.targets if target != self.agent_id and target in agents}
             
             # Publish event
             await self.state.publish_event(Event(
-                type="agent_action",
+                type=EventType.AGENT_ACTION,
                 data={"action": action},
-                source=self.agent_id
+                source=self.agent_id,
+                targets=targets or None
             ))
             
             console.print(f"[green]{self.agent_id} action completed[/green]")
+
+            if self.memory.summary_due:
+                await self.memory.summarize(self.backend, self.agent_id, prefix=self.prompt_prefix())
             
         except Exception as e:
             console.print(f"[red]Error executing action for {self.agent_id}: {str(e)}[/red]")
 
-    async def run(self):
-        """Main agent loop"""
+    async def step(self):
+        """Decide and execute a single action"""
+        try:
+            action = await self.decide_action()
+            if action:
+                await self.act(action)
+        except Exception as e:
+            console.print(f"[red]Error in {self.agent_id} step: {str(e)}[/red]")
+
+    async def run(self, interval: float = 5):
+        """Standalone agent loop, for agents not driven by a world's tick scheduler"""
         console.print(f"[green]Starting agent loop: {self.agent_id}[/green]")
         self.running = True
         
         while self.running:
-            try:
-                # Get and execute action
-                action = await self.decide_action()
-                if action:
-                    await self.act(action)
-                    
-                # Wait before next action
-                await asyncio.sleep(5)
+            await self.step()
                 
-            except Exception as e:
-                console.print(f"[red]Error in {self.agent_id} loop: {str(e)}[/red]")
-                await asyncio.sleep(5)
+            # Wait before next action
+            await asyncio.sleep(interval)
                 
         console.print(f"[yellow]Agent {self.agent_id} stopped[/yellow]")
 
@@ -0,0 +1,202 @@
+import re
+import math
+import heapq
+from collections import Counter, deque
+from dataclasses import dataclass, asdict
+from typing import Any, Deque, Dict, List, Optional
+
+from rich.console import Console
+
+from .llm import LLMBackend
+from .llm.budget import PromptSection, JSON_WRAPPER_TOKENS, assemble, budget_for
+from .llm.jsonparse import parse_json
+
+console = Console()
+
+TERM_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have i in is it its my of on or our so that the their "
+    "them they this to was we were will with you your".split()
+)
+
+def terms(text: str) -> List[str]:
+    """Lower-cased words with stopwords removed"""
+    return [term for term in TERM_PATTERN.findall(text.lower()) if term not in STOPWORDS]
+
+@dataclass
+class Memory:
+    turn: int
+    time: str
+    text: str
+
+    def line(self) -> str:
+        return f"- [{self.time}] {self.text}"
+
+class BM25Index:
+    """Okapi BM25 over a bounded set of documents, maintained incrementally.
+
+    When ``max_documents`` is reached the oldest document is removed, so
+    memory and query cost stay bounded however long the run.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, max_documents: Optional[int] = None):
+        self.k1 = k1
+        self.b = b
+        self.max_documents = max_documents
+        self.documents: Dict[int, Any] = {}
+        self.lengths: Dict[int, int] = {}
+        self.doc_terms: Dict[int, List[str]] = {}
+        self.postings: Dict[str, Dict[int, int]] = {}  # term -> {doc id: term frequency}
+        self.order: Deque[int] = deque()
+        self.total_length = 0
+        self.next_id = 0
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def add(self, document: Any, text: str) -> int:
+        """Index a document under ``text`` and return its id"""
+        if self.max_documents is not None and len(self.documents) >= self.max_documents:
+            self.remove(self.order[0])
+        doc_id = self.next_id
+        self.next_id += 1
+        counts = Counter(terms(text))
+        for term, count in counts.items():
+            self.postings.setdefault(term, {})[doc_id] = count
+        self.documents[doc_id] = document
+        self.doc_terms[doc_id] = list(counts)
+        self.lengths[doc_id] = sum(counts.values())
+        self.total_length += self.lengths[doc_id]
+        self.order.append(doc_id)
+        return doc_id
+
+    def remove(self, doc_id: int) -> None:
+        """Drop a document and its postings"""
+        if doc_id not in self.documents:
+            return
+        for term in self.doc_terms.pop(doc_id):
+            docs = self.postings[term]
+            del docs[doc_id]
+            if not docs:
+                del self.postings[term]
+        del self.documents[doc_id]
+        self.total_length -= self.lengths.pop(doc_id)
+        if self.order and self.order[0] == doc_id:
+            self.order.popleft()
+        else:
+            self.order.remove(doc_id)
+
+    def search(self, query: str, k: int) -> List[Any]:
+        """The ``k`` best matching documents, best first"""
+        if not self.documents:
+            return []
+        count = len(self.documents)
+        average = self.total_length / count or 1.0
+        scores: Dict[int, float] = {}
+        for term in set(terms(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, frequency in docs.items():
+                length = self.lengths[doc_id]
+                norm = frequency * (self.k1 + 1) / (frequency + self.k1 * (1 - self.b + self.b * length / average))
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * norm
+        best = heapq.nlargest(k, scores.items(), key=lambda item: (item[1], item[0]))
+        return [self.documents[doc_id] for doc_id, _ in best]
+
+class AgentMemory:
+    """What an agent remembers of its own past turns, at a fixed prompt cost.
+
+    The last ``recent_size`` turns are kept verbatim. Turns that fall out
+    of that window go into a BM25 index, from which the ``top_k`` most
+    relevant to the current situation are recalled. Every
+    ``summary_every`` turns the backend folds the turns since the last
+    refresh into a rolling summary of bounded length.
+    """
+
+    def __init__(self, recent_size: int = 6, summary_every: int = 10, top_k: int = 3,
+                 max_archive: int = 2000):
+        self.recent: Deque[Memory] = deque(maxlen=recent_size)
+        self.summary_every = summary_every
+        self.top_k = top_k
+        self.archive = BM25Index(max_documents=max_archive)
+        self.summary = ""
+        self.unsummarized: List[Memory] = []
+        self.turns = 0
+
+    def add(self, time: str, text: str) -> Memory:
+        """Remember one turn"""
+        self.turns += 1
+        memory = Memory(self.turns, time, text)
+        if len(self.recent) == self.recent.maxlen:
+            oldest = self.recent[0]
+            self.archive.add(oldest, oldest.text)
+        self.recent.append(memory)
+        self.unsummarized.append(memory)
+        if len(self.unsummarized) > self.summary_every * 5:
+            del self.unsummarized[0]  # Summaries keep failing; don't grow without bound
+        return memory
+
+    @property
+    def summary_due(self) -> bool:
+        return len(self.unsummarized) >= self.summary_every
+
+    async def summarize(self, backend: LLMBackend, agent_id: str, prefix: Optional[List[str]] = None) -> None:
+        """Fold the turns since the last summary into the rolling summary, after the agent's cached ``prefix``"""
+        budget = budget_for("summary")
+        prompt = assemble([
+            PromptSection("instructions", [
+                f"Update the running summary of {agent_id}'s life in a simulation.",
+                "Keep lasting facts: goals, commitments, relationships, what changed. Drop routine detail.",
+                'Return {"summary": "..."} with at most 120 words.'
+            ]),
+            PromptSection("summary", [self.summary] if self.summary else [], title="Summary so far:"),
+            PromptSection("turns", [memory.line() for memory in self.unsummarized],
+                          title="New turns:", priority=1, min_lines=1, oldest_first=True)
+        ], budget.max_input_tokens - JSON_WRAPPER_TOKENS)
+        try:
+            response = await backend.get_json_response(prompt, max_tokens=budget.max_output_tokens, prefix=prefix)
+            parsed, _ = parse_json(response)
+            summary = parsed.get("summary") if isinstance(parsed, dict) else None
+        except Exception as e:
+            console.print(f"[yellow]Summary refresh failed for {agent_id}: {str(e)}[/yellow]")
+            return
+        if isinstance(summary, str) and summary.strip():
+            self.summary = " ".join(summary.split())
+            self.unsummarized.clear()
+
+    def recall(self, query: str) -> List[Memory]:
+        """Archived turns most relevant to ``query``, oldest first"""
+        return sorted(self.archive.search(query, self.top_k), key=lambda memory: memory.turn)
+
+    def prompt_sections(self, query: str) -> List[PromptSection]:
+        """Summary, recalled and recent turns for the decision prompt"""
+        return [
+            PromptSection("summary", [self.summary] if self.summary else [], title="Your story so far:",
+                          priority=3),
+            PromptSection("recalled", [memory.line() for memory in self.recall(query)],
+                          title="Related memories:", priority=4),
+            PromptSection("recent", [memory.line() for memory in self.recent],
+                          title="Your last turns:", priority=2, min_lines=1, oldest_first=True)
+        ]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Everything except the archive, which can be rebuilt from the event history"""
+        return {
+            "turns": self.turns,
+            "summary": self.summary,
+            "recent": [asdict(memory) for memory in self.recent],
+            "unsummarized": [memory.turn for memory in self.unsummarized]
+        }
+
+    def restore(self, data: Dict[str, Any], archived: List[Memory] = ()) -> None:
+        """Load ``to_dict`` output plus turns recovered from the event history"""
+        self.turns = data["turns"]
+        self.summary = data["summary"]
+        self.recent.clear()
+        self.recent.extend(Memory(**memory) for memory in data["recent"])
+        pending = set(data["unsummarized"])
+        self.unsummarized = [memory for memory in self.recent if memory.turn in pending]
+        for memory in archived:
+            self.archive.add(memory, memory.text)
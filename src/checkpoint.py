@@ -0,0 +1,175 @@
+import os
+import zlib
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from .clock import WorldClock
+from .state.codec import pack, unpack
+from .state.eventlog import HEADER
+
+CHECKPOINT_VERSION = 1
+SNAPSHOT_FILE = "snapshot.bin"
+DELTAS_FILE = "deltas.bin"
+
+def clock_state(clock: WorldClock) -> Dict[str, Any]:
+    return {
+        "start": clock.start.isoformat(),
+        "tick_duration": clock.tick_duration.total_seconds(),
+        "max_ticks": clock.max_ticks,
+        "tick": clock.tick
+    }
+
+def restore_clock(data: Dict[str, Any]) -> WorldClock:
+    return WorldClock(
+        start=datetime.fromisoformat(data["start"]),
+        tick_duration=timedelta(seconds=data["tick_duration"]),
+        max_ticks=data["max_ticks"],
+        tick=data["tick"]
+    )
+
+def encode_record(record: Dict[str, Any]) -> bytes:
+    payload = zlib.compress(pack(record))
+    return HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+def read_records(path: str) -> List[Dict[str, Any]]:
+    """Every intact record in a checkpoint file, stopping at a torn tail"""
+    if not os.path.exists(path):
+        return []
+    with open(path, "rb") as f:
+        data = f.read()
+    records, offset = [], 0
+    while offset + HEADER.size <= len(data):
+        length, checksum = HEADER.unpack_from(data, offset)
+        payload = data[offset + HEADER.size:offset + HEADER.size + length]
+        if len(payload) != length or zlib.crc32(payload) != checksum:
+            break
+        records.append(unpack(zlib.decompress(payload)))
+        offset += HEADER.size + length
+    return records
+
+@dataclass
+class PendingCheckpoint:
+    """A checkpoint captured from a live world, ready to be written"""
+    world_id: str
+    full: bool
+    record: Dict[str, Any]
+    data: bytes
+    loops: Dict[str, Dict[str, Any]]
+
+class CheckpointStore:
+    """Incremental on-disk checkpoints of running worlds.
+
+    Each world gets a directory holding one full snapshot and a file of
+    deltas appended after it. A delta carries only the state keys, agent
+    records and agent loop positions that changed since the previous
+    checkpoint, so checkpointing every tick costs about as much as the
+    tick changed. After ``snapshot_every`` deltas the next checkpoint
+    is written as a fresh snapshot and the delta file starts over.
+    """
+
+    def __init__(self, directory: str = ".worldmorph/checkpoints", snapshot_every: int = 50):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.deltas: Dict[str, int] = {}  # Deltas written since each world's snapshot
+        self.loops: Dict[str, Dict[str, Any]] = {}  # Last written agent loop states
+
+    def world_dir(self, world_id: str) -> str:
+        return os.path.join(self.directory, world_id)
+
+    def exists(self, world_id: str) -> bool:
+        return os.path.exists(os.path.join(self.world_dir(world_id), SNAPSHOT_FILE))
+
+    def checkpoint(self, world, full: bool = False) -> Dict[str, Any]:
+        """Write a snapshot or delta for ``world`` and return what was written"""
+        pending = self.prepare(world, full)
+        self.write(pending)
+        return pending.record
+
+    def prepare(self, world, full: bool = False) -> PendingCheckpoint:
+        """Capture a snapshot or delta of ``world``.
+
+        This reads live state, mailboxes and change tracking, so it must
+        run on the event loop; only ``write`` may go to a worker thread.
+        """
+        world_id = world.world_id
+        loops = {agent.agent_id: agent.loop_state() for agent in world.agents}
+        full = full or not self.exists(world_id) or world_id not in self.deltas \
+            or self.deltas[world_id] >= self.snapshot_every
+
+        if full:
+            state = world.state.export_snapshot()
+            record = {
+                "version": CHECKPOINT_VERSION,
+                "world_id": world_id,
+                "config": asdict(world.config) if world.config else None,
+                "world": {
+                    "batch_size": world.batch_size,
+                    "fast_forward": world.fast_forward,
+                    "tick_interval": world.tick_interval,
+                    "max_idle_ticks": world.max_idle_ticks
+                },
+                "clock": clock_state(world.clock),
+                "state": state["state"],
+                "agents": state["agents"],
+                "agent_order": list(loops),
+                "agent_loops": loops
+            }
+        else:
+            changes = world.state.export_changes()
+            previous = self.loops.get(world_id, {})
+            record = {
+                "clock": clock_state(world.clock),
+                "state": changes["state"],
+                "agents": changes["agents"],
+                "agent_order": [a for a in loops if a not in previous],
+                "agent_loops": {a: loop for a, loop in loops.items() if previous.get(a) != loop}
+            }
+        return PendingCheckpoint(world_id, full, record, encode_record(record), loops)
+
+    def write(self, pending: PendingCheckpoint) -> None:
+        """Write a prepared checkpoint to disk; safe to run in a worker thread"""
+        world_id = pending.world_id
+        if pending.full:
+            self._write_snapshot(world_id, pending.data)
+            self.deltas[world_id] = 0
+        else:
+            with open(os.path.join(self.world_dir(world_id), DELTAS_FILE), "ab") as f:
+                f.write(pending.data)
+            self.deltas[world_id] += 1
+        self.loops[world_id] = pending.loops
+
+    def _write_snapshot(self, world_id: str, data: bytes) -> None:
+        directory = self.world_dir(world_id)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, SNAPSHOT_FILE)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)  # Readers see the old snapshot or the new one, never half of it
+        open(os.path.join(directory, DELTAS_FILE), "wb").close()
+
+    def load(self, world_id: str) -> Dict[str, Any]:
+        """The latest checkpoint of a world: its snapshot with every delta applied"""
+        directory = self.world_dir(world_id)
+        snapshots = read_records(os.path.join(directory, SNAPSHOT_FILE))
+        if not snapshots:
+            raise ValueError(f"No checkpoint for world {world_id} in {self.directory}")
+        record = snapshots[0]
+        if record["version"] != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version {record['version']}")
+
+        deltas = read_records(os.path.join(directory, DELTAS_FILE))
+        for delta in deltas:
+            record["clock"] = delta["clock"]
+            record["state"].update(delta["state"])
+            record["agents"].update(delta["agents"])
+            record["agent_order"] += delta["agent_order"]
+            record["agent_loops"].update(delta["agent_loops"])
+
+        # Later checkpoints continue from here as deltas
+        self.deltas[world_id] = len(deltas)
+        self.loops[world_id] = dict(record["agent_loops"])
+        return record
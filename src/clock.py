@@ -0,0 +1,63 @@
+import re
+from datetime import datetime, timedelta
+from typing import Optional
+
+UNITS = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+    "month": timedelta(days=30),
+    "quarter": timedelta(days=91),
+    "year": timedelta(days=365)
+}
+
+def parse_duration(amount: str, unit: str) -> timedelta:
+    """Turn '1' and 'hours' into a timedelta"""
+    return float(amount) * UNITS[unit.lower().rstrip("s")]
+
+class WorldClock:
+    """Simulated time that advances in discrete ticks"""
+
+    def __init__(self, start: Optional[datetime] = None, tick_duration: timedelta = timedelta(hours=1),
+                 max_ticks: Optional[int] = None, tick: int = 0):
+        self.start = start or datetime(2024, 1, 1, 9, 0)
+        self.tick_duration = tick_duration
+        self.max_ticks = max_ticks
+        self.tick = tick
+
+    @classmethod
+    def from_description(cls, description: str, start: Optional[datetime] = None) -> "WorldClock":
+        """Read 'Each tick = 1 day' and 'Simulation runs 4 years' from a world description"""
+        unit_pattern = "|".join(f"{unit}s?" for unit in UNITS)
+        tick_duration = timedelta(hours=1)
+        max_ticks = None
+
+        match = re.search(rf"tick\s*=\s*([\d.]+)\s*({unit_pattern})\b", description, re.IGNORECASE)
+        if match:
+            tick_duration = parse_duration(*match.groups())
+
+        match = re.search(rf"runs\s+([\d.]+)\s*({unit_pattern})\b", description, re.IGNORECASE)
+        if match:
+            max_ticks = int(parse_duration(*match.groups()) / tick_duration)
+
+        return cls(start=start, tick_duration=tick_duration, max_ticks=max_ticks)
+
+    @property
+    def now(self) -> datetime:
+        """Current simulated time"""
+        return self.start + self.tick * self.tick_duration
+
+    @property
+    def finished(self) -> bool:
+        """Whether the simulated duration has elapsed"""
+        return self.max_ticks is not None and self.tick >= self.max_ticks
+
+    def advance(self, ticks: int = 1) -> datetime:
+        """Move simulated time forward"""
+        self.tick += ticks
+        return self.now
+
+    def strftime(self, fmt: str) -> str:
+        """Format the current simulated time"""
+        return self.now.strftime(fmt)
@@ -1,80 +1,268 @@
-from typing import Dict, Any, List
-from dataclasses import dataclass
+import os
 import json
-import re
+import asyncio
+import hashlib
+from typing import Dict, Any, List, Optional, Tuple
+from dataclasses import dataclass, asdict
 from rich.console import Console
-from .llm import get_claude_response
+from .llm import LLMBackend, get_default_backend
+from .llm.budget import PromptSection, JSON_WRAPPER_TOKENS, assemble, budget_for
+from .llm.jsonparse import parse_json
+from .llm.schema import validate, repair_fragments
 
 console = Console()
 
-@dataclass
-class SimulationConfig:
-    world_description: str
-    agents: List[Dict[str, Any]]
-    system_prompt: str
-    initial_state: Dict[str, Any]
-    
-    @classmethod
-    async def from_prompt(cls, prompt: str):
-        """Create simulation config by having Claude analyze the prompt"""
-        parse_prompt = """Analyze the provided description and generate a simulation configuration. Format your entire response as a strict JSON object with this exact structure:
+CONFIG_CACHE_VERSION = 2  # Bump when compilation changes, so cached configs are rebuilt
+DEFAULT_CONFIG_DIR = os.path.join(".worldmorph", "configs")
+
+STRING_LIST = {"type": "array", "items": {"type": "string"}}
+
+# What from_prompt needs from the analysis, in the JSON Schema subset src.llm.schema checks
+CONFIG_SCHEMA = {
+    "type": "object",
+    "required": ["world", "agents"],
+    "properties": {
+        "world": {
+            "type": "object",
+            "required": ["description", "characteristics", "rules"],
+            "properties": {
+                "description": {"type": "string", "minLength": 1},
+                "characteristics": STRING_LIST,
+                "rules": STRING_LIST
+            }
+        },
+        "agents": {
+            "type": "array",
+            "minItems": 1,
+            "items": {
+                "type": "object",
+                "required": ["name", "description"],
+                "properties": {
+                    "name": {"type": "string", "minLength": 1},
+                    "description": {"type": "string"},
+                    "properties": {"type": "object"},
+                    "relationships": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "required": ["to"],
+                            "properties": {"to": {"type": "string"}, "type": {"type": "string"}}
+                        }
+                    }
+                }
+            }
+        }
+    }
+}
 
-{
-    "world": {
+
+WORLD_SCHEMA = {"type": "object", "required": ["world"], "properties": {"world": CONFIG_SCHEMA["properties"]["world"]}}
+AGENTS_SCHEMA = {"type": "object", "required": ["agents"], "properties": {"agents": CONFIG_SCHEMA["properties"]["agents"]}}
+
+WORLD_FORMAT = """    "world": {
         "description": "Brief summary of the world",
         "characteristics": ["characteristic 1", "characteristic 2"],
         "rules": ["rule 1", "rule 2"]
-    },
-    "agents": [
+    }"""
+
+AGENTS_FORMAT = """    "agents": [
         {
             "name": "name of agent",
             "description": "what this agent does",
             "properties": {"key": "value"},
             "relationships": [{"to": "other agent", "type": "relationship"}]
         }
-    ]
-}
+    ]"""
+
+def split_sections(prompt: str) -> Tuple[str, List[Tuple[str, str]]]:
+    """Split a Markdown world description into its world text and one chunk per agent group.
+
+    Agent groups are the ``###`` headings under a ``## Agents`` heading;
+    everything else (setting, rules, time scale) is world text. A
+    description without such groups comes back as world text alone.
+    """
+    world: List[str] = []
+    groups: List[Tuple[str, List[str]]] = []
+    in_agents = False
+    for line in prompt.split("\n"):
+        if line.startswith("## "):
+            in_agents = line[3:].strip().lower().startswith("agents")
+            if in_agents:
+                continue
+        if in_agents and line.startswith("### "):
+            groups.append((line[4:].strip(), [line]))
+        elif in_agents and groups:
+            groups[-1][1].append(line)
+        else:
+            world.append(line)
+    return "\n".join(world).strip(), [(title, "\n".join(lines).strip()) for title, lines in groups]
+
+async def analyze(backend: LLMBackend, sections: List[PromptSection], schema: Dict[str, Any],
+                  context: str, label: str) -> Dict[str, Any]:
+    """One compilation request: ask, parse tolerantly, then have only the parts failing ``schema`` repaired"""
+    budget = budget_for("config")
+    prompt = assemble(sections, budget.max_input_tokens - JSON_WRAPPER_TOKENS)
+    try:
+        response = await backend.get_json_response(prompt, max_tokens=budget.max_output_tokens)
+        console.print(f"\n[dim]Raw Response ({label}):[/dim]")
+        console.print(response)
+
+        analysis, repairs = parse_json(response)
+        if repairs:
+            console.print(f"[yellow]Repaired JSON ({label}): {', '.join(repairs)}[/yellow]")
+        errors = validate(analysis, schema)
+        if errors:
+            console.print(f"[yellow]{label} failed validation: {'; '.join(str(e) for e in errors[:10])}[/yellow]")
+            analysis = await repair_fragments(backend, analysis, schema, context=context)
+        return analysis
+    except Exception:
+        console.print(f"[dim]Prompt used ({label}):[/dim]\n{prompt}")
+        raise
+
+async def analyze_whole(backend: LLMBackend, prompt: str) -> Dict[str, Any]:
+    """World and agents from a single request"""
+    instructions = ("Analyze the provided description and generate a simulation configuration. "
+                    "Format your entire response as a strict JSON object with this exact structure:\n\n"
+                    f"{{\n{WORLD_FORMAT},\n{AGENTS_FORMAT}\n}}")
+    return await analyze(backend, [
+        PromptSection.from_text("instructions", instructions),
+        PromptSection.from_text("description", prompt, title="Description to analyze:",
+                                priority=1, min_lines=1)
+    ], CONFIG_SCHEMA, prompt, "configuration")
+
+async def analyze_sections(backend: LLMBackend, world_text: str,
+                           groups: List[Tuple[str, str]]) -> Dict[str, Any]:
+    """World and agents from one request for the world and one per agent group, all in flight at once"""
+    titles = [title for title, _ in groups]
+    world_instructions = ("Analyze the provided description of a simulated world and summarize its setting. "
+                          "Format your entire response as a strict JSON object with this exact structure:\n\n"
+                          f"{{\n{WORLD_FORMAT}\n}}")
+    world_call = analyze(backend, [
+        PromptSection.from_text("instructions", world_instructions),
+        PromptSection("groups", [f"- {title}" for title in titles], title="Its people, described separately:",
+                      priority=2),
+        PromptSection.from_text("description", world_text, title="Description to analyze:",
+                                priority=1, min_lines=1)
+    ], WORLD_SCHEMA, world_text, "world")
+
+    def group_call(title: str, text: str):
+        instructions = (f'Generate the agents of the group "{title}" in a simulated world. '
+                        "Give each agent a specific name; relationships may only name agents in this group. "
+                        "Format your entire response as a strict JSON object with this exact structure:\n\n"
+                        f"{{\n{AGENTS_FORMAT}\n}}")
+        return analyze(backend, [
+            PromptSection.from_text("instructions", instructions),
+            PromptSection("groups", [f"- {other}" for other in titles if other != title],
+                          title="Other groups:", priority=3),
+            PromptSection.from_text("world", world_text, title="The world:", priority=2),
+            PromptSection.from_text("group", text, title="Group to generate:", priority=1, min_lines=1)
+        ], AGENTS_SCHEMA, text, title)
+
+    console.print(f"[cyan]Compiling world and {len(groups)} agent groups concurrently...[/cyan]")
+    world, *parts = await asyncio.gather(world_call, *(group_call(title, text) for title, text in groups))
+
+    agents: List[Dict[str, Any]] = []
+    names = set()
+    for title, part in zip(titles, parts):
+        for agent in part["agents"]:
+            if agent["name"] in names:
+                console.print(f"[yellow]Dropped duplicate agent {agent['name']} from {title}[/yellow]")
+                continue
+            names.add(agent["name"])
+            properties = agent.get("properties")
+            agent["properties"] = properties if isinstance(properties, dict) else {}
+            agent["properties"].setdefault("group", title)  # Links the group's agents as neighbours
+            agents.append(agent)
+    return {"world": world["world"], "agents": agents}
 
-Description to analyze:
-""" + prompt
+def resolve_relationships(agents: List[Dict[str, Any]]) -> None:
+    """Point relationships at agent names as written, ignoring case, and drop those naming no agent"""
+    names = {agent["name"].lower(): agent["name"] for agent in agents}
+    for agent in agents:
+        relationships = []
+        for relationship in agent.get("relationships") or []:
+            name = names.get(str(relationship.get("to", "")).strip().lower())
+            if name and name != agent["name"]:
+                relationships.append({**relationship, "to": name})
+        if len(relationships) < len(agent.get("relationships") or []):
+            console.print(f"[yellow]Dropped relationships of {agent['name']} to unknown agents[/yellow]")
+        agent["relationships"] = relationships
 
+class ConfigCache:
+    """Compiled configs on disk, one JSON file per description keyed by a hash of its text.
+
+    A preset compiles once; later runs of the same description load it
+    without any LLM calls.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CONFIG_DIR):
+        self.directory = directory
+
+    def path(self, prompt: str) -> str:
+        digest = hashlib.sha256(f"{CONFIG_CACHE_VERSION}\0{prompt}".encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def load(self, prompt: str) -> Optional["SimulationConfig"]:
+        """The cached config for ``prompt``, or None if there is none or it cannot be read"""
+        try:
+            with open(self.path(prompt), encoding="utf-8") as f:
+                record = json.load(f)
+            if record.get("version") != CONFIG_CACHE_VERSION or record.get("prompt") != prompt:
+                return None
+            return SimulationConfig(**record["config"])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, TypeError, KeyError) as e:
+            console.print(f"[yellow]Ignoring unreadable cached config: {str(e)}[/yellow]")
+            return None
+
+    def save(self, prompt: str, config: "SimulationConfig") -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(prompt)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": CONFIG_CACHE_VERSION, "prompt": prompt, "config": asdict(config)}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)  # Never leave half a config behind
+
+@dataclass
+class SimulationConfig:
+    world_description: str
+    agents: List[Dict[str, Any]]
+    system_prompt: str
+    initial_state: Dict[str, Any]
+    
+    @classmethod
+    async def from_prompt(cls, prompt: str, backend: Optional[LLMBackend] = None,
+                          cache_dir: Optional[str] = DEFAULT_CONFIG_DIR):
+        """Create simulation config by having Claude analyze the prompt.
+
+        Descriptions with agent groups (``###`` headings under ``## Agents``)
+        are compiled one group per request, concurrently. The result is
+        cached under ``cache_dir``, keyed by the prompt text; pass None to
+        always recompile.
+        """
+        cache = ConfigCache(cache_dir) if cache_dir else None
+        if cache:
+            config = cache.load(prompt)
+            if config:
+                console.print("[green]Loaded compiled config from cache[/green]")
+                return config
+
+        backend = backend or get_default_backend()
+        world_text, groups = split_sections(prompt)
         try:
             # Get Claude's analysis
             console.print("[cyan]Requesting analysis from Claude...[/cyan]")
-            analysis_str = await get_claude_response(parse_prompt)
-            console.print("[green]Received response from Claude[/green]")
-            
-            # Debug: Print raw response
-            console.print("\n[dim]Raw Response:[/dim]")
-            console.print(analysis_str)
-            
-            # Find the JSON part
-            json_start = analysis_str.find('{')
-            json_end = analysis_str.rfind('}') + 1
-            
-            if json_start == -1 or json_end <= 0:
-                console.print("[red]No JSON found in response[/red]")
-                raise ValueError("No JSON found in response")
-            
-            json_str = analysis_str[json_start:json_end]
-            console.print("\n[dim]Extracted JSON:[/dim]")
-            console.print(json_str)
-            
-            # Clean up the JSON string
-            json_str = re.sub(r'[\n\r\t]', '', json_str)  # Remove whitespace
-            json_str = re.sub(r',\s*([}\]])', r'\1', json_str)  # Fix trailing commas
-            json_str = re.sub(r'\\', '', json_str)  # Remove escapes
-            
-            console.print("\n[dim]Cleaned JSON:[/dim]")
-            console.print(json_str)
-            
-            # Parse JSON
-            try:
-                analysis = json.loads(json_str)
-                console.print("[green]Successfully parsed JSON[/green]")
-            except json.JSONDecodeError as e:
-                console.print(f"[red]JSON parse error: {str(e)}[/red]")
-                raise
+            if len(groups) > 1:
+                analysis = await analyze_sections(backend, world_text, groups)
+            else:
+                analysis = await analyze_whole(backend, prompt)
+            if validate(analysis, CONFIG_SCHEMA):  # e.g. every group came back empty
+                analysis = await repair_fragments(backend, analysis, CONFIG_SCHEMA, context=prompt)
+            resolve_relationships(analysis['agents'])
+            console.print("[green]Successfully parsed JSON[/green]")
             
             # Construct system prompt
             system_prompt = f"""<sys>You are in a CLI mood today. You are participating in an imaginative world simulation. This world is defined as:
@@ -98,7 +286,7 @@ When you observe the world, describe what you see in rich detail. When you perfo
                 "agents": analysis['agents']
             }
             
-            return cls(
+            config = cls(
                 world_description=prompt,
                 agents=analysis['agents'],
                 system_prompt=system_prompt,
@@ -107,5 +295,11 @@ When you observe the world, describe what you see in rich detail. When you perfo
         
         except Exception as e:
             console.print(f"[red]Error creating simulation config: {str(e)}[/red]")
-            console.print(f"[dim]Prompt used:[/dim]\n{parse_prompt}")
-            raise
\ No newline at end of file
+            raise
+
+        if cache:
+            try:
+                cache.save(prompt, config)
+            except OSError as e:
+                console.print(f"[yellow]Could not cache compiled config: {str(e)}[/yellow]")
+        return config
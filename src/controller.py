@@ -1,21 +1,54 @@
 from typing import Dict, List, Optional
 import asyncio
+import os
 from .world import WorldSimulation
+from .agent import DEFAULT_MAX_IDLE_TICKS
+from .state.interface import WorldState
 from .state.memory import InMemoryState
+from .state.sqlite import SQLiteState
+from .state.eventlog import EventLog
 from .config import SimulationConfig
+from .llm import LLMBackend, get_default_backend
+from .checkpoint import CheckpointStore, restore_clock
+from .replay import Recording, RecordingBackend, ReplayBackend, Divergence, event_streams, compare_streams
 
 class SimulationController:
-    def __init__(self):
+    def __init__(self, backend: Optional[LLMBackend] = None, event_log_dir: Optional[str] = None,
+                 record: bool = False, checkpoint_dir: str = ".worldmorph/checkpoints",
+                 state_dir: str = ".worldmorph/state"):
+        self.backend = backend
+        self.event_log_dir = event_log_dir  # Keep each world's full event history on disk
+        self.checkpoints = CheckpointStore(checkpoint_dir)
+        self.state_dir = state_dir  # Databases of worlds created with storage="sqlite"
         self.worlds: Dict[str, WorldSimulation] = {}
         self.running = False
+        self.recording: Optional[Recording] = None
+        self.replaying: Optional[Recording] = None
 
-    async def create_world(self, world_id: str, num_agents: int = 3, config: Optional[SimulationConfig] = None) -> WorldSimulation:
+        # Capture every LLM response so the run can be replayed offline
+        if record:
+            self.recording = Recording()
+            self.backend = RecordingBackend(backend or get_default_backend(), self.recording)
+
+    @classmethod
+    def replay(cls, path: str, event_log_dir: Optional[str] = None) -> "SimulationController":
+        """Controller that answers every LLM call from a saved recording"""
+        recording = Recording.load(path)
+        controller = cls(backend=ReplayBackend(recording), event_log_dir=event_log_dir)
+        controller.replaying = recording
+        return controller
+
+    async def create_world(self, world_id: str, num_agents: int = 3, config: Optional[SimulationConfig] = None,
+                           batch_size: int = 1, fast_forward: bool = False,
+                           max_idle_ticks: Optional[int] = DEFAULT_MAX_IDLE_TICKS,
+                           checkpoint_every: Optional[int] = None,
+                           storage: str = "memory") -> WorldSimulation:
         """Create a new world simulation"""
         if world_id in self.worlds:
             raise ValueError(f"World {world_id} already exists")
         
-        # Create new world with in-memory state
-        state = InMemoryState()
+        # Create new world with in-memory or SQLite state
+        state = self._create_state(world_id, storage)
         
         # If config provided, initialize state
         if config:
@@ -28,8 +61,12 @@ class SimulationController:
             await state.update("agents", config.agents)
         
         # Create world
-        world = WorldSimulation(world_id, state, config)
+        world = WorldSimulation(world_id, state, config, self.backend, batch_size=batch_size,
+                                fast_forward=fast_forward, max_idle_ticks=max_idle_ticks)
         self.worlds[world_id] = world
+        self._schedule_checkpoints(world, checkpoint_every)
+        if self.replaying:
+            world.start_replay(self.replaying.ticks.get(world_id, 0))
         
         # Spawn initial agents based on config
         if config and config.agents:
@@ -42,6 +79,64 @@ class SimulationController:
         
         return world
 
+    def _create_state(self, world_id: str, storage: str = "memory") -> WorldState:
+        if storage == "sqlite":
+            return SQLiteState(os.path.join(self.state_dir, f"{world_id}.sqlite3"))
+        if storage != "memory":
+            raise ValueError(f"Unknown storage {storage!r}; expected 'memory' or 'sqlite'")
+        event_log = None
+        if self.event_log_dir:
+            event_log = EventLog(os.path.join(self.event_log_dir, world_id))
+        if self.recording or self.replaying:
+            # Recorded and replayed runs are compared event by event, so keep all of them
+            return InMemoryState(event_log=event_log, max_history=None)
+        return InMemoryState(event_log=event_log)
+
+    def _schedule_checkpoints(self, world: WorldSimulation, every: Optional[int]):
+        """Checkpoint the world after every ``every`` ticks"""
+        if not every:
+            return
+
+        async def checkpoint_hook():
+            if world.clock.tick % every == 0:
+                await self.checkpoint(world.world_id)
+
+        world.tick_hooks.append(checkpoint_hook)
+
+    async def checkpoint(self, world_id: str, full: bool = False):
+        """Save a world's progress so it can be resumed with ``restore``"""
+        if world_id not in self.worlds:
+            raise ValueError(f"World {world_id} does not exist")
+        world = self.worlds[world_id]
+        # Deliver queued events first, so mailboxes are complete and stop changing
+        await world.state.drain_events()
+        await world.state.flush()
+        pending = self.checkpoints.prepare(world, full)
+        await asyncio.to_thread(self.checkpoints.write, pending)
+
+    def has_checkpoint(self, world_id: str) -> bool:
+        return self.checkpoints.exists(world_id)
+
+    async def restore(self, world_id: str, checkpoint_every: Optional[int] = None,
+                      storage: str = "memory") -> WorldSimulation:
+        """Rebuild a world from its latest checkpoint without re-running any ticks"""
+        if world_id in self.worlds:
+            raise ValueError(f"World {world_id} already exists")
+        data = await asyncio.to_thread(self.checkpoints.load, world_id)
+
+        state = self._create_state(world_id, storage)
+        state.load_snapshot(data)
+        config = SimulationConfig(**data["config"]) if data["config"] else None
+        world = WorldSimulation(world_id, state, config, self.backend, clock=restore_clock(data["clock"]),
+                                restored=True, **data["world"])
+        self.worlds[world_id] = world
+        self._schedule_checkpoints(world, checkpoint_every)
+
+        # Agents pick up where they were: same wake conditions, same pending events
+        for agent_id in data["agent_order"]:
+            await world.add_agent(agent_id, data["agent_loops"][agent_id])
+        return world
+
     async def start_world(self, world_id: str):
         """Start a specific world"""
         if world_id not in self.worlds:
@@ -68,6 +163,25 @@ class SimulationController:
             *(world.stop() for world in self.worlds.values())
         )
 
+    async def save_recording(self, path: str):
+        """Write recorded LLM responses and each world's event streams"""
+        if self.recording is None:
+            raise ValueError("Controller was not created with record=True")
+        for world_id, world in self.worlds.items():
+            self.recording.events[world_id] = event_streams(await world.state.query_events())
+            self.recording.ticks[world_id] = world.clock.tick
+        self.recording.save(path)
+
+    async def replay_report(self) -> List[Divergence]:
+        """Differences between the replayed run and the recording"""
+        if self.replaying is None:
+            raise ValueError("Controller is not replaying a recording")
+        divergences = list(self.backend.divergences)
+        for world_id, world in self.worlds.items():
+            actual = event_streams(await world.state.query_events())
+            divergences += compare_streams(world_id, self.replaying.events.get(world_id, {}), actual)
+        return divergences
+
     def get_world(self, world_id: str) -> Optional[WorldSimulation]:
         """Get a specific world"""
         return self.worlds.get(world_id)
\ No newline at end of file
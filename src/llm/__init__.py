@@ -0,0 +1,85 @@
+import os
+from typing import Optional
+
+from .interface import LLMBackend, LLMRequest, LLMResponse, RateLimitExceeded
+from .claude import AnthropicBackend
+from .openai_compat import OpenAICompatibleBackend
+from .stub import StubBackend
+from .cache import ResponseCache, CachedBackend
+from .ratelimit import TokenBucket, RateLimiter, RateLimitedBackend
+from .budget import CallBudget, PromptSection, CALL_BUDGETS, estimate_tokens, assemble
+from .jsonparse import JsonRepairError, parse_json
+from .schema import SchemaError, validate, repair_fragments
+
+_default_backend: Optional[LLMBackend] = None
+
+def create_backend(kind: Optional[str] = None) -> LLMBackend:
+    """Create a backend from LLM_BACKEND / LLM_BASE_URL / LLM_MODEL / LLM_CACHE"""
+    kind = kind or os.getenv("LLM_BACKEND", "anthropic")
+    model = os.getenv("LLM_MODEL")
+
+    if kind == "anthropic":
+        backend = AnthropicBackend(model=model) if model else AnthropicBackend()
+    elif kind == "openai":
+        kwargs = {"model": model} if model else {}
+        if os.getenv("LLM_BASE_URL"):
+            kwargs["base_url"] = os.getenv("LLM_BASE_URL")
+        backend = OpenAICompatibleBackend(**kwargs)
+    elif kind == "stub":
+        return StubBackend()
+    else:
+        raise ValueError(f"Unknown LLM backend: {kind}")
+
+    # One admission queue for every world, in front of the provider
+    backend = RateLimitedBackend(backend, RateLimiter.from_env())
+
+    # Cache deterministic responses across runs unless disabled
+    if os.getenv("LLM_CACHE", "1") != "0":
+        path = os.getenv("LLM_CACHE_PATH") or None
+        backend = CachedBackend(backend, ResponseCache(path) if path else None)
+    return backend
+
+def get_default_backend() -> LLMBackend:
+    """Get the process-wide backend used when none is injected"""
+    global _default_backend
+    if _default_backend is None:
+        _default_backend = create_backend()
+    return _default_backend
+
+def set_default_backend(backend: LLMBackend) -> None:
+    """Replace the process-wide default backend"""
+    global _default_backend
+    _default_backend = backend
+
+async def get_claude_response(prompt: str, backend: Optional[LLMBackend] = None) -> str:
+    """Get a JSON response from the given or default backend with retries"""
+    return await (backend or get_default_backend()).get_json_response(prompt)
+
+__all__ = [
+    'LLMBackend',
+    'LLMRequest',
+    'LLMResponse',
+    'RateLimitExceeded',
+    'AnthropicBackend',
+    'OpenAICompatibleBackend',
+    'StubBackend',
+    'ResponseCache',
+    'CachedBackend',
+    'TokenBucket',
+    'RateLimiter',
+    'RateLimitedBackend',
+    'CallBudget',
+    'PromptSection',
+    'CALL_BUDGETS',
+    'estimate_tokens',
+    'assemble',
+    'JsonRepairError',
+    'parse_json',
+    'SchemaError',
+    'validate',
+    'repair_fragments',
+    'create_backend',
+    'get_default_backend',
+    'set_default_backend',
+    'get_claude_response'
+]
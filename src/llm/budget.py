@@ -0,0 +1,156 @@
+import re
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+# Words, numbers and runs of punctuation, roughly how BPE tokenizers split text
+TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]+")
+JSON_WRAPPER_TOKENS = 40  # Instructions get_json_response adds around every prompt
+
+def estimate_tokens(text: str) -> int:
+    """Local token estimate, close to real tokenizers for English text and JSON.
+
+    Long words and numbers count as several tokens (about four letters
+    or three digits each), and punctuation as roughly one per two
+    characters.
+    """
+    total = 0
+    for piece in TOKEN_PATTERN.findall(text):
+        first = piece[0]
+        if first.isalpha():
+            total += (len(piece) + 3) // 4
+        elif first.isdigit():
+            total += (len(piece) + 2) // 3
+        else:
+            total += (len(piece) + 1) // 2
+    return total
+
+def compact(value: Any, limit: Optional[int] = None) -> str:
+    """Short rendering of config values for prompts, instead of a Python repr"""
+    if isinstance(value, dict):
+        if set(value) >= {"to", "type"}:
+            text = f"{value['to']} ({value['type']})"
+        else:
+            text = "; ".join(f"{key}: {compact(item)}" for key, item in value.items())
+    elif isinstance(value, (list, tuple, set)):
+        text = ", ".join(compact(item) for item in value)
+    elif isinstance(value, str):
+        text = " ".join(value.split())
+    else:
+        text = json.dumps(value, default=str)
+    if limit is not None and len(text) > limit:
+        text = text[:limit - 3] + "..."
+    return text
+
+@dataclass
+class PromptSection:
+    """One part of a prompt: an optional title line over a list of lines.
+
+    Sections with a larger ``priority`` number are trimmed first, line by
+    line: from the end, or from the start when ``oldest_first`` (for
+    lists in chronological order). ``min_lines`` lines always survive;
+    a section trimmed to nothing disappears with its title. Priority 0
+    sections are never trimmed.
+    """
+    name: str
+    lines: List[str]
+    title: Optional[str] = None
+    priority: int = 0
+    min_lines: int = 0
+    oldest_first: bool = False
+
+    @classmethod
+    def from_text(cls, name: str, text: str, **kwargs) -> "PromptSection":
+        return cls(name, text.split("\n") if text else [], **kwargs)
+
+    def render(self) -> str:
+        if not self.lines:
+            return ""
+        body = "\n".join(self.lines)
+        return f"{self.title}\n{body}" if self.title else body
+
+    def tokens(self) -> int:
+        """Estimated size as ``assemble`` counts it, before any trimming"""
+        if not self.lines:
+            return 0
+        title = estimate_tokens(self.title) + 1 if self.title else 0
+        return title + sum(estimate_tokens(line) + 1 for line in self.lines)
+
+@dataclass
+class CallBudget:
+    max_input_tokens: int
+    max_output_tokens: int
+
+# Output budgets are what a well-formed answer needs, not the provider maximum
+CALL_BUDGETS: Dict[str, CallBudget] = {
+    "agent_action": CallBudget(max_input_tokens=1500, max_output_tokens=400),
+    "agent_batch": CallBudget(max_input_tokens=12000, max_output_tokens=8192),  # Scaled per agent, capped per model
+    "config": CallBudget(max_input_tokens=16000, max_output_tokens=4096),
+    "summary": CallBudget(max_input_tokens=3000, max_output_tokens=300),
+    "repair": CallBudget(max_input_tokens=4000, max_output_tokens=1024)  # One fragment of a larger answer
+}
+
+# Most output tokens a model accepts per request, by model name prefix
+MODEL_OUTPUT_LIMITS: Dict[str, int] = {
+    "claude-3-opus": 4096,
+    "claude-3-sonnet": 4096,
+    "claude-3-haiku": 4096,
+    "claude-3-5-sonnet": 8192,
+    "claude-3-5-haiku": 8192
+}
+DEFAULT_OUTPUT_LIMIT = 4096
+BATCH_OVERHEAD_TOKENS = 50  # Tool call framing around a batch's per-agent answers
+
+def output_limit(model: Optional[str]) -> int:
+    """Output token cap of ``model``; the longest matching prefix wins, unknown models get 4096"""
+    matches = [prefix for prefix in MODEL_OUTPUT_LIMITS if model and model.startswith(prefix)]
+    return MODEL_OUTPUT_LIMITS[max(matches, key=len)] if matches else DEFAULT_OUTPUT_LIMIT
+
+def budget_for(call_type: str) -> CallBudget:
+    """Token budget for a kind of LLM call"""
+    return CALL_BUDGETS[call_type]
+
+def batch_limit(model: Optional[str] = None) -> int:
+    """Output tokens a batched decision may use with ``model``"""
+    return min(CALL_BUDGETS["agent_batch"].max_output_tokens, output_limit(model))
+
+def batch_output_tokens(agents: int, model: Optional[str] = None) -> int:
+    """Output budget for a batched decision covering ``agents`` agents"""
+    per_agent = CALL_BUDGETS["agent_action"].max_output_tokens
+    return min(per_agent * agents + BATCH_OVERHEAD_TOKENS, batch_limit(model))
+
+def max_batch_agents(model: Optional[str] = None) -> int:
+    """Most agents whose full answers fit in one batched decision with ``model``"""
+    per_agent = CALL_BUDGETS["agent_action"].max_output_tokens
+    return max(1, (batch_limit(model) - BATCH_OVERHEAD_TOKENS) // per_agent)
+
+def assemble(sections: List[PromptSection], max_tokens: int) -> str:
+    """Join sections with blank lines, trimming the least important until the prompt fits ``max_tokens``"""
+    lines = {id(section): list(section.lines) for section in sections}
+    sizes = {id(section): [estimate_tokens(line) + 1 for line in section.lines] for section in sections}
+    titles = {id(section): estimate_tokens(section.title) + 1 if section.title else 0 for section in sections}
+    total = sum(sum(sizes[key]) + titles[key] for key in lines if lines[key])
+
+    for section in sorted(sections, key=lambda s: -s.priority):
+        if total <= max_tokens or section.priority == 0:
+            break
+        key = id(section)
+        section_lines, section_sizes = lines[key], sizes[key]
+        if not section_lines:
+            continue
+        dropped = 0
+        while total > max_tokens and len(section_lines) > section.min_lines:
+            index = 0 if section.oldest_first else len(section_lines) - 1
+            section_lines.pop(index)
+            total -= section_sizes.pop(index)
+            dropped += 1
+        if not section_lines:
+            total -= titles[key]
+        elif dropped:
+            note = f"({dropped} more omitted)"
+            section_lines.insert(0 if section.oldest_first else len(section_lines), note)
+
+    rendered = (
+        PromptSection(section.name, lines[id(section)], section.title).render() for section in sections
+    )
+    return "\n\n".join(text for text in rendered if text)
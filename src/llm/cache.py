@@ -0,0 +1,207 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .interface import LLMBackend, LLMRequest, LLMResponse
+
+DEFAULT_CACHE_PATH = os.path.join(".worldmorph", "llm_cache.sqlite3")
+
+def request_key(model: str, request: LLMRequest) -> str:
+    """Stable hash of everything that determines a deterministic response"""
+    payload = json.dumps({
+        "model": model,
+        "system": request.system,
+        "prefix": request.prefix,
+        "messages": request.messages,
+        "temperature": request.temperature,
+        "tools": request.tools,
+        "tool_choice": request.tool_choice
+    }, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class ResponseCache:
+    """Two-tier prompt -> response cache: an in-memory LRU in front of SQLite.
+
+    Entries expire after ``ttl`` seconds. The memory tier holds at most
+    ``max_memory_entries``; the disk tier is trimmed back to
+    ``max_disk_entries`` least recently used rows.
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_CACHE_PATH, max_memory_entries: int = 1024,
+                 max_disk_entries: int = 100_000, ttl: Optional[float] = 7 * 24 * 3600):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl = ttl
+        self.memory: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self._writes_since_trim = 0
+        self._db: Optional[sqlite3.Connection] = None
+
+        if path:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )""")
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed_at)")
+            self._db.commit()
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl is not None and time.time() - created_at > self.ttl
+
+    def _remember(self, key: str, created_at: float, value: Dict[str, Any]) -> None:
+        self.memory[key] = (created_at, value)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory_entries:
+            self.memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _disk_get(self, key: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self._expired(row[1]):
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            return row[1], json.loads(row[0])
+
+    def _disk_put(self, key: str, created_at: float, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), created_at, created_at)
+            )
+            self._writes_since_trim += 1
+            if self._writes_since_trim >= 100:
+                self._trim()
+            self._db.commit()
+
+    def _trim(self) -> None:
+        """Drop expired rows and the least recently used rows over the size limit"""
+        self._writes_since_trim = 0
+        if self.ttl is not None:
+            self._db.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,))
+        cursor = self._db.execute(
+            """DELETE FROM responses WHERE key IN (
+                SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )""",
+            (self.max_disk_entries,)
+        )
+        self.stats["evictions"] += max(cursor.rowcount, 0)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Look a key up in memory, then on disk"""
+        entry = self.memory.get(key)
+        if entry is not None:
+            if not self._expired(entry[0]):
+                self.memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry[1]
+            del self.memory[key]
+
+        if self._db is not None:
+            entry = await asyncio.to_thread(self._disk_get, key)
+            if entry is not None:
+                self._remember(key, *entry)
+                self.stats["disk_hits"] += 1
+                return entry[1]
+
+        self.stats["misses"] += 1
+        return None
+
+    async def put(self, key: str, value: Dict[str, Any]) -> None:
+        """Store a value in both tiers"""
+        created_at = time.time()
+        self._remember(key, created_at, value)
+        if self._db is not None:
+            await asyncio.to_thread(self._disk_put, key, created_at, value)
+
+    def _disk_delete(self, key: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._db.commit()
+
+    async def delete(self, key: str) -> None:
+        """Remove a key from both tiers"""
+        self.memory.pop(key, None)
+        if self._db is not None:
+            await asyncio.to_thread(self._disk_delete, key)
+
+    def close(self) -> None:
+        """Close the disk store"""
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+            self._db = None
+
+class CachedBackend(LLMBackend):
+    """Serves repeated deterministic requests from a ResponseCache"""
+
+    def __init__(self, backend: LLMBackend, cache: Optional[ResponseCache] = None):
+        self.backend = backend
+        self.model = backend.model
+        self.cache = cache or ResponseCache()
+
+    async def complete(self, request: LLMRequest) -> LLMResponse:
+        """Return a cached response, or forward and cache the result"""
+        # Only temperature 0 responses are reproducible enough to reuse
+        if request.temperature != 0.0:
+            return await self.backend.complete(request)
+
+        model = request.model or self.backend.model
+        key = request_key(model, request)
+        cached = await self.cache.get(key)
+        if cached is not None:
+            return LLMResponse(text=cached["text"], model=cached["model"], cached=True)
+
+        response = await self.backend.complete(request)
+        await self.cache.put(key, {"text": response.text, "model": response.model})
+        return response
+
+    async def stream(self, request: LLMRequest, on_text: Optional[Callable[[str], None]] = None,
+                     stop: Optional[Callable[[str], bool]] = None) -> LLMResponse:
+        """Deliver a cached response as a single piece, or stream and cache the result"""
+        if request.temperature != 0.0:
+            return await self.backend.stream(request, on_text, stop)
+
+        model = request.model or self.backend.model
+        key = request_key(model, request)
+        cached = await self.cache.get(key)
+        if cached is not None:
+            if on_text:
+                on_text(cached["text"])
+            return LLMResponse(text=cached["text"], model=cached["model"], cached=True)
+
+        response = await self.backend.stream(request, on_text, stop)
+        # A stream stopped by ``stop`` holds everything the caller wanted from it
+        await self.cache.put(key, {"text": response.text, "model": response.model})
+        return response
+
+    async def discard(self, request: LLMRequest) -> None:
+        """Evict a response the caller rejected, so a retry reaches the model"""
+        await self.cache.delete(request_key(request.model or self.backend.model, request))
+        await self.backend.discard(request)
+
+    async def close(self) -> None:
+        """Close the wrapped backend and the cache"""
+        await self.backend.close()
+        self.cache.close()
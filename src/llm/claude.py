@@ -0,0 +1,203 @@
+import os
+import json
+import asyncio
+from typing import Any, Callable, Dict, List, Optional, Union
+import httpx
+from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient, RateLimitError
+from rich.console import Console
+
+from .interface import LLMBackend, LLMRequest, LLMResponse, RateLimitExceeded
+from .budget import estimate_tokens
+from .jsonparse import parse_json
+from .streaming import StreamTimer
+
+console = Console()
+
+DEFAULT_MODEL = "claude-3-opus-20240229"
+DEFAULT_MAX_CONCURRENCY = 64
+MAX_CACHE_BREAKPOINTS = 4  # Per request, as allowed by the Messages API
+
+def get_max_concurrency() -> int:
+    """Maximum number of LLM requests in flight, from the environment"""
+    return int(os.getenv("LLM_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY))
+
+def system_blocks(request: LLMRequest) -> Union[str, List[Dict[str, Any]]]:
+    """The system prompt followed by the request prefix, with a cache breakpoint after each prefix block.
+
+    The API caches everything up to a breakpoint, so a block shared by
+    many requests (the world prompt) is read from cache even when the
+    blocks after it (an agent's persona) differ.
+    """
+    if not request.prefix:
+        return request.system
+    blocks: List[Dict[str, Any]] = [{"type": "text", "text": request.system}]
+    # Keep the breakpoints on the last blocks, which cover everything before them
+    first_cached = max(len(request.prefix) - MAX_CACHE_BREAKPOINTS, 0)
+    for index, text in enumerate(request.prefix):
+        block: Dict[str, Any] = {"type": "text", "text": text}
+        if index >= first_cached:
+            block["cache_control"] = {"type": "ephemeral"}
+        blocks.append(block)
+    return blocks
+
+def request_params(request: LLMRequest, model: str) -> Dict[str, Any]:
+    """Messages API arguments for a request, forcing its tool when it names one"""
+    params: Dict[str, Any] = {
+        "model": request.model or model,
+        "max_tokens": request.max_tokens,
+        "temperature": request.temperature,
+        "messages": request.messages,
+        "system": system_blocks(request)
+    }
+    if request.tools:
+        params["tools"] = [
+            {"name": tool["name"], "description": tool.get("description", ""), "input_schema": tool["input_schema"]}
+            for tool in request.tools
+        ]
+        if request.tool_choice:
+            params["tool_choice"] = {"type": "tool", "name": request.tool_choice}
+    return params
+
+def tool_call(message) -> Optional[Dict[str, Any]]:
+    """Input of the first tool call in a message, if any"""
+    for block in message.content:
+        if block.type == "tool_use":
+            return block.input
+    return None
+
+def rate_limit_exceeded(error: RateLimitError) -> RateLimitExceeded:
+    """Translate the SDK's 429 error so the shared RateLimiter can requeue the request"""
+    headers = dict(error.response.headers)
+    retry_after = headers.get("retry-after")
+    return RateLimitExceeded(
+        str(error),
+        retry_after=float(retry_after) if retry_after else None,
+        headers=headers
+    )
+
+class AnthropicBackend(LLMBackend):
+    """Anthropic Messages API over one pooled async client"""
+
+    def __init__(self, model: str = DEFAULT_MODEL, api_key: Optional[str] = None,
+                 max_concurrency: Optional[int] = None):
+        self.model = model
+        self.api_key = api_key
+        self.max_concurrency = max_concurrency or get_max_concurrency()
+        self._client: Optional[AsyncAnthropic] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def get_client(self) -> AsyncAnthropic:
+        """Get the shared authenticated Anthropic client"""
+        if self._client is not None:
+            return self._client
+
+        api_key = self.api_key or os.getenv("ANTHROPIC_API_KEY")
+        if not api_key:
+            raise ValueError("ANTHROPIC_API_KEY not found in environment")
+
+        console.print(f"[dim]Using API key: {api_key[:8]}...[/dim]")
+
+        # One pooled connection per concurrent request, kept alive between calls
+        http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency
+            )
+        )
+        # 429s are handled by the shared RateLimiter rather than SDK-level retries
+        self._client = AsyncAnthropic(api_key=api_key, http_client=http_client, max_retries=0)
+        return self._client
+
+    def get_semaphore(self) -> asyncio.Semaphore:
+        """Get the semaphore bounding concurrent requests"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def complete(self, request: LLMRequest) -> LLMResponse:
+        """Send a single completion request"""
+        client = self.get_client()
+        async with self.get_semaphore():
+            try:
+                raw_response = await client.messages.with_raw_response.create(**request_params(request, self.model))
+            except RateLimitError as e:
+                raise rate_limit_exceeded(e) from e
+
+        response = raw_response.parse()
+        usage = response.usage
+        tool_input = tool_call(response)
+        return LLMResponse(
+            text=json.dumps(tool_input) if tool_input is not None else "".join(
+                block.text for block in response.content if block.type == "text"
+            ),
+            tool_input=tool_input,
+            model=response.model,
+            input_tokens=usage.input_tokens,
+            output_tokens=usage.output_tokens,
+            cache_read_tokens=usage.cache_read_input_tokens or 0,
+            cache_write_tokens=usage.cache_creation_input_tokens or 0,
+            headers=dict(raw_response.headers),
+            raw=response
+        )
+
+    async def stream(self, request: LLMRequest, on_text: Optional[Callable[[str], None]] = None,
+                     stop: Optional[Callable[[str], bool]] = None) -> LLMResponse:
+        """Stream a completion, closing the connection as soon as ``stop`` is satisfied"""
+        client = self.get_client()
+        timer = StreamTimer()
+        parts: List[str] = []
+        stopped_early = tool_used = False
+        async with self.get_semaphore():
+            try:
+                async with client.messages.stream(**request_params(request, self.model)) as stream:
+                    async for event in stream:
+                        if event.type != "content_block_delta":
+                            continue
+                        # Tool arguments stream as JSON text, just like a JSON answer would
+                        if event.delta.type == "text_delta":
+                            text = event.delta.text
+                        elif event.delta.type == "input_json_delta":
+                            text = event.delta.partial_json
+                            tool_used = True
+                        else:
+                            continue
+                        timer.token()
+                        parts.append(text)
+                        if on_text:
+                            on_text(text)
+                        if stop and stop(text):
+                            stopped_early = True
+                            break
+                    message = stream.current_message_snapshot
+                    headers = dict(stream.response.headers)
+            except RateLimitError as e:
+                raise rate_limit_exceeded(e) from e
+        timer.finish()
+
+        text = "".join(parts)
+        usage = message.usage
+        tool_input = None
+        if tool_used:
+            # The snapshot's arguments are incomplete after an early stop, so parse what was streamed
+            tool_input = parse_json(text)[0] if stopped_early else tool_call(message)
+        return LLMResponse(
+            text=text,
+            tool_input=tool_input,
+            model=message.model,
+            input_tokens=usage.input_tokens,
+            # Final usage only arrives with the last event, which an early stop never reads
+            output_tokens=estimate_tokens(text) if stopped_early else usage.output_tokens,
+            cache_read_tokens=usage.cache_read_input_tokens or 0,
+            cache_write_tokens=usage.cache_creation_input_tokens or 0,
+            time_to_first_token=timer.time_to_first_token,
+            duration=timer.duration,
+            stopped_early=stopped_early,
+            headers=headers,
+            raw=message
+        )
+
+    async def close(self) -> None:
+        """Close the client and its connection pool"""
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
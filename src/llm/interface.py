@@ -0,0 +1,190 @@
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Mapping, Optional
+from dataclasses import dataclass, field
+import asyncio
+from rich.console import Console
+
+from .streaming import JsonObjectEnd, StreamTimer
+from .jsonparse import parse_json
+
+console = Console()
+
+JSON_SYSTEM_PROMPT = "You are a JSON generator. Always return valid JSON objects with no additional text."
+
+@dataclass
+class LLMRequest:
+    messages: List[Dict[str, Any]]
+    system: str = JSON_SYSTEM_PROMPT
+    prefix: List[str] = field(default_factory=list)  # Stable blocks after ``system``, most shared first; cached where supported
+    max_tokens: int = 4096
+    temperature: float = 0.0  # Use consistent outputs
+    tools: List[Dict[str, Any]] = field(default_factory=list)  # {"name", "description", "input_schema"}
+    tool_choice: Optional[str] = None  # Name of a tool the model must call
+    model: Optional[str] = None  # Falls back to the backend's model
+
+@dataclass
+class LLMResponse:
+    text: str  # The tool call's arguments as JSON when a tool was called
+    model: str
+    tool_input: Optional[Dict[str, Any]] = None  # Arguments of the tool call, if any
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_tokens: int = 0  # Input tokens served from the provider's prompt cache
+    cache_write_tokens: int = 0  # Input tokens written to the provider's prompt cache
+    cached: bool = False  # Served from a ResponseCache without a network call
+    time_to_first_token: Optional[float] = None  # Seconds until the first text arrived
+    duration: Optional[float] = None  # Seconds until the last text arrived
+    stopped_early: bool = False  # Stream closed before the model finished
+    headers: Dict[str, str] = field(default_factory=dict, repr=False)
+    raw: Any = field(default=None, repr=False)
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        """Output rate after the first token"""
+        if self.duration is None or self.time_to_first_token is None:
+            return None
+        generating = self.duration - self.time_to_first_token
+        return self.output_tokens / generating if generating > 0 else None
+
+    def timing(self) -> str:
+        """Latency summary for log lines, empty when the call was not timed"""
+        if self.cached or self.time_to_first_token is None:
+            return ""
+        rate = self.tokens_per_second
+        throughput = f", {rate:.0f} tok/s" if rate else ""
+        return f" ({self.time_to_first_token:.2f}s to first token{throughput})"
+
+class RateLimitExceeded(Exception):
+    """Provider rejected a request with HTTP 429"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None,
+                 headers: Optional[Mapping[str, str]] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.headers = dict(headers or {})
+
+def client_error(error: BaseException) -> bool:
+    """Whether the provider rejected the request itself (a 4xx other than 408 or 429), so resending it cannot help"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return isinstance(status, int) and 400 <= status < 500 and status not in (408, 429)
+
+class LLMBackend(ABC):
+    """Transport for LLM completions. Agents and configs receive one by injection."""
+
+    model: str
+
+    @abstractmethod
+    async def complete(self, request: LLMRequest) -> LLMResponse:
+        """Send a single completion request"""
+        pass
+
+    async def stream(self, request: LLMRequest, on_text: Optional[Callable[[str], None]] = None,
+                     stop: Optional[Callable[[str], bool]] = None) -> LLMResponse:
+        """Send a request, passing text to ``on_text`` as it arrives.
+
+        The stream is closed as soon as ``stop``, called with each new
+        piece of text, returns True. Backends that cannot stream send the
+        request whole and deliver the text as a single piece.
+        """
+        timer = StreamTimer()
+        response = await self.complete(request)
+        timer.finish()
+        if on_text and response.text:
+            on_text(response.text)
+        response.time_to_first_token = timer.time_to_first_token
+        response.duration = timer.duration
+        return response
+
+    async def discard(self, request: LLMRequest) -> None:
+        """Forget any stored answer to ``request``; called when the caller rejects a response before retrying"""
+        pass
+
+    async def close(self) -> None:
+        """Release pooled connections"""
+        pass
+
+    async def get_json_response(self, prompt: str, max_tokens: int = 4096,
+                                max_retries: int = 3, retry_delay: float = 1,
+                                prefix: Optional[List[str]] = None) -> str:
+        """Get a JSON response for a prompt with retries.
+
+        ``prefix`` holds stable context, such as the world and agent system
+        prompts, sent ahead of the prompt so providers can cache it.
+        """
+        response = await self.complete_json(prompt, max_tokens, max_retries, retry_delay, prefix)
+        return response.text.strip()
+
+    async def complete_tool(self, prompt: str, tool: Dict[str, Any], max_tokens: int = 4096,
+                            max_retries: int = 3, retry_delay: float = 1, prefix: Optional[List[str]] = None,
+                            on_text: Optional[Callable[[str], None]] = None,
+                            check: Optional[Callable[[Dict[str, Any]], None]] = None) -> LLMResponse:
+        """Make the model answer by calling ``tool``; ``tool_input`` holds the arguments.
+
+        Backends without tool support answer in text, which is parsed as
+        the arguments instead. ``check`` may raise to reject the arguments,
+        e.g. when a truncated answer lost required fields; the attempt
+        then counts as failed and is retried.
+        """
+        request = LLMRequest(
+            messages=[{"role": "user", "content": prompt}],
+            system=f"Always answer by calling the {tool['name']} tool.",
+            prefix=[block for block in prefix or () if block],
+            max_tokens=max_tokens,
+            tools=[tool],
+            tool_choice=tool["name"]
+        )
+
+        for attempt in range(max_retries):
+            try:
+                response = await self.stream(request, on_text=on_text, stop=JsonObjectEnd())
+                if response.tool_input is None:
+                    parsed, _ = parse_json(response.text)
+                    if not isinstance(parsed, dict):
+                        raise ValueError(f"Expected {tool['name']} arguments, got {type(parsed).__name__}")
+                    response.tool_input = parsed
+                if check:
+                    check(response.tool_input)
+                return response
+
+            except Exception as e:
+                console.print(f"[yellow]Attempt {attempt + 1} failed: {str(e)}[/yellow]")
+                await self.discard(request)  # Don't get the same bad answer back from a cache
+                if attempt < max_retries - 1 and not client_error(e):
+                    await asyncio.sleep(retry_delay * (attempt + 1))  # Exponential backoff
+                else:
+                    raise
+
+    async def complete_json(self, prompt: str, max_tokens: int = 4096, max_retries: int = 3,
+                            retry_delay: float = 1, prefix: Optional[List[str]] = None,
+                            on_text: Optional[Callable[[str], None]] = None) -> LLMResponse:
+        """Stream a JSON response, stopping once the object is complete, with retries"""
+        # Add JSON instructions to the prompt
+        prompt = f"""IMPORTANT: Your response must be a valid JSON object. Do not include any other text, explanations, or formatting.
+
+{prompt}
+
+Remember: Return ONLY the JSON object with no additional text."""
+
+        request = LLMRequest(
+            messages=[{"role": "user", "content": prompt}],
+            prefix=[block for block in prefix or () if block],
+            max_tokens=max_tokens
+        )
+
+        for attempt in range(max_retries):
+            try:
+                response = await self.stream(request, on_text=on_text, stop=JsonObjectEnd())
+                parsed, _ = parse_json(response.text)
+                if not isinstance(parsed, dict):
+                    raise ValueError(f"Expected a JSON object, got {type(parsed).__name__}")
+                return response
+
+            except Exception as e:
+                console.print(f"[yellow]Attempt {attempt + 1} failed: {str(e)}[/yellow]")
+                await self.discard(request)  # Don't get the same bad answer back from a cache
+                if attempt < max_retries - 1 and not client_error(e):
+                    await asyncio.sleep(retry_delay * (attempt + 1))  # Exponential backoff
+                else:
+                    raise
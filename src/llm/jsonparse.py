@@ -0,0 +1,256 @@
+import re
+import json
+from typing import Any, Dict, List, Tuple
+
+NUMBER_PATTERN = re.compile(r"-?\d+(?:\.\d*)?(?:[eE][+-]?\d*)?")
+IDENTIFIER_PATTERN = re.compile(r"[A-Za-z_$][\w$-]*")
+LITERALS = {"true": True, "false": False, "null": None, "True": True, "False": False, "None": None}
+CLOSING_QUOTES = {'"': '"', "'": "'", "“": "”“\"", "”": "”“\"",
+                  "‘": "’‘'", "’": "’‘'"}
+ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+class JsonRepairError(ValueError):
+    """Text that does not contain anything recognisable as JSON"""
+
+class _Truncated(Exception):
+    """The text ended in the middle of a value"""
+
+class TolerantParser:
+    """Recursive-descent JSON parser that repairs what language models typically get wrong.
+
+    Leading prose, code fences and trailing text are skipped. Trailing
+    or missing commas, comments, unquoted keys, single or typographic
+    quotes around strings, raw newlines inside strings, invalid escapes
+    and Python literals are accepted; a quote not followed by a delimiter
+    is taken to be part of its string. If the text stops part-way
+    through, every open string, array and object is closed and the
+    unfinished value dropped, so any prefix of a response parses to the
+    complete part of it. Each repair is noted in ``repairs``.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.pos = 0
+        self.repairs: List[str] = []
+        self.truncated = False
+
+    def parse(self) -> Any:
+        start = min((i for i in (self.text.find("{"), self.text.find("[")) if i >= 0), default=-1)
+        if start < 0:
+            raise JsonRepairError("No JSON object or array found")
+        if self.text[:start].strip():
+            self.repairs.append("skipped text before JSON")
+        self.pos = start
+        value = self.value()
+        self.skip_space()
+        if self.text[self.pos:].strip().strip("`").strip():
+            self.repairs.append("ignored text after JSON")
+        return value
+
+    def note(self, repair: str) -> None:
+        if repair not in self.repairs:
+            self.repairs.append(repair)
+
+    def peek(self) -> str:
+        return self.text[self.pos] if self.pos < len(self.text) else ""
+
+    def skip_space(self) -> None:
+        text = self.text
+        while self.pos < len(text):
+            char = text[self.pos]
+            if char in " \t\r\n":
+                self.pos += 1
+            elif text.startswith("//", self.pos):
+                end = text.find("\n", self.pos)
+                self.pos = len(text) if end < 0 else end + 1
+                self.note("removed comments")
+            elif text.startswith("/*", self.pos):
+                end = text.find("*/", self.pos + 2)
+                self.pos = len(text) if end < 0 else end + 2
+                self.note("removed comments")
+            else:
+                break
+
+    def value(self) -> Any:
+        self.skip_space()
+        char = self.peek()
+        if not char:
+            raise _Truncated()
+        if char == "{":
+            return self.object()
+        if char == "[":
+            return self.array()
+        if char in CLOSING_QUOTES:
+            return self.string()
+        match = NUMBER_PATTERN.match(self.text, self.pos)
+        if match:
+            self.pos = match.end()
+            if self.pos == len(self.text):
+                raise _Truncated()  # More digits may have followed
+            number = match.group()
+            if not any(c in number for c in ".eE"):
+                return int(number)
+            try:
+                return float(number)
+            except ValueError:
+                raise JsonRepairError(f"Malformed number {number!r}") from None
+        if char == "-" and self.pos + 1 == len(self.text):
+            raise _Truncated()
+        match = IDENTIFIER_PATTERN.match(self.text, self.pos)
+        if match and match.group() in LITERALS:
+            self.pos = match.end()
+            if match.group() not in ("true", "false", "null"):
+                self.note("converted Python literals")
+            return LITERALS[match.group()]
+        if match and match.end() == len(self.text) and any(
+            literal.startswith(match.group()) for literal in LITERALS
+        ):
+            raise _Truncated()
+        raise JsonRepairError(f"Unexpected {char!r} at position {self.pos}")
+
+    def string(self) -> str:
+        opening = self.text[self.pos]
+        closing = CLOSING_QUOTES[opening]
+        if opening != '"':
+            self.note("normalized quotes")
+        self.pos += 1
+        text, parts = self.text, []
+        while True:
+            if self.pos >= len(text):
+                raise _Truncated()
+            char = text[self.pos]
+            if char in closing and self.ends_string(self.pos + 1):
+                self.pos += 1
+                return "".join(parts)
+            if char in closing:
+                self.note("escaped stray quotes")
+            if char == "\\":
+                if self.pos + 1 >= len(text):
+                    raise _Truncated()
+                escape = text[self.pos + 1]
+                if escape == "u":
+                    code = text[self.pos + 2:self.pos + 6]
+                    if len(code) < 4 and self.pos + 6 > len(text):
+                        raise _Truncated()
+                    try:
+                        parts.append(chr(int(code, 16)))
+                        self.pos += 6
+                        continue
+                    except ValueError:
+                        pass
+                if escape in ESCAPES:
+                    parts.append(ESCAPES[escape])
+                elif escape in CLOSING_QUOTES:
+                    parts.append(escape)
+                else:
+                    parts.append("\\" + escape)  # Not an escape: keep the backslash
+                    self.note("kept invalid escapes")
+                self.pos += 2
+                continue
+            if char in "\n\r\t":
+                self.note("escaped control characters in strings")
+            parts.append(char)
+            self.pos += 1
+
+    def ends_string(self, after: int) -> bool:
+        """Whether a quote is really the end of its string, judged by what follows it"""
+        text = self.text
+        end = after
+        while end < len(text) and text[end] in " \t\r\n":
+            end += 1
+        if end == len(text) or text[end] in ",:}]":
+            return True
+        # A quote on the next line starts the next member of a list that lost its comma
+        return text[end] in CLOSING_QUOTES and "\n" in text[after:end]
+
+    def key(self) -> str:
+        if self.peek() in CLOSING_QUOTES:
+            return self.string()
+        match = IDENTIFIER_PATTERN.match(self.text, self.pos)
+        if not match:
+            if self.pos >= len(self.text):
+                raise _Truncated()
+            raise JsonRepairError(f"Expected a key at position {self.pos}")
+        self.pos = match.end()
+        self.note("quoted bare keys")
+        return match.group()
+
+    def separator(self, closing: str, next_starts: str) -> bool:
+        """Consume a comma; True if another member follows"""
+        self.skip_space()
+        char = self.peek()
+        if char == ",":
+            self.pos += 1
+            self.skip_space()
+            if self.peek() == closing:
+                self.note("removed trailing commas")
+                return False
+            return True
+        if char == closing or not char:
+            return False
+        if char in next_starts:
+            self.note("inserted missing commas")
+            return True
+        raise JsonRepairError(f"Expected ',' or {closing!r} at position {self.pos}")
+
+    def close(self, closing: str) -> bool:
+        """Consume the closing bracket; False if the text ended first"""
+        self.skip_space()
+        char = self.peek()
+        if char == closing:
+            self.pos += 1
+            return True
+        if char and char in "}]":
+            self.pos += 1  # The other bracket: close anyway
+            self.note("fixed mismatched brackets")
+            return True
+        if not char:
+            self.truncated = True
+            self.note("closed truncated JSON")
+            return False
+        raise JsonRepairError(f"Expected {closing!r} at position {self.pos}")
+
+    def object(self) -> Dict[str, Any]:
+        self.pos += 1
+        result: Dict[str, Any] = {}
+        self.skip_space()
+        more = self.peek() not in ("}", "")
+        while more:
+            try:
+                key = self.key()
+                self.skip_space()
+                if self.peek() == ":":
+                    self.pos += 1
+                elif self.peek():
+                    self.note("inserted missing colons")
+                result[key] = self.value()
+            except _Truncated:
+                self.pos = len(self.text)  # Drop the unfinished member
+                break
+            more = self.separator("}", "\"'“”‘’" + "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_$")
+        self.close("}")
+        return result
+
+    def array(self) -> List[Any]:
+        self.pos += 1
+        result: List[Any] = []
+        self.skip_space()
+        more = self.peek() not in ("]", "")
+        while more:
+            try:
+                result.append(self.value())
+            except _Truncated:
+                self.pos = len(self.text)
+                break
+            more = self.separator("]", "{[\"'“”‘’-0123456789tfnTFN")
+        self.close("]")
+        return result
+
+def parse_json(text: str) -> Tuple[Any, List[str]]:
+    """Parse the JSON in an LLM response, repairing common defects; returns the value and the repairs made"""
+    try:
+        return json.loads(text), []
+    except (TypeError, ValueError):
+        pass
+    parser = TolerantParser(text)
+    return parser.parse(), parser.repairs
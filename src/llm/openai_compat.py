@@ -0,0 +1,176 @@
+import os
+import json
+import asyncio
+from typing import Any, Callable, Dict, List, Optional
+import httpx
+
+from .interface import LLMBackend, LLMRequest, LLMResponse, RateLimitExceeded
+from .claude import get_max_concurrency
+from .budget import estimate_tokens
+from .jsonparse import parse_json
+from .streaming import StreamTimer
+
+DEFAULT_BASE_URL = "http://localhost:8000/v1"
+DEFAULT_MODEL = "local-model"
+
+class OpenAICompatibleBackend(LLMBackend):
+    """OpenAI-style /chat/completions endpoint, e.g. a local llama.cpp or vLLM server"""
+
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, model: str = DEFAULT_MODEL,
+                 api_key: Optional[str] = None, max_concurrency: Optional[int] = None,
+                 timeout: float = 120.0):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.max_concurrency = max_concurrency or get_max_concurrency()
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def get_client(self) -> httpx.AsyncClient:
+        """Get the keep-alive HTTP client for this server"""
+        if self._client is None:
+            headers = {}
+            if self.api_key:
+                headers["Authorization"] = f"Bearer {self.api_key}"
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=headers,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency
+                )
+            )
+        return self._client
+
+    def get_semaphore(self) -> asyncio.Semaphore:
+        """Get the semaphore bounding concurrent requests"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def payload(self, request: LLMRequest) -> Dict[str, Any]:
+        """Request body for /chat/completions"""
+        # One system message with the stable prefix first, for servers with automatic prefix caching
+        system = "\n\n".join([request.system] + request.prefix)
+        messages = [{"role": "system", "content": system}] + request.messages
+        payload = {
+            "model": request.model or self.model,
+            "messages": messages,
+            "max_tokens": request.max_tokens,
+            "temperature": request.temperature
+        }
+        if request.tools:
+            payload["tools"] = [{
+                "type": "function",
+                "function": {
+                    "name": tool["name"],
+                    "description": tool.get("description", ""),
+                    "parameters": tool["input_schema"]
+                }
+            } for tool in request.tools]
+            if request.tool_choice:
+                payload["tool_choice"] = {"type": "function", "function": {"name": request.tool_choice}}
+        return payload
+
+    def check_status(self, response: httpx.Response) -> None:
+        """Raise RateLimitExceeded on 429 and HTTPStatusError on other failures"""
+        if response.status_code == 429:
+            retry_after = response.headers.get("retry-after")
+            raise RateLimitExceeded(
+                response.text,
+                retry_after=float(retry_after) if retry_after else None,
+                headers=response.headers
+            )
+        response.raise_for_status()
+
+    async def complete(self, request: LLMRequest) -> LLMResponse:
+        """Send a single completion request"""
+        payload = self.payload(request)
+        async with self.get_semaphore():
+            response = await self.get_client().post("/chat/completions", json=payload)
+        self.check_status(response)
+        body = response.json()
+
+        usage = body.get("usage") or {}
+        details = usage.get("prompt_tokens_details") or {}
+        message = body["choices"][0]["message"]
+        calls = message.get("tool_calls") or []
+        arguments = calls[0]["function"]["arguments"] if calls else None
+        return LLMResponse(
+            text=arguments if arguments is not None else message.get("content") or "",
+            tool_input=parse_json(arguments)[0] if arguments else None,
+            model=body.get("model", payload["model"]),
+            input_tokens=usage.get("prompt_tokens", 0),
+            output_tokens=usage.get("completion_tokens", 0),
+            cache_read_tokens=details.get("cached_tokens") or 0,
+            headers=dict(response.headers),
+            raw=body
+        )
+
+    async def stream(self, request: LLMRequest, on_text: Optional[Callable[[str], None]] = None,
+                     stop: Optional[Callable[[str], bool]] = None) -> LLMResponse:
+        """Stream a completion over server-sent events, closing the connection once ``stop`` is satisfied"""
+        payload = self.payload(request)
+        payload["stream"] = True
+        payload["stream_options"] = {"include_usage": True}
+        timer = StreamTimer()
+        parts: List[str] = []
+        usage: Dict[str, Any] = {}
+        model = payload["model"]
+        stopped_early = tool_used = False
+
+        async with self.get_semaphore():
+            async with self.get_client().stream("POST", "/chat/completions", json=payload) as response:
+                if response.status_code >= 400:
+                    await response.aread()
+                    self.check_status(response)
+                headers = dict(response.headers)
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    chunk = json.loads(data)
+                    usage = chunk.get("usage") or usage
+                    model = chunk.get("model", model)
+                    choices = chunk.get("choices") or [{}]
+                    delta = choices[0].get("delta") or {}
+                    text = delta.get("content")
+                    for call in delta.get("tool_calls") or ():
+                        # Tool arguments stream as JSON text, just like a JSON answer would
+                        text = (call.get("function") or {}).get("arguments")
+                        tool_used = True
+                    if not text:
+                        continue
+                    timer.token()
+                    parts.append(text)
+                    if on_text:
+                        on_text(text)
+                    if stop and stop(text):
+                        stopped_early = True
+                        break
+        timer.finish()
+
+        text = "".join(parts)
+        details = usage.get("prompt_tokens_details") or {}
+        return LLMResponse(
+            text=text,
+            tool_input=parse_json(text)[0] if tool_used and text else None,
+            model=model,
+            input_tokens=usage.get("prompt_tokens", 0),
+            output_tokens=usage.get("completion_tokens") or estimate_tokens(text),
+            cache_read_tokens=details.get("cached_tokens") or 0,
+            time_to_first_token=timer.time_to_first_token,
+            duration=timer.duration,
+            stopped_early=stopped_early,
+            headers=headers
+        )
+
+    async def close(self) -> None:
+        """Close the client and its connection pool"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
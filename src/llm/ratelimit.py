@@ -0,0 +1,244 @@
+import os
+import re
+import json
+import time
+import asyncio
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Mapping, Optional
+from rich.console import Console
+
+from .interface import LLMBackend, LLMRequest, LLMResponse, RateLimitExceeded
+from .budget import estimate_tokens
+
+console = Console()
+
+def estimate_request_tokens(request: LLMRequest) -> int:
+    """Local estimate of a request's input tokens"""
+    texts = [str(request.system)] + request.prefix + [json.dumps(tool) for tool in request.tools] + [str(m.get("content", "")) for m in request.messages]
+    return sum(estimate_tokens(text) for text in texts) + 1
+
+def parse_reset(value: str) -> Optional[float]:
+    """Seconds until a rate limit resets, from an RFC 3339 time or a '1m30s' duration"""
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        reset_at = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return max(reset_at.timestamp() - time.time(), 0.0)
+    except ValueError:
+        pass
+    units = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    parts = re.findall(r"([\d.]+)(ms|h|m|s)", value)
+    if not parts:
+        return None
+    return sum(float(amount) * units[unit] for amount, unit in parts)
+
+class TokenBucket:
+    """Per-minute budget that refills continuously. ``capacity=None`` means unlimited."""
+
+    def __init__(self, capacity: Optional[float] = None):
+        self.capacity = capacity
+        self.level = capacity or 0.0
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if self.capacity is not None:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60.0)
+        self.updated = now
+
+    def set_capacity(self, capacity: float) -> None:
+        """Adopt a limit, e.g. one reported by the provider"""
+        self._refill()
+        if self.capacity is None:
+            self.level = capacity
+        self.capacity = capacity
+        self.level = min(self.level, capacity)
+
+    def clamp(self, amount: float) -> float:
+        """Largest amount this bucket could ever grant at once"""
+        return amount if self.capacity is None else min(amount, self.capacity)
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until ``amount`` is available"""
+        if self.capacity is None:
+            return 0.0
+        self._refill()
+        missing = self.clamp(amount) - self.level
+        return 0.0 if missing <= 0 else missing * 60.0 / self.capacity
+
+    def consume(self, amount: float) -> None:
+        """Take ``amount`` from the bucket (may go negative after a refund shortfall)"""
+        if self.capacity is not None:
+            self._refill()
+            self.level -= self.clamp(amount)
+
+    def refund(self, amount: float) -> None:
+        """Return unused budget"""
+        if self.capacity is not None:
+            self._refill()
+            self.level = min(self.capacity, self.level + amount)
+
+    def sync_remaining(self, remaining: float) -> None:
+        """Lower the level to what the provider says is left"""
+        if self.capacity is not None:
+            self._refill()
+            self.level = min(self.level, remaining)
+
+class RateLimiter:
+    """Shared admission controller for requests, input tokens and output tokens per minute.
+
+    Callers queue in FIFO order in ``acquire`` until every bucket can cover
+    the request, so throughput stays at the allowed maximum instead of
+    failing and retrying. Provider headers tighten the buckets, and a 429
+    pauses every caller until its ``retry-after`` has passed.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None,
+                 input_tokens_per_minute: Optional[float] = None,
+                 output_tokens_per_minute: Optional[float] = None):
+        self.buckets = {
+            "requests": TokenBucket(requests_per_minute),
+            "input_tokens": TokenBucket(input_tokens_per_minute),
+            "output_tokens": TokenBucket(output_tokens_per_minute)
+        }
+        # Limits given explicitly are never overridden by provider headers
+        self.configured = {name for name, bucket in self.buckets.items() if bucket.capacity is not None}
+        self.paused_until = 0.0
+        self.stats = {"admitted": 0, "rate_limited": 0, "waited_seconds": 0.0,
+                      "cache_read_tokens": 0, "cache_write_tokens": 0}
+        self._lock: Optional[asyncio.Lock] = None
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        """Create a limiter from LLM_RPM / LLM_INPUT_TPM / LLM_OUTPUT_TPM"""
+        def limit(name: str) -> Optional[float]:
+            value = os.getenv(name)
+            return float(value) if value else None
+        return cls(limit("LLM_RPM"), limit("LLM_INPUT_TPM"), limit("LLM_OUTPUT_TPM"))
+
+    def _get_lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def acquire(self, input_tokens: int, output_tokens: int) -> None:
+        """Wait in line until the request fits every budget, then reserve it"""
+        amounts = {"requests": 1, "input_tokens": input_tokens, "output_tokens": output_tokens}
+
+        # The lock is FIFO, so the head of the queue is never starved
+        async with self._get_lock():
+            while True:
+                wait = max(self.paused_until - time.monotonic(), 0.0)
+                for name, bucket in self.buckets.items():
+                    wait = max(wait, bucket.wait_time(amounts[name]))
+                if wait <= 0:
+                    break
+                self.stats["waited_seconds"] += wait
+                await asyncio.sleep(wait)
+
+            for name, bucket in self.buckets.items():
+                bucket.consume(amounts[name])
+            self.stats["admitted"] += 1
+
+    def release(self, reserved_input: int, reserved_output: int, response: LLMResponse) -> None:
+        """Settle a reservation against actual usage"""
+        if response.input_tokens:
+            self.buckets["input_tokens"].refund(reserved_input - response.input_tokens)
+        self.buckets["output_tokens"].refund(reserved_output - response.output_tokens)
+        self.stats["cache_read_tokens"] += response.cache_read_tokens
+        self.stats["cache_write_tokens"] += response.cache_write_tokens
+        self.update_from_headers(response.headers)
+
+    def cancel(self, reserved_input: int, reserved_output: int) -> None:
+        """Return the token reservation of a request that failed; it still counts as a request"""
+        self.buckets["input_tokens"].refund(reserved_input)
+        self.buckets["output_tokens"].refund(reserved_output)
+
+    def pause(self, seconds: float) -> None:
+        """Hold every caller for ``seconds``"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers: Optional[Mapping[str, str]]) -> None:
+        """Apply Anthropic or OpenAI style rate limit headers"""
+        if not headers:
+            return
+        headers = {k.lower(): v for k, v in headers.items()}
+
+        names = {
+            "requests": ("anthropic-ratelimit-requests", "x-ratelimit-{}-requests"),
+            "input_tokens": ("anthropic-ratelimit-input-tokens", "x-ratelimit-{}-tokens"),
+            "output_tokens": ("anthropic-ratelimit-output-tokens", None)
+        }
+        for name, (anthropic_prefix, openai_pattern) in names.items():
+            bucket = self.buckets[name]
+            keys = {
+                "limit": [f"{anthropic_prefix}-limit"],
+                "remaining": [f"{anthropic_prefix}-remaining"]
+            }
+            if openai_pattern:
+                keys["limit"].append(openai_pattern.format("limit"))
+                keys["remaining"].append(openai_pattern.format("remaining"))
+
+            limit = next((headers[k] for k in keys["limit"] if k in headers), None)
+            if limit is not None and name not in self.configured:
+                bucket.set_capacity(float(limit))
+            remaining = next((headers[k] for k in keys["remaining"] if k in headers), None)
+            if remaining is not None:
+                bucket.sync_remaining(float(remaining))
+
+        retry_after = headers.get("retry-after")
+        if retry_after is not None:
+            seconds = parse_reset(retry_after)
+            if seconds:
+                self.pause(seconds)
+
+class RateLimitedBackend(LLMBackend):
+    """Routes every request of a backend through a shared RateLimiter"""
+
+    def __init__(self, backend: LLMBackend, limiter: Optional[RateLimiter] = None,
+                 max_rate_limit_retries: int = 8):
+        self.backend = backend
+        self.model = backend.model
+        self.limiter = limiter or RateLimiter.from_env()
+        self.max_rate_limit_retries = max_rate_limit_retries
+
+    async def complete(self, request: LLMRequest) -> LLMResponse:
+        """Wait for admission, send, and requeue on 429 instead of failing"""
+        return await self.admit(request, lambda: self.backend.complete(request))
+
+    async def stream(self, request: LLMRequest, on_text: Optional[Callable[[str], None]] = None,
+                     stop: Optional[Callable[[str], bool]] = None) -> LLMResponse:
+        """Stream through the limiter; a 429 arrives before any text, so requeueing is safe"""
+        return await self.admit(request, lambda: self.backend.stream(request, on_text, stop))
+
+    async def admit(self, request: LLMRequest, send: Callable[[], Awaitable[LLMResponse]]) -> LLMResponse:
+        """Reserve capacity for ``request``, run ``send`` and settle against actual usage"""
+        input_tokens = estimate_request_tokens(request)
+        for attempt in range(self.max_rate_limit_retries + 1):
+            await self.limiter.acquire(input_tokens, request.max_tokens)
+            try:
+                response = await send()
+            except RateLimitExceeded as e:
+                self.limiter.cancel(input_tokens, request.max_tokens)
+                self.limiter.stats["rate_limited"] += 1
+                self.limiter.update_from_headers(e.headers)
+                self.limiter.pause(e.retry_after or 2.0 ** attempt)
+                if attempt == self.max_rate_limit_retries:
+                    raise
+                console.print(f"[yellow]Rate limited, requeueing ({attempt + 1})[/yellow]")
+                continue
+            except BaseException:
+                # Errors, timeouts and cancellations must not keep their reservation
+                self.limiter.cancel(input_tokens, request.max_tokens)
+                raise
+            self.limiter.release(input_tokens, request.max_tokens, response)
+            return response
+
+    async def discard(self, request: LLMRequest) -> None:
+        await self.backend.discard(request)
+
+    async def close(self) -> None:
+        """Close the wrapped backend"""
+        await self.backend.close()
@@ -0,0 +1,167 @@
+import json
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple, Union
+
+from rich.console import Console
+
+from .interface import LLMBackend
+from .jsonparse import parse_json
+from .budget import PromptSection, JSON_WRAPPER_TOKENS, assemble, budget_for
+
+console = Console()
+
+Path = Tuple[Union[str, int], ...]
+
+TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+    "null": type(None)
+}
+
+def format_path(path: Path) -> str:
+    """``agents[3].name`` style rendering of a path, ``$`` for the root"""
+    text = "$"
+    for part in path:
+        text += f"[{part}]" if isinstance(part, int) else f".{part}"
+    return text[2:] if text.startswith("$.") else text
+
+@dataclass
+class SchemaError:
+    path: Path
+    message: str
+
+    def __str__(self) -> str:
+        return f"{format_path(self.path)}: {self.message}"
+
+def matches_type(value: Any, expected: Union[str, List[str]]) -> bool:
+    names = [expected] if isinstance(expected, str) else expected
+    for name in names:
+        if isinstance(value, bool) and name in ("integer", "number"):
+            continue
+        if isinstance(value, TYPES[name]):
+            return True
+    return False
+
+def validate(value: Any, schema: Dict[str, Any], path: Path = ()) -> List[SchemaError]:
+    """Check ``value`` against a JSON Schema subset: type, required, properties, items, enum, minItems and minLength"""
+    expected = schema.get("type")
+    if expected is not None and not matches_type(value, expected):
+        return [SchemaError(path, f"expected {expected}, got {type(value).__name__}")]
+
+    errors: List[SchemaError] = []
+    if "enum" in schema and value not in schema["enum"]:
+        errors.append(SchemaError(path, f"must be one of {schema['enum']}"))
+    if isinstance(value, dict):
+        for key in schema.get("required", ()):
+            if key not in value:
+                errors.append(SchemaError(path + (key,), "missing required property"))
+        for key, subschema in schema.get("properties", {}).items():
+            if key in value:
+                errors.extend(validate(value[key], subschema, path + (key,)))
+    elif isinstance(value, list):
+        if len(value) < schema.get("minItems", 0):
+            errors.append(SchemaError(path, f"needs at least {schema['minItems']} items"))
+        if "items" in schema:
+            for index, item in enumerate(value):
+                errors.extend(validate(item, schema["items"], path + (index,)))
+    elif isinstance(value, str) and len(value) < schema.get("minLength", 0):
+        errors.append(SchemaError(path, "must not be empty"))
+    return errors
+
+def schema_at(schema: Dict[str, Any], path: Path) -> Dict[str, Any]:
+    """The part of ``schema`` that describes the value at ``path``"""
+    for part in path:
+        schema = schema.get("items", {}) if isinstance(part, int) else schema.get("properties", {}).get(part, {})
+    return schema
+
+def value_at(value: Any, path: Path) -> Any:
+    """The value at ``path``, or None where it is missing"""
+    for part in path:
+        try:
+            value = value[part]
+        except (KeyError, IndexError, TypeError):
+            return None
+    return value
+
+def replace_at(value: Any, path: Path, fragment: Any) -> Any:
+    """``value`` with the value at ``path`` replaced by ``fragment``, creating it if missing"""
+    if not path:
+        return fragment
+    head, rest = path[0], path[1:]
+    if isinstance(head, int) and isinstance(value, list):
+        items = list(value)
+        if head < len(items):
+            items[head] = replace_at(items[head], rest, fragment)
+        else:
+            items.append(replace_at(None, rest, fragment))
+        return items
+    mapping = dict(value) if isinstance(value, dict) else {}
+    mapping[head] = replace_at(mapping.get(head), rest, fragment)
+    return mapping
+
+def repair_unit(path: Path) -> Path:
+    """The smallest self-contained part around an error: one array element or one top-level property"""
+    for index, part in enumerate(path[:2]):
+        if isinstance(part, int):
+            return path[:index + 1]
+    return path[:1]
+
+async def repair_fragment(backend: LLMBackend, document: Any, schema: Dict[str, Any], path: Path,
+                          errors: List[SchemaError], context: str = "") -> Any:
+    """Ask the model for a corrected version of just the value at ``path``"""
+    budget = budget_for("repair")
+    current = value_at(document, path)
+    prompt = assemble([
+        PromptSection("instructions", [
+            f"Part of a JSON document, at {format_path(path)}, does not match its schema.",
+            "Problems:",
+            *(f"- {error}" for error in errors),
+            f"Schema for this part: {json.dumps(schema_at(schema, path))}",
+            f"Current value: {json.dumps(current) if current is not None else 'missing'}",
+            'Return {"value": <the corrected value>}, keeping everything that was already valid.'
+        ]),
+        PromptSection.from_text("context", context, title="The document was generated from:",
+                                priority=1, min_lines=1)
+    ], budget.max_input_tokens - JSON_WRAPPER_TOKENS)
+    response = await backend.get_json_response(prompt, max_tokens=budget.max_output_tokens)
+    repaired, _ = parse_json(response)
+    if not isinstance(repaired, dict) or "value" not in repaired:
+        raise ValueError(f"Repair of {format_path(path)} returned no value")
+    return repaired["value"]
+
+async def repair_fragments(backend: LLMBackend, document: Any, schema: Dict[str, Any],
+                           context: str = "", max_rounds: int = 2) -> Any:
+    """Fix the parts of ``document`` that fail ``schema``, one small request per failing part.
+
+    Raises ValueError if the document still fails after ``max_rounds``.
+    """
+    errors = validate(document, schema)
+    for _ in range(max_rounds):
+        if not errors:
+            return document
+        units: Dict[Path, List[SchemaError]] = {}
+        for error in errors:
+            units.setdefault(repair_unit(error.path), []).append(error)
+        # A part inside another failing part is repaired along with it
+        for path in [path for path in units if any(path[:len(other)] == other != path for other in units)]:
+            outer = next(other for other in units if path[:len(other)] == other != path)
+            units[outer].extend(units.pop(path))
+        console.print(f"[yellow]Repairing {', '.join(format_path(path) for path in units)}[/yellow]")
+        fragments = await asyncio.gather(*(
+            repair_fragment(backend, document, schema, path, unit_errors, context)
+            for path, unit_errors in units.items()
+        ), return_exceptions=True)
+        for path, fragment in zip(units, fragments):
+            if isinstance(fragment, Exception):
+                console.print(f"[red]Repair of {format_path(path)} failed: {str(fragment)}[/red]")
+            else:
+                document = replace_at(document, path, fragment)
+        errors = validate(document, schema)
+    if errors:
+        raise ValueError("Invalid JSON: " + "; ".join(str(error) for error in errors[:10]))
+    return document
@@ -0,0 +1,67 @@
+import time
+from typing import Optional
+
+class JsonObjectEnd:
+    """Watches streamed text and reports when the first top-level JSON object is complete.
+
+    Each call scans only the new text, tracking brace depth and whether
+    the scanner is inside a string, so checking a long response costs
+    one pass in total.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escaped = False
+        self.complete = False
+
+    def __call__(self, delta: str) -> bool:
+        """Feed the next piece of text; True once the object has closed"""
+        if self.complete:
+            return True
+        for char in delta:
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = self.started
+            elif char in "{[":
+                self.started = self.started or char == "{"
+                if self.started:
+                    self.depth += 1
+            elif char in "}]" and self.started:
+                self.depth -= 1
+                if self.depth == 0:
+                    self.complete = True
+                    return True
+        return False
+
+class StreamTimer:
+    """Time to first token and total duration of one streamed call"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.first_token: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    def token(self) -> None:
+        """Note that text arrived"""
+        if self.first_token is None:
+            self.first_token = time.monotonic()
+
+    def finish(self) -> None:
+        self.finished = time.monotonic()
+        self.token()
+
+    @property
+    def time_to_first_token(self) -> Optional[float]:
+        return None if self.first_token is None else self.first_token - self.started
+
+    @property
+    def duration(self) -> Optional[float]:
+        return None if self.finished is None else self.finished - self.started
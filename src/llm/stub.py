@@ -0,0 +1,72 @@
+import json
+import hashlib
+from typing import Any, Callable, Dict, List, Optional
+
+from .interface import LLMBackend, LLMRequest, LLMResponse
+
+def stub_value(schema: Dict[str, Any], digest: str, name: str = "value", index: int = 0) -> Any:
+    """Smallest deterministic value satisfying a JSON Schema subset.
+
+    The ``index``-th array item takes the ``index``-th enum value, so a
+    list of one entry per agent names every agent once.
+    """
+    kind = schema.get("type")
+    kind = kind[0] if isinstance(kind, list) else kind
+    if "enum" in schema:
+        return schema["enum"][index % len(schema["enum"])]
+    if kind == "object":
+        return {
+            key: stub_value(schema.get("properties", {}).get(key, {}), digest, key, index)
+            for key in schema.get("required", ())
+        }
+    if kind == "array":
+        return [stub_value(schema.get("items", {}), digest, name, i) for i in range(schema.get("minItems", 0))]
+    if kind in ("integer", "number"):
+        return 0
+    if kind == "boolean":
+        return False
+    return f"stub {name} {digest}"
+
+class StubBackend(LLMBackend):
+    """In-process deterministic backend for tests and offline runs.
+
+    Returns ``responder(request)`` if given, otherwise a small JSON object
+    derived from a hash of the request so the same prompt always gets the
+    same answer. Forced tool calls get the smallest arguments that satisfy
+    the tool's schema.
+    """
+
+    def __init__(self, responder: Optional[Callable[[LLMRequest], str]] = None,
+                 model: str = "stub"):
+        self.model = model
+        self.responder = responder
+        self.requests: List[LLMRequest] = []
+
+    async def complete(self, request: LLMRequest) -> LLMResponse:
+        """Answer the request without any I/O"""
+        self.requests.append(request)
+        prompt = request.messages[-1]["content"] if request.messages else ""
+        if not isinstance(prompt, str):
+            prompt = json.dumps(prompt, sort_keys=True)
+
+        digest = hashlib.sha256(prompt.encode()).hexdigest()[:12]
+        tool = next((tool for tool in request.tools if tool["name"] == request.tool_choice), None)
+        tool_input = None
+        if self.responder:
+            text = self.responder(request)
+        elif tool:
+            tool_input = stub_value(tool["input_schema"], digest)
+            text = json.dumps(tool_input)
+        else:
+            text = json.dumps({
+                "action": f"stub action {digest}",
+                "thought": "Deterministic stub response"
+            })
+
+        return LLMResponse(
+            text=text,
+            tool_input=tool_input,
+            model=request.model or self.model,
+            input_tokens=len(prompt) // 4,
+            output_tokens=len(text) // 4
+        )
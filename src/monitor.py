@@ -1,12 +1,20 @@
 import asyncio
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from rich.console import Console
 from rich.live import Live
 from rich.table import Table
 from rich.panel import Panel
 from rich.layout import Layout
-from .state.interface import WorldState, Event
+from .state.interface import WorldState, Event, EventType, OverflowPolicy
+from .llm import LLMResponse
+from .actions import AgentAction
+
+def describe_action(content: Any) -> str:
+    """One readable line for an action's content: verb, message and who it was for"""
+    action = AgentAction.from_content(str(content))
+    targets = f" -> {', '.join(action.targets)}" if action.targets else ""
+    return f"{action.verb}{targets}: {action.message}"
 
 class WorldMonitor:
     def __init__(self, world_id: str, state: WorldState):
@@ -16,6 +24,9 @@ class WorldMonitor:
         self.events = []
         self.max_events = 20  # Show more events
         self.agent_states = {}
+        self.topics = ["agent_*", "world_*", "state_changed:agent_*"]
+        self.streaming: Dict[str, str] = {}  # Agent -> text of the decision streaming in
+        self.timings: Dict[str, LLMResponse] = {}  # Agent -> its last decision call
         
     def create_layout(self) -> Layout:
         """Create the display layout"""
@@ -50,18 +61,34 @@ class WorldMonitor:
         agents_table.add_column("Name", width=30)
         agents_table.add_column("Status", width=10)
         agents_table.add_column("Last Action", width=60)
+        agents_table.add_column("TTFT", width=7)
+        agents_table.add_column("Tok/s", width=6)
         
         for agent_id, state in self.agent_states.items():
+            timing = self.timings.get(agent_id)
+            ttft = timing.time_to_first_token if timing else None
+            rate = timing.tokens_per_second if timing else None
             agents_table.add_row(
                 agent_id,
                 state.get("name", "Unknown"),
                 "Active" if state.get("active", False) else "Inactive",
-                state.get("last_action", "No action")[:60] + "..." if state.get("last_action", "") else "No action"
+                describe_action(state["last_action"])[:60] + "..." if state.get("last_action", "") else "No action",
+                f"{ttft:.2f}s" if ttft is not None else "-",
+                f"{rate:.0f}" if rate else "-"
             )
         
+        # Decisions still streaming in, newest text last
+        streaming_table = Table(show_header=True, header_style="bold magenta")
+        streaming_table.add_column("Agent", width=20)
+        streaming_table.add_column("Deciding", width=120)
+        for agent_id, text in self.streaming.items():
+            text = " ".join(text.split())
+            streaming_table.add_row(agent_id, "..." + text[-117:] if len(text) > 120 else text)
+        
         # Combine in layout
         layout.split_column(
             Panel(events_table, title="Events Log", border_style="cyan"),
+            Panel(streaming_table, title="Streaming", border_style="yellow"),
             Panel(agents_table, title="Agent Status", border_style="green")
         )
         
@@ -70,13 +97,18 @@ class WorldMonitor:
     async def handle_event(self, event: Event):
         """Process and display new events"""
         time = datetime.now().strftime("%H:%M:%S")
+
+        # State changes only refresh the agent table
+        if event.type == EventType.STATE_CHANGED:
+            self.agent_states = (await self.state.snapshot()).agents
+            return
         
         # Create event record
         event_record = {
             "time": time,
             "source": event.source,
             "type": event.type,
-            "action": str(event.data.get("action", {}).get("content", "No content"))
+            "action": describe_action(event.data.get("action", {}).get("content", "No content"))
         }
         
         # Add to events list
@@ -85,23 +117,35 @@ class WorldMonitor:
             self.events = self.events[-self.max_events:]
         
         # Print event to console
-        if event.type == "agent_action":
+        if event.type == EventType.AGENT_ACTION:
             self.console.print(f"\n[cyan]{time} - {event.source}:[/cyan]")
             self.console.print(event_record["action"])
         
         # Update agent states
-        self.agent_states = await self.state.get_agents() or {}
+        self.agent_states = (await self.state.snapshot()).agents
+
+    def handle_stream(self, agent_id: str, text: Optional[str], response: Optional[LLMResponse]):
+        """Show an agent's decision while it streams; add to a world's ``stream_listeners``"""
+        if text is not None:
+            self.streaming[agent_id] = self.streaming.get(agent_id, "") + text
+            return
+        # The decision ended, successfully or not
+        self.streaming.pop(agent_id, None)
+        if response is not None:
+            self.timings[agent_id] = response
 
     async def start(self):
         """Start monitoring the world"""
-        await self.state.subscribe("monitor", self.handle_event)
-        self.agent_states = await self.state.get_agents() or {}
+        # The display only needs recent events, so never hold up publishers
+        await self.state.subscribe("monitor", self.handle_event, policy=OverflowPolicy.DROP_OLDEST,
+                                   maxsize=self.max_events, topics=self.topics)
+        self.agent_states = (await self.state.snapshot()).agents
         
         try:
-            with Live(self.create_layout(), refresh_per_second=2) as live:
+            with Live(self.create_layout(), refresh_per_second=4) as live:
                 while True:
                     live.update(self.create_layout())
-                    await asyncio.sleep(0.5)  # Update twice per second
+                    await asyncio.sleep(0.25)  # Fast enough to follow streaming text
         except Exception as e:
             self.console.print(f"[red]Monitor error: {str(e)}[/red]")
             raise
\ No newline at end of file
@@ -0,0 +1,143 @@
+import json
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from .state.interface import WorldState, Event, EventType
+
+GROUP_KEYS = ("group", "team", "department")  # Agent properties that put agents in the same group
+
+def summarize_action(event: Event, limit: int = 160) -> str:
+    """One line describing an agent action event"""
+    return summarize_content(event.data.get("action", {}).get("content", ""), limit)
+
+def summarize_content(content: Any, limit: int = 160) -> str:
+    """One line from an action's content: its "message" (or older "action") field if it is JSON, else the text"""
+    try:
+        parsed = json.loads(content)
+        if isinstance(parsed, dict):
+            content = parsed.get("message") or parsed.get("action") or content
+    except (TypeError, ValueError):
+        pass
+    content = " ".join(str(content).split())
+    return content[:limit] + "..." if len(content) > limit else content
+
+class RelevanceIndex:
+    """Who matters to whom in a world.
+
+    Agents are linked by configured relationships (in both directions),
+    by sharing a group, team or department, and by recent targeted
+    interactions. ``neighbourhood`` walks those links breadth-first for
+    up to ``hops`` hops and stops after ``max_peers`` agents, so what an
+    agent observes stays the same size however large the world grows.
+    Everyone else is represented by a few ``headlines``: the latest
+    actions from outside the neighbourhood.
+    """
+
+    def __init__(self, hops: int = 2, max_peers: int = 8, max_headlines: int = 5,
+                 max_partners: int = 8):
+        self.hops = hops
+        self.max_peers = max_peers
+        self.max_headlines = max_headlines
+        self.max_partners = max_partners
+        self.links: Dict[str, List[str]] = {}
+        self.groups: Dict[str, List[str]] = {}
+        self.member_of: Dict[str, List[str]] = {}
+        self.partners: Dict[str, "OrderedDict[str, None]"] = {}  # Most recent interaction last
+        self.recent: Deque[Tuple[int, str, str]] = deque(maxlen=max(50, max_headlines * 10))
+        self.last_seq = 0
+
+    def _link(self, a: str, b: str) -> None:
+        links = self.links.setdefault(a, [])
+        if b not in links:
+            links.append(b)
+
+    def add_agent(self, agent_id: str, info: Optional[Dict[str, Any]] = None) -> None:
+        """Index an agent's relationships and groups from its config entry"""
+        self.links.setdefault(agent_id, [])
+        if not info:
+            return
+        for relationship in info.get("relationships", []):
+            if isinstance(relationship, dict) and relationship.get("to") and relationship["to"] != agent_id:
+                self._link(agent_id, relationship["to"])
+                self._link(relationship["to"], agent_id)
+
+        properties = info.get("properties") or {}
+        for key in GROUP_KEYS:
+            group = properties.get(key) if isinstance(properties, dict) else None
+            if isinstance(group, str) and group:
+                name = f"{key}:{group.lower()}"
+                members = self.groups.setdefault(name, [])
+                if agent_id not in members:
+                    members.append(agent_id)
+                    self.member_of.setdefault(agent_id, []).append(name)
+
+    def record_interaction(self, a: str, b: str) -> None:
+        """Note that two agents just dealt with each other"""
+        for one, other in ((a, b), (b, a)):
+            partners = self.partners.setdefault(one, OrderedDict())
+            partners.pop(other, None)
+            partners[other] = None
+            if len(partners) > self.max_partners:
+                partners.popitem(last=False)
+
+    def record_event(self, event: Event) -> None:
+        """Update headlines and interactions from an agent action"""
+        if event.type != EventType.AGENT_ACTION or event.seq <= self.last_seq:
+            return
+        self.recent.append((event.seq, event.source, summarize_action(event)))
+        self.last_seq = event.seq
+        for target in event.targets or ():
+            if target != event.source:
+                self.record_interaction(event.source, target)
+
+    async def receive(self, event: Event) -> None:
+        """Subscription callback keeping the index current as actions are published"""
+        self.record_event(event)
+
+    async def catch_up(self, state: WorldState) -> None:
+        """Replay agent actions already in the history, e.g. after a restore"""
+        for event in await state.query_events(type=EventType.AGENT_ACTION):
+            self.record_event(event)
+
+    def neighbours(self, agent_id: str) -> Iterable[str]:
+        """Directly relevant agents, most relevant first"""
+        yield from reversed(self.partners.get(agent_id, ()))
+        yield from self.links.get(agent_id, ())
+        for group in self.member_of.get(agent_id, ()):
+            yield from self.groups[group]
+
+    def neighbourhood(self, agent_id: str) -> List[str]:
+        """Up to ``max_peers`` agents within ``hops`` hops, nearest first"""
+        seen: Set[str] = {agent_id}
+        result: List[str] = []
+        frontier = [agent_id]
+        for _ in range(self.hops):
+            next_frontier = []
+            for current in frontier:
+                for peer in self.neighbours(current):
+                    if peer in seen:
+                        continue
+                    seen.add(peer)
+                    result.append(peer)
+                    next_frontier.append(peer)
+                    if len(result) >= self.max_peers:
+                        return result
+            frontier = next_frontier
+        return result
+
+    def headlines(self, agent_id: str, exclude: Optional[Iterable[str]] = (),
+                  since_seq: Optional[int] = None) -> List[str]:
+        """Latest actions from agents outside ``exclude``, one per agent, optionally only after ``since_seq``"""
+        skip = set(exclude or ())
+        skip.add(agent_id)
+        lines = []
+        for seq, source, summary in reversed(self.recent):
+            if since_seq is not None and seq <= since_seq:
+                break
+            if source in skip:
+                continue
+            skip.add(source)
+            lines.append(f"{source}: {summary}")
+            if len(lines) >= self.max_headlines:
+                break
+        return lines
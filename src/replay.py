@@ -0,0 +1,170 @@
+import json
+import hashlib
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from .llm import LLMBackend, LLMRequest, LLMResponse
+from .llm.cache import request_key
+from .state.interface import Event
+from .state.routing import event_subject
+
+def event_signature(event: Event) -> List[Any]:
+    """What must match for two events to count as the same: type, targets and a digest of the data"""
+    payload = json.dumps(event.data, sort_keys=True, default=str)
+    return [
+        str(event.type),
+        sorted(event.targets) if event.targets else None,
+        hashlib.sha256(payload.encode()).hexdigest()[:16]
+    ]
+
+def event_streams(events: List[Event]) -> Dict[str, List[List[Any]]]:
+    """Split events by source and subject, the orders that are deterministic under concurrency"""
+    streams: Dict[str, List[List[Any]]] = defaultdict(list)
+    for event in events:
+        streams[f"{event.source}:{event_subject(event)}"].append(event_signature(event))
+    return dict(streams)
+
+@dataclass
+class Divergence:
+    kind: str  # "request", "event" or "missing_event"
+    world_id: Optional[str]
+    stream: str
+    position: int
+    expected: Any
+    actual: Any
+
+    def __str__(self) -> str:
+        where = f"{self.world_id}/{self.stream}" if self.world_id else self.stream
+        return f"{self.kind} divergence at {where}[{self.position}]: expected {self.expected}, got {self.actual}"
+
+class Recording:
+    """LLM responses and per-world event streams captured from one run"""
+
+    def __init__(self):
+        self.responses: List[Dict[str, str]] = []
+        self.events: Dict[str, Dict[str, List[List[Any]]]] = {}
+        self.ticks: Dict[str, int] = {}
+
+    def save(self, path: str) -> None:
+        """Write the recording as JSON lines"""
+        with open(path, "w") as f:
+            for response in self.responses:
+                f.write(json.dumps({"kind": "llm", **response}) + "\n")
+            for world_id, streams in self.events.items():
+                f.write(json.dumps({
+                    "kind": "world",
+                    "world_id": world_id,
+                    "ticks": self.ticks.get(world_id, 0),
+                    "streams": streams
+                }) + "\n")
+
+    @classmethod
+    def load(cls, path: str) -> "Recording":
+        """Read a recording written by ``save``"""
+        recording = cls()
+        with open(path) as f:
+            for line in f:
+                record = json.loads(line)
+                kind = record.pop("kind")
+                if kind == "llm":
+                    recording.responses.append(record)
+                elif kind == "world":
+                    recording.events[record["world_id"]] = record["streams"]
+                    recording.ticks[record["world_id"]] = record["ticks"]
+        return recording
+
+class RecordingBackend(LLMBackend):
+    """Passes requests through and keeps every response for later replay"""
+
+    def __init__(self, backend: LLMBackend, recording: Recording):
+        self.backend = backend
+        self.model = backend.model
+        self.recording = recording
+
+    async def complete(self, request: LLMRequest) -> LLMResponse:
+        return self.record(request, await self.backend.complete(request))
+
+    async def stream(self, request: LLMRequest, on_text: Optional[Callable[[str], None]] = None,
+                     stop: Optional[Callable[[str], bool]] = None) -> LLMResponse:
+        return self.record(request, await self.backend.stream(request, on_text, stop))
+
+    def record(self, request: LLMRequest, response: LLMResponse) -> LLMResponse:
+        model = request.model or self.model
+        self.recording.responses.append({
+            "key": request_key(model, request),
+            "request_model": model,
+            "model": response.model,
+            "text": response.text
+        })
+        return response
+
+    async def discard(self, request: LLMRequest) -> None:
+        await self.backend.discard(request)
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+class ReplayBackend(LLMBackend):
+    """Answers from a Recording without any network calls.
+
+    Requests are matched by their cache key, so concurrent agents get
+    their own responses regardless of scheduling order. A request that
+    was never recorded is a divergence; it is answered with the next
+    unused recorded response so the run can continue.
+    """
+
+    def __init__(self, recording: Recording):
+        # Keys were computed with the recorded backend's model name
+        responses = recording.responses
+        self.model = responses[0]["request_model"] if responses else "replay"
+        self.recording = recording
+        self.by_key: Dict[str, Deque[int]] = defaultdict(deque)
+        for position, response in enumerate(recording.responses):
+            self.by_key[response["key"]].append(position)
+        self.used = [False] * len(recording.responses)
+        self.next_unused = 0
+        self.requests = 0
+        self.divergences: List[Divergence] = []
+
+    async def complete(self, request: LLMRequest) -> LLMResponse:
+        key = request_key(request.model or self.model, request)
+        self.requests += 1
+        queue = self.by_key.get(key)
+        while queue and self.used[queue[0]]:
+            queue.popleft()
+
+        if queue:
+            position = queue.popleft()
+        else:
+            while self.next_unused < len(self.used) and self.used[self.next_unused]:
+                self.next_unused += 1
+            if self.next_unused >= len(self.used):
+                raise RuntimeError(f"Replay exhausted: no recorded response left for request {key[:12]}")
+            position = self.next_unused
+            self.divergences.append(Divergence(
+                kind="request", world_id=None, stream="llm", position=self.requests - 1,
+                expected=self.recording.responses[position]["key"][:12], actual=key[:12]
+            ))
+
+        self.used[position] = True
+        response = self.recording.responses[position]
+        return LLMResponse(text=response["text"], model=response["model"], cached=True)
+
+def compare_streams(world_id: str, expected: Dict[str, List[List[Any]]],
+                    actual: Dict[str, List[List[Any]]]) -> List[Divergence]:
+    """First difference in every event stream of a world"""
+    divergences = []
+    for stream in sorted(set(expected) | set(actual)):
+        recorded, replayed = expected.get(stream, []), actual.get(stream, [])
+        for position in range(max(len(recorded), len(replayed))):
+            want = recorded[position] if position < len(recorded) else None
+            got = replayed[position] if position < len(replayed) else None
+            if want != got:
+                divergences.append(Divergence(
+                    kind="missing_event" if got is None else "event",
+                    world_id=world_id, stream=stream, position=position,
+                    expected=want, actual=got
+                ))
+                break
+    return divergences
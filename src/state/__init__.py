@@ -1,4 +1,23 @@
-from .interface import WorldState, Event
+from .interface import WorldState, Event, EventType, OverflowPolicy
 from .memory import InMemoryState
+from .sqlite import SQLiteState
+from .pmap import PersistentMap
+from .snapshot import StateSnapshot, Changes
+from .codec import encode_event, decode_event
+from .eventlog import EventLog, FsyncPolicy
 
-__all__ = ['WorldState', 'Event', 'InMemoryState']
\ No newline at end of file
+__all__ = [
+    'WorldState',
+    'Event',
+    'EventType',
+    'OverflowPolicy',
+    'InMemoryState',
+    'SQLiteState',
+    'PersistentMap',
+    'StateSnapshot',
+    'Changes',
+    'encode_event',
+    'decode_event',
+    'EventLog',
+    'FsyncPolicy'
+]
\ No newline at end of file
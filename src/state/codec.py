@@ -0,0 +1,184 @@
+"""Versioned binary encoding for events.
+
+Each event is one MessagePack array::
+
+    [version, type, seq, timestamp, source, targets, data]
+
+where ``type`` is a small integer for built-in ``EventType`` members and a
+string for custom types. The encoder writes standard MessagePack, so
+records can be read by any MessagePack library.
+"""
+import struct
+from typing import Any, List, Tuple
+
+from .interface import Event, EventType
+
+FORMAT_VERSION = 1
+
+# Codes are part of the on-disk format: append new types, never renumber
+EVENT_TYPE_CODES = {
+    EventType.STATE_CHANGED: 1,
+    EventType.AGENT_SPAWNED: 2,
+    EventType.AGENT_ACTION: 3,
+    EventType.WORLD_CREATED: 4,
+    EventType.WORLD_STARTED: 5,
+    EventType.WORLD_STOPPED: 6
+}
+EVENT_TYPES_BY_CODE = {code: event_type for event_type, code in EVENT_TYPE_CODES.items()}
+
+def pack(value: Any) -> bytes:
+    """Encode a JSON-like value as MessagePack"""
+    out = bytearray()
+    _pack(value, out)
+    return bytes(out)
+
+def _pack_length(length: int, fix_tag: int, fix_max: int, tags: Tuple[int, int, int], out: bytearray) -> None:
+    if length <= fix_max:
+        out.append(fix_tag | length)
+    elif tags[0] and length <= 0xFF:
+        out += struct.pack(">BB", tags[0], length)
+    elif length <= 0xFFFF:
+        out += struct.pack(">BH", tags[1], length)
+    else:
+        out += struct.pack(">BI", tags[2], length)
+
+def _pack(value: Any, out: bytearray) -> None:
+    if value is None:
+        out.append(0xC0)
+    elif value is True:
+        out.append(0xC3)
+    elif value is False:
+        out.append(0xC2)
+    elif isinstance(value, int):
+        if 0 <= value <= 0x7F:
+            out.append(value)
+        elif -32 <= value < 0:
+            out += struct.pack(">b", value)
+        elif 0 <= value <= 0xFFFFFFFF:
+            out += struct.pack(">BI", 0xCE, value)
+        elif 0 <= value <= 0xFFFFFFFFFFFFFFFF:
+            out += struct.pack(">BQ", 0xCF, value)
+        elif -0x80000000 <= value < 0:
+            out += struct.pack(">Bi", 0xD2, value)
+        else:
+            out += struct.pack(">Bq", 0xD3, value)
+    elif isinstance(value, float):
+        out += struct.pack(">Bd", 0xCB, value)
+    elif isinstance(value, str):
+        data = value.encode("utf-8")
+        _pack_length(len(data), 0xA0, 31, (0xD9, 0xDA, 0xDB), out)
+        out += data
+    elif isinstance(value, (bytes, bytearray)):
+        _pack_length(len(value), 0, -1, (0xC4, 0xC5, 0xC6), out)
+        out += value
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        items = sorted(value, key=str) if isinstance(value, (set, frozenset)) else value
+        _pack_length(len(items), 0x90, 15, (0, 0xDC, 0xDD), out)
+        for item in items:
+            _pack(item, out)
+    elif isinstance(value, dict):
+        _pack_length(len(value), 0x80, 15, (0, 0xDE, 0xDF), out)
+        for key, item in value.items():
+            _pack(key, out)
+            _pack(item, out)
+    else:
+        _pack(str(value), out)
+
+def unpack(data: bytes) -> Any:
+    """Decode a single MessagePack value"""
+    value, _ = _unpack(memoryview(data), 0)
+    return value
+
+def _unpack(buf: memoryview, pos: int) -> Tuple[Any, int]:
+    tag = buf[pos]
+    pos += 1
+    if tag <= 0x7F:
+        return tag, pos
+    if tag >= 0xE0:
+        return tag - 0x100, pos
+    if 0xA0 <= tag <= 0xBF:
+        return _read_str(buf, pos, tag & 0x1F)
+    if 0x90 <= tag <= 0x9F:
+        return _read_array(buf, pos, tag & 0x0F)
+    if 0x80 <= tag <= 0x8F:
+        return _read_map(buf, pos, tag & 0x0F)
+    if tag == 0xC0:
+        return None, pos
+    if tag == 0xC2:
+        return False, pos
+    if tag == 0xC3:
+        return True, pos
+
+    fixed = {
+        0xCA: ">f", 0xCB: ">d",
+        0xCC: ">B", 0xCD: ">H", 0xCE: ">I", 0xCF: ">Q",
+        0xD0: ">b", 0xD1: ">h", 0xD2: ">i", 0xD3: ">q"
+    }
+    if tag in fixed:
+        fmt = fixed[tag]
+        return struct.unpack_from(fmt, buf, pos)[0], pos + struct.calcsize(fmt)
+
+    sized = {
+        0xD9: (">B", _read_str), 0xDA: (">H", _read_str), 0xDB: (">I", _read_str),
+        0xC4: (">B", _read_bin), 0xC5: (">H", _read_bin), 0xC6: (">I", _read_bin),
+        0xDC: (">H", _read_array), 0xDD: (">I", _read_array),
+        0xDE: (">H", _read_map), 0xDF: (">I", _read_map)
+    }
+    if tag in sized:
+        fmt, reader = sized[tag]
+        length = struct.unpack_from(fmt, buf, pos)[0]
+        return reader(buf, pos + struct.calcsize(fmt), length)
+
+    raise ValueError(f"Unsupported MessagePack tag 0x{tag:02x}")
+
+def _read_str(buf: memoryview, pos: int, length: int) -> Tuple[str, int]:
+    return str(buf[pos:pos + length], "utf-8"), pos + length
+
+def _read_bin(buf: memoryview, pos: int, length: int) -> Tuple[bytes, int]:
+    return bytes(buf[pos:pos + length]), pos + length
+
+def _read_array(buf: memoryview, pos: int, length: int) -> Tuple[List[Any], int]:
+    items = []
+    for _ in range(length):
+        item, pos = _unpack(buf, pos)
+        items.append(item)
+    return items, pos
+
+def _read_map(buf: memoryview, pos: int, length: int) -> Tuple[dict, int]:
+    items = {}
+    for _ in range(length):
+        key, pos = _unpack(buf, pos)
+        value, pos = _unpack(buf, pos)
+        items[key] = value
+    return items, pos
+
+def encode_event(event: Event) -> bytes:
+    """Serialize an event to its versioned binary form"""
+    type_code = EVENT_TYPE_CODES.get(event.type, str(event.type))
+    return pack([
+        FORMAT_VERSION,
+        type_code,
+        event.seq,
+        event.timestamp,
+        event.source,
+        sorted(event.targets) if event.targets else None,
+        event.data
+    ])
+
+def decode_event(data: bytes) -> Event:
+    """Rebuild an event from ``encode_event`` output"""
+    record = unpack(data)
+    version = record[0]
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported event format version {version}")
+
+    _, type_code, seq, timestamp, source, targets, event_data = record
+    event_type = EVENT_TYPES_BY_CODE[type_code] if isinstance(type_code, int) else type_code
+    return Event(
+        type=event_type,
+        data=event_data,
+        source=source,
+        targets=set(targets) if targets else None,
+        seq=seq,
+        timestamp=timestamp
+    )
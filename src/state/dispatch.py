@@ -0,0 +1,143 @@
+import asyncio
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Set
+from rich.console import Console
+
+from .interface import Event, EventType, OverflowPolicy
+from .routing import EventRouter
+
+console = Console()
+
+def default_coalesce_key(event: Event) -> Hashable:
+    """Events about the same state key, or of the same type from the same source, replace each other"""
+    if event.type == EventType.STATE_CHANGED:
+        return (event.type, event.data.get("key"))
+    return (event.type, event.source)
+
+class Subscription:
+    """Bounded queue plus a dedicated consumer task for one subscriber.
+
+    The publisher only enqueues, so a slow callback delays its own queue
+    and nobody else's. When the queue is full the overflow policy decides
+    whether the publisher waits (``BLOCK``), the oldest pending event is
+    discarded (``DROP_OLDEST``), or a pending event with the same key is
+    replaced (``COALESCE``, falling back to dropping the oldest).
+    """
+
+    def __init__(self, subscriber_id: str, callback: Callable[[Event], Any],
+                 policy: OverflowPolicy = OverflowPolicy.BLOCK, maxsize: int = 1000,
+                 coalesce_key: Callable[[Event], Hashable] = default_coalesce_key):
+        self.subscriber_id = subscriber_id
+        self.callback = callback
+        self.policy = policy
+        self.maxsize = maxsize
+        self.coalesce_key = coalesce_key
+        self.pending: "OrderedDict[Hashable, Event]" = OrderedDict()
+        self.stats = {"delivered": 0, "dropped": 0, "coalesced": 0, "errors": 0, "max_depth": 0}
+        self._seq = 0  # Unique keys for events that are never coalesced
+        self._has_items = asyncio.Event()
+        self._has_space = asyncio.Event()
+        self._has_space.set()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._task = asyncio.create_task(self._consume())
+
+    @property
+    def depth(self) -> int:
+        """Events waiting to be delivered"""
+        return len(self.pending)
+
+    def _key(self, event: Event) -> Hashable:
+        if self.policy == OverflowPolicy.COALESCE:
+            return self.coalesce_key(event)
+        self._seq += 1
+        return self._seq
+
+    async def put(self, event: Event) -> None:
+        """Enqueue an event according to the overflow policy"""
+        key = self._key(event)
+
+        if key in self.pending:
+            # Newer event supersedes the pending one and moves to the back
+            del self.pending[key]
+            self.stats["coalesced"] += 1
+        elif len(self.pending) >= self.maxsize:
+            if self.policy == OverflowPolicy.BLOCK:
+                while len(self.pending) >= self.maxsize:
+                    self._has_space.clear()
+                    await self._has_space.wait()
+            else:
+                self.pending.popitem(last=False)
+                self.stats["dropped"] += 1
+
+        self.pending[key] = event
+        self.stats["max_depth"] = max(self.stats["max_depth"], len(self.pending))
+        self._idle.clear()
+        self._has_items.set()
+
+    async def _consume(self) -> None:
+        while True:
+            await self._has_items.wait()
+            while self.pending:
+                _, event = self.pending.popitem(last=False)
+                self._has_space.set()
+                try:
+                    await self.callback(event)
+                    self.stats["delivered"] += 1
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    console.print(f"[red]Subscriber {self.subscriber_id} failed on {event.type}: {str(e)}[/red]")
+            self._has_items.clear()
+            self._idle.set()
+
+    async def drain(self) -> None:
+        """Wait until every queued event has been delivered"""
+        await self._idle.wait()
+
+    def close(self) -> None:
+        """Stop the consumer task, discarding pending events"""
+        self._task.cancel()
+        self.pending.clear()
+        self._idle.set()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth and delivery counters"""
+        return {"depth": self.depth, "policy": self.policy.value, **self.stats}
+
+
+class EventDispatcher:
+    """Subscriptions plus the topic router, shared by the state backends"""
+
+    def __init__(self):
+        self.subscribers: Dict[str, Subscription] = {}
+        self.router = EventRouter()
+
+    def subscribe(self, subscriber_id: str, callback: Callable[[Event], Any],
+                  policy: OverflowPolicy = OverflowPolicy.BLOCK, maxsize: int = 1000,
+                  topics: Optional[Iterable[str]] = None) -> None:
+        if subscriber_id in self.subscribers:
+            self.subscribers[subscriber_id].close()
+        self.subscribers[subscriber_id] = Subscription(subscriber_id, callback, policy, maxsize)
+        self.router.add(subscriber_id, topics)
+
+    def unsubscribe(self, subscriber_id: str) -> None:
+        self.router.remove(subscriber_id)
+        subscription = self.subscribers.pop(subscriber_id, None)
+        if subscription:
+            subscription.close()
+
+    async def dispatch(self, event: Event) -> None:
+        """Queue an event for its targets and for subscribers whose topics match"""
+        for subscriber_id in self.router.route(event):
+            subscription = self.subscribers.get(subscriber_id)
+            if subscription:
+                await subscription.put(event)
+
+    async def drain(self, subscriber_ids: Optional[Set[str]] = None) -> None:
+        await asyncio.gather(*(
+            subscription.drain() for subscriber_id, subscription in list(self.subscribers.items())
+            if subscriber_ids is None or subscriber_id in subscriber_ids
+        ))
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        return {subscriber_id: subscription.metrics() for subscriber_id, subscription in self.subscribers.items()}
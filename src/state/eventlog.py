@@ -0,0 +1,301 @@
+import os
+import mmap
+import time
+import zlib
+import struct
+from bisect import bisect_right
+from enum import Enum
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+from rich.console import Console
+
+from .interface import Event, advance_sequence
+from .codec import encode_event, decode_event
+
+# Each record is framed as <payload length><crc32 of payload><payload>
+HEADER = struct.Struct("<II")
+SEGMENT_SUFFIX = ".seg"
+OFFSET_BITS = 40  # Locators pack (segment number, byte offset) into one int
+
+console = Console()
+
+class TornRecord(ValueError):
+    """A record running up to or past the end of its segment, as left by an interrupted write"""
+
+class CorruptRecord(ValueError):
+    """A record whose checksum does not match, with more data after it"""
+
+class UndecodableRecord(ValueError):
+    """An intact record this version cannot decode, e.g. one with an unknown event type"""
+
+class FsyncPolicy(Enum):
+    ALWAYS = "always"  # fsync after every flushed batch
+    INTERVAL = "interval"  # fsync at most every fsync_interval seconds
+    NEVER = "never"  # Leave it to the OS
+
+def make_locator(segment: int, offset: int) -> int:
+    return (segment << OFFSET_BITS) | offset
+
+def split_locator(locator: int) -> Tuple[int, int]:
+    return locator >> OFFSET_BITS, locator & ((1 << OFFSET_BITS) - 1)
+
+class Segment:
+    """One fixed-size log file plus its sparse seq -> offset index"""
+
+    def __init__(self, path: str, number: int):
+        self.path = path
+        self.number = number
+        self.size = os.path.getsize(path) if os.path.exists(path) else 0
+        self.first_seq: Optional[int] = None
+        self.index: List[Tuple[int, int]] = []  # (seq, offset) every index_interval records
+        self.records = 0
+        self.damaged = False  # Some records could not be read; never append to or truncate it
+        self._map: Optional[mmap.mmap] = None
+        self._mapped_size = 0
+
+    def view(self) -> Optional[mmap.mmap]:
+        """Read-only memory map covering everything flushed so far"""
+        if self.size == 0:
+            return None
+        if self._map is None or self._mapped_size != self.size:
+            self.close()
+            with open(self.path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapped_size = self.size
+        return self._map
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+class EventLog:
+    """Append-only event history split into fixed-size segment files.
+
+    Appends are buffered and written in batches. Reads go through
+    memory-mapped segments and a sparse index that records the offset
+    of every ``index_interval``-th event, so a scan from any sequence
+    number starts near the right place instead of at the beginning.
+    """
+
+    def __init__(self, directory: str, segment_size: int = 64 * 1024 * 1024,
+                 batch_size: int = 256, fsync: FsyncPolicy = FsyncPolicy.INTERVAL,
+                 fsync_interval: float = 1.0, index_interval: int = 64):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.index_interval = index_interval
+        self.segments: List[Segment] = []
+        self.count = 0
+        self.last_seq = 0
+        self._buffer = bytearray()
+        self._buffered = 0
+        self._file = None
+        self._last_fsync = time.monotonic()
+
+        os.makedirs(directory, exist_ok=True)
+        names = sorted(n for n in os.listdir(directory) if n.endswith(SEGMENT_SUFFIX))
+        for position, name in enumerate(names):
+            segment = Segment(os.path.join(directory, name), int(name[:-len(SEGMENT_SUFFIX)]))
+            self._rebuild_index(segment, last=position == len(names) - 1)
+            self.segments.append(segment)
+        if not self.segments:
+            self._new_segment(0)
+        elif self.segments[-1].damaged:
+            self._new_segment(self.segments[-1].number + 1)  # Keep new records clear of the damage
+        self._file = open(self.segments[-1].path, "ab")
+        advance_sequence(self.last_seq)
+
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self.directory, f"{number:012d}{SEGMENT_SUFFIX}")
+
+    def _new_segment(self, number: int) -> Segment:
+        segment = Segment(self._segment_path(number), number)
+        open(segment.path, "ab").close()
+        self.segments.append(segment)
+        return segment
+
+    def _rebuild_index(self, segment: Segment, last: bool) -> None:
+        """Scan a segment on open, dropping a torn record at the tail of the last one.
+
+        Only a write interrupted by a crash is dropped. Anything else that
+        cannot be read is skipped with a warning and left on disk.
+        """
+        for offset, next_offset, item in self._scan(segment, 0):
+            if isinstance(item, Event):
+                self._index_record(segment, item.seq, offset)
+            elif isinstance(item, TornRecord) and last and not segment.damaged:
+                segment.close()
+                with open(segment.path, "r+b") as f:
+                    f.truncate(offset)
+                segment.size = offset
+                console.print(f"[yellow]Dropped torn record at the end of {segment.path}[/yellow]")
+            else:
+                if not isinstance(item, UndecodableRecord):
+                    segment.damaged = True
+                console.print(f"[yellow]Skipped unreadable record at offset {offset} "
+                              f"of {segment.path}: {str(item)}[/yellow]")
+
+    def _index_record(self, segment: Segment, seq: int, offset: int) -> None:
+        if segment.first_seq is None:
+            segment.first_seq = seq
+        if segment.records % self.index_interval == 0:
+            segment.index.append((seq, offset))
+        segment.records += 1
+        self.count += 1
+        self.last_seq = max(self.last_seq, seq)
+
+    def append(self, event: Event) -> int:
+        """Buffer an event and return its locator"""
+        payload = encode_event(event)
+        record_size = HEADER.size + len(payload)
+
+        segment = self.segments[-1]
+        position = segment.size + len(self._buffer)
+        if position and position + record_size > self.segment_size:
+            self.flush()
+            self._file.close()
+            segment = self._new_segment(segment.number + 1)
+            self._file = open(segment.path, "ab")
+            position = 0
+
+        self._buffer += HEADER.pack(len(payload), zlib.crc32(payload))
+        self._buffer += payload
+        self._buffered += 1
+        self._index_record(segment, event.seq, position)
+
+        if self._buffered >= self.batch_size:
+            self.flush()
+        return make_locator(segment.number, position)
+
+    def flush(self) -> None:
+        """Write buffered records to the active segment"""
+        if self._buffer:
+            self._file.write(self._buffer)
+            self._file.flush()
+            self.segments[-1].size += len(self._buffer)
+            self._buffer.clear()
+            self._buffered = 0
+
+            now = time.monotonic()
+            if self.fsync == FsyncPolicy.ALWAYS or (
+                self.fsync == FsyncPolicy.INTERVAL and now - self._last_fsync >= self.fsync_interval
+            ):
+                os.fsync(self._file.fileno())
+                self._last_fsync = now
+
+    def _segment_by_number(self, number: int) -> Segment:
+        position = number - self.segments[0].number
+        return self.segments[position]
+
+    def _read_frame(self, view: mmap.mmap, offset: int, end: int) -> Tuple[bytes, int]:
+        if offset + HEADER.size > end:
+            raise TornRecord(f"Partial record header at offset {offset}")
+        length, checksum = HEADER.unpack_from(view, offset)
+        start = offset + HEADER.size
+        if start + length > end:
+            raise TornRecord(f"Record at offset {offset} runs past the end of the segment")
+        payload = view[start:start + length]
+        if zlib.crc32(payload) != checksum:
+            if start + length == end:
+                raise TornRecord(f"Checksum mismatch in the last record, at offset {offset}")
+            raise CorruptRecord(f"Checksum mismatch in record at offset {offset}")
+        return payload, start + length
+
+    def _read_record(self, view: mmap.mmap, offset: int) -> Tuple[Event, int]:
+        payload, next_offset = self._read_frame(view, offset, len(view))
+        return decode_event(payload), next_offset
+
+    def _scan(self, segment: Segment, offset: int) -> Iterator[Tuple[int, int, Union[Event, ValueError]]]:
+        """Walk a segment, yielding (offset, next offset, event or the reason it could not be read).
+
+        A corrupt record is stepped over using its length. A second one
+        means the lengths can no longer be trusted, so the walk stops
+        there, as it does at a torn record.
+        """
+        view = segment.view()
+        if view is None:
+            return
+        end = segment.size
+        corrupt = False
+        while offset < end:
+            try:
+                payload, next_offset = self._read_frame(view, offset, end)
+            except TornRecord as e:
+                yield offset, end, e
+                return
+            except CorruptRecord as e:
+                length, _ = HEADER.unpack_from(view, offset)
+                yield offset, offset + HEADER.size + length, e
+                if corrupt:
+                    return
+                corrupt = True
+                offset += HEADER.size + length
+                continue
+            try:
+                item: Union[Event, ValueError] = decode_event(payload)
+            except (ValueError, struct.error, KeyError) as e:
+                item = UndecodableRecord(f"Cannot decode record at offset {offset}: {e!r}")
+            yield offset, next_offset, item
+            offset = next_offset
+
+    def _iter_segment(self, segment: Segment, offset: int) -> Iterator[Tuple[int, int, Event]]:
+        """Readable records from ``offset`` on; the rest were reported when the log was opened"""
+        for record_offset, next_offset, item in self._scan(segment, offset):
+            if isinstance(item, Event):
+                yield record_offset, next_offset, item
+
+    def read(self, locator: int) -> Event:
+        """Fetch the event stored at a locator"""
+        number, offset = split_locator(locator)
+        segment = self._segment_by_number(number)
+        if segment is self.segments[-1] and offset >= segment.size:
+            self.flush()
+        event, _ = self._read_record(segment.view(), offset)
+        return event
+
+    def scan(self, since_seq: Optional[int] = None) -> Iterator[Event]:
+        """Iterate events in order, starting at the first with seq >= since_seq"""
+        for _, event in self.entries(since_seq):
+            yield event
+
+    def entries(self, since_seq: Optional[int] = None) -> Iterator[Tuple[int, Event]]:
+        """Iterate (locator, event) pairs in order, starting at the first with seq >= since_seq"""
+        self.flush()
+        segments = self.segments
+        start = 0
+        if since_seq is not None:
+            firsts = [s.first_seq if s.first_seq is not None else float("inf") for s in segments]
+            start = max(bisect_right(firsts, since_seq) - 1, 0)
+
+        for segment in segments[start:]:
+            offset = 0
+            if since_seq is not None and segment.index:
+                position = bisect_right(segment.index, (since_seq, float("inf"))) - 1
+                if position >= 0:
+                    offset = segment.index[position][1]
+            for record_offset, _, event in self._iter_segment(segment, offset):
+                if since_seq is None or event.seq >= since_seq:
+                    yield make_locator(segment.number, record_offset), event
+
+    def __len__(self) -> int:
+        return self.count
+
+    def stats(self) -> Dict[str, int]:
+        """Size of the log on disk"""
+        return {
+            "events": self.count,
+            "segments": len(self.segments),
+            "bytes": sum(s.size for s in self.segments) + len(self._buffer)
+        }
+
+    def close(self) -> None:
+        """Flush, fsync and unmap everything"""
+        self.flush()
+        if self._file and not self._file.closed:
+            if self.fsync != FsyncPolicy.NEVER:
+                os.fsync(self._file.fileno())
+            self._file.close()
+        for segment in self.segments:
+            segment.close()
@@ -0,0 +1,97 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional
+
+from .interface import Event
+
+class EventIndex:
+    """Secondary indexes over an event history, maintained incrementally.
+
+    Every indexed event gets a position. Per source, type and target the
+    index keeps an ascending array of positions, and per position the
+    event's timestamp and the locator the storage backend uses to fetch
+    it. A query bisects the time range once and then walks only the
+    smallest matching posting list. ``trim`` forgets the oldest events,
+    for histories that are themselves bounded.
+    """
+
+    def __init__(self):
+        self.offset = 0  # Position of the oldest event still indexed
+        self.locators = array("Q")
+        self.timestamps = array("d")  # Clamped to be non-decreasing so they can be bisected
+        self.by_source: Dict[str, array] = {}
+        self.by_type: Dict[str, array] = {}
+        self.by_target: Dict[str, array] = {}
+
+    def __len__(self) -> int:
+        return len(self.locators)
+
+    def add(self, event: Event, locator: int) -> None:
+        """Index an event stored at ``locator``"""
+        position = self.offset + len(self.locators)
+        self.locators.append(locator)
+        last = self.timestamps[-1] if self.timestamps else event.timestamp
+        self.timestamps.append(max(last, event.timestamp))
+
+        self.by_source.setdefault(event.source, array("Q")).append(position)
+        self.by_type.setdefault(str(event.type), array("Q")).append(position)
+        for target in event.targets or ():
+            self.by_target.setdefault(target, array("Q")).append(position)
+
+    def trim(self, count: int) -> None:
+        """Forget the oldest ``count`` events"""
+        count = min(count, len(self.locators))
+        if count <= 0:
+            return
+        del self.locators[:count]
+        del self.timestamps[:count]
+        self.offset += count
+        for index in (self.by_source, self.by_type, self.by_target):
+            for key in list(index):
+                positions = index[key]
+                cut = bisect_left(positions, self.offset)
+                if cut == len(positions):
+                    del index[key]
+                elif cut:
+                    del positions[:cut]
+
+    def query(self, source: Optional[str] = None, type: Optional[str] = None,
+              target: Optional[str] = None, since: Optional[float] = None,
+              until: Optional[float] = None, limit: Optional[int] = None,
+              newest_first: bool = False) -> List[int]:
+        """Locators of matching events, in time order (or newest first)"""
+        lo = self.offset + (bisect_left(self.timestamps, since) if since is not None else 0)
+        hi = self.offset + (bisect_right(self.timestamps, until) if until is not None else len(self.timestamps))
+        if lo >= hi:
+            return []
+
+        postings = []
+        for index, key in ((self.by_source, source), (self.by_type, type), (self.by_target, target)):
+            if key is not None:
+                positions = index.get(str(key))
+                if positions is None:
+                    return []
+                postings.append((positions, bisect_left(positions, lo), bisect_left(positions, hi)))
+
+        if postings:
+            # Walk the shortest posting list and probe the others by bisection
+            postings.sort(key=lambda posting: posting[2] - posting[1])
+            (positions, start, end), others = postings[0], postings[1:]
+        else:
+            positions, start, end, others = None, lo, hi, []
+
+        offsets = range(end - 1, start - 1, -1) if newest_first else range(start, end)
+        results = []
+        for offset in offsets:
+            position = positions[offset] if positions is not None else offset
+            if all(contains(other, position) for other in others):
+                results.append(self.locators[position - self.offset])
+                if limit is not None and len(results) >= limit:
+                    break
+        return results
+
+def contains(posting, position: int) -> bool:
+    """Membership test on the bounded slice of an ascending array"""
+    positions, start, end = posting
+    i = bisect_left(positions, position, start, end)
+    return i < end and positions[i] == position
@@ -1,13 +1,83 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Callable, Set
-from dataclasses import dataclass
+from typing import Any, Dict, List, Callable, Mapping, Optional, Set, Union
+from dataclasses import dataclass, field
+from enum import Enum, StrEnum
+import time
 
-@dataclass
+from .pmap import PersistentMap
+from .snapshot import StateSnapshot, Changes
+
+class EventType(StrEnum):
+    STATE_CHANGED = "state_changed"
+    AGENT_SPAWNED = "agent_spawned"
+    AGENT_ACTION = "agent_action"
+    WORLD_CREATED = "world_created"
+    WORLD_STARTED = "world_started"
+    WORLD_STOPPED = "world_stopped"
+
+class _Sequence:
+    """Process-wide ordering of events, across all worlds"""
+
+    def __init__(self):
+        self.value = 0
+
+    def next(self) -> int:
+        self.value += 1
+        return self.value
+
+_sequence = _Sequence()
+
+def advance_sequence(seq: int) -> None:
+    """Make sure events created from now on sort after ``seq``, e.g. when reopening a log"""
+    _sequence.value = max(_sequence.value, seq)
+
+@dataclass(slots=True)
 class Event:
-    type: str
+    type: Union[EventType, str]
     data: Dict[str, Any]
     source: str
     targets: Set[str] = None  # Specific agents this event is for
+    seq: int = field(default_factory=_sequence.next)
+    timestamp: float = field(default_factory=time.time)
+
+    def __post_init__(self):
+        # Known types are stored as enum members; custom types stay plain strings
+        if not isinstance(self.type, EventType) and self.type in EventType._value2member_map_:
+            self.type = EventType(self.type)
+
+class OverflowPolicy(Enum):
+    BLOCK = "block"  # Publisher waits for space
+    DROP_OLDEST = "drop_oldest"  # Oldest pending event is discarded
+    COALESCE = "coalesce"  # Pending event with the same key is replaced
+
+def agent_id_for_key(key: str) -> str:
+    """Agent whose record an ``agent_<id>`` state key updates"""
+    return key[len("agent_"):]
+
+def agent_records(key: str, value: Any, current: Mapping[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Agent records that writing ``value`` at ``key`` adds or replaces.
+
+    An ``agents`` list becomes one fresh record per agent; an
+    ``agent_<id>`` key is merged into that agent's current record.
+    Records are replaced, never mutated, so snapshots stay intact.
+    """
+    agents: Dict[str, Dict[str, Any]] = {}
+    if key == "agents":
+        if isinstance(value, list):
+            for agent in value:
+                agent_id = agent.get('name', 'unknown')
+                agents[agent_id] = {
+                    'id': agent_id,
+                    'active': True,
+                    'last_action': None,
+                    'status': 'initialized',
+                    **agent  # Include all the agent data
+                }
+    elif key.startswith("agent_"):
+        agent_id = agent_id_for_key(key)
+        record = current.get(agent_id)
+        agents[agent_id] = {**record, **value} if record is not None else value
+    return agents
 
 class WorldState(ABC):
     @abstractmethod
@@ -26,9 +96,46 @@ class WorldState(ABC):
         pass
     
     @abstractmethod
-    async def subscribe(self, agent_id: str, callback: Callable[[Event], None]) -> None:
-        """Subscribe to events with agent identifier"""
+    async def subscribe(self, agent_id: str, callback: Callable[[Event], None],
+                        policy: OverflowPolicy = OverflowPolicy.BLOCK, maxsize: int = 1000,
+                        topics: Optional[List[str]] = None) -> None:
+        """Subscribe to events with agent identifier.
+
+        ``topics`` are ``type[:subject]`` patterns with wildcards, e.g.
+        ``agent_action.*`` or ``state_changed:agent_*``. ``None`` receives
+        every broadcast; events with ``targets`` always reach their targets as well.
+        """
+        pass
+
+    @abstractmethod
+    async def query_events(self, source: Optional[str] = None, type: Optional[str] = None,
+                           target: Optional[str] = None, since: Optional[float] = None,
+                           until: Optional[float] = None, limit: Optional[int] = None,
+                           newest_first: bool = False) -> List[Event]:
+        """Find recorded events by source, type, target and timestamp range"""
+        pass
+
+    async def flush(self) -> None:
+        """Persist buffered writes, e.g. at the end of a tick"""
         pass
+
+    async def drain_events(self, subscriber_ids: Optional[Set[str]] = None) -> None:
+        """Wait until queued events have reached the given (or all) subscribers"""
+        pass
+
+    async def snapshot(self) -> StateSnapshot:
+        """Immutable view of the agents (and state, where kept in memory) at the current version.
+
+        Backends without versioning build an unversioned copy.
+        """
+        return StateSnapshot(0, PersistentMap(await self.get_agents()))
+
+    async def changes_since(self, version: int, agents: Optional[List[str]] = None) -> Optional[Changes]:
+        """Non-agent state keys and agents (optionally only ``agents``) written after ``version``.
+
+        None means the version is too old to diff against; re-read everything.
+        """
+        return None
     
     @abstractmethod
     async def get_agents(self) -> Dict[str, Dict[str, Any]]:
@@ -1,74 +1,144 @@
-from typing import Any, Dict, List, Callable, Set
-from .interface import WorldState, Event
+from typing import Any, Dict, List, Callable, Mapping, Optional, Set
+from .interface import WorldState, Event, EventType, OverflowPolicy, agent_records
+from .dispatch import EventDispatcher
+from .eventlog import EventLog
+from .index import EventIndex
+from .snapshot import StateSnapshot, Changes, VersionedStore
+
+DEFAULT_MAX_HISTORY = 10_000
 
 class InMemoryState(WorldState):
-    def __init__(self):
-        self.state: Dict[str, Any] = {}
-        self.subscribers: Dict[str, Callable[[Event], None]] = {}
-        self.agents: Dict[str, Dict[str, Any]] = {}
+    def __init__(self, event_log: Optional[EventLog] = None, max_history: Optional[int] = DEFAULT_MAX_HISTORY):
+        self.event_log = event_log  # Durable history of every published event
+        self.history: List[Event] = []  # Latest events when there is no event log
+        self.history_start = 0  # Locator of history[0]; older events have been dropped
+        self.max_history = max_history  # None keeps every event
+        self.index = EventIndex()
+        if event_log is not None:
+            for locator, event in event_log.entries():
+                self.index.add(event, locator)
+        self.dispatcher = EventDispatcher()
+        self.store = VersionedStore()
+        self.checkpoint_version = 0  # Version covered by the last checkpoint export
     
+    @property
+    def state(self) -> Mapping[str, Any]:
+        return self.store.current.state
+
+    @property
+    def agents(self) -> Mapping[str, Dict[str, Any]]:
+        return self.store.current.agents
+
     async def update(self, key: str, value: Any) -> None:
         """Update state at key with value"""
         print(f"Updating state: {key}")  # Debug logging
         
-        self.state[key] = value
+        agents = agent_records(key, value, self.agents)
         
-        # Special handling for agent-related updates
-        if key == "agents":
-            # If we're updating the agents list, convert it to our internal format
-            if isinstance(value, list):
-                for agent in value:
-                    agent_id = agent.get('name', 'unknown')
-                    self.agents[agent_id] = {
-                        'id': agent_id,
-                        'active': True,
-                        'last_action': None,
-                        'status': 'initialized',
-                        **agent  # Include all the agent data
-                    }
-        elif key.startswith("agent_"):
-            # Individual agent updates
-            agent_id = key.replace("agent_", "")
-            if agent_id in self.agents:
-                self.agents[agent_id].update(value)
-            else:
-                self.agents[agent_id] = value
+        # An agent_<id> key is logged through its agent record
+        self.store.commit({key: value}, agents, log_state=not key.startswith("agent_"))
         
         # Notify subscribers of state change
         await self.publish_event(Event(
-            type="state_changed",
+            type=EventType.STATE_CHANGED,
             data={
                 "key": key,
-                "value": value,
-                "timestamp": "now"
+                "value": value
             },
             source="state_manager"
         ))
     
+    async def snapshot(self) -> StateSnapshot:
+        """The current version of state and agents"""
+        return self.store.current
+
+    async def changes_since(self, version: int, agents: Optional[List[str]] = None) -> Optional[Changes]:
+        """Non-agent state keys and agents written after ``version``"""
+        return self.store.changes_since(version, agents)
+
+    def export_snapshot(self) -> Dict[str, Any]:
+        """All state and agent records, resetting change tracking"""
+        current = self.store.current
+        self.checkpoint_version = current.version
+        return {"state": dict(current.state.items()), "agents": dict(current.agents.items())}
+
+    def export_changes(self) -> Dict[str, Any]:
+        """State keys and agent records written since the last export"""
+        current = self.store.current
+        state = self.store.written_since("state", self.checkpoint_version)
+        agents = self.store.written_since("agents", self.checkpoint_version)
+        self.checkpoint_version = current.version
+        return {
+            "state": {key: current.state[key] for key in state},
+            "agents": {agent_id: current.agents[agent_id] for agent_id in agents}
+        }
+
+    def load_snapshot(self, snapshot: Dict[str, Any]) -> None:
+        """Replace state and agents with a checkpoint"""
+        self.store.reset(snapshot["state"], snapshot["agents"])
+        self.checkpoint_version = self.store.version
+
+    def apply_changes(self, changes: Dict[str, Any]) -> None:
+        """Apply a checkpoint delta on top of a loaded snapshot"""
+        self.store.commit(changes["state"], changes["agents"])
+
     async def get(self, key: str) -> Any:
         """Get value at key"""
         return self.state.get(key)
     
     async def publish_event(self, event: Event) -> None:
-        """Publish an event to all subscribers or specific targets"""
-        if event.targets:
-            # Send only to specific agents
-            for agent_id in event.targets:
-                if agent_id in self.subscribers:
-                    await self.subscribers[agent_id](event)
+        """Queue an event for its targets and for subscribers whose topics match"""
+        if self.event_log is not None:
+            locator = self.event_log.append(event)
         else:
-            # Broadcast to all subscribers
-            for subscriber in self.subscribers.values():
-                await subscriber(event)
+            locator = self.history_start + len(self.history)
+            self.history.append(event)
+        self.index.add(event, locator)
+        if self.event_log is None and self.max_history is not None and len(self.history) > self.max_history:
+            # Drop a tenth at a time so trimming stays cheap per event
+            drop = len(self.history) - self.max_history + max(1, self.max_history // 10)
+            del self.history[:drop]
+            self.history_start += drop
+            self.index.trim(drop)
+        await self.dispatcher.dispatch(event)
     
-    async def subscribe(self, agent_id: str, callback: Callable[[Event], None]) -> None:
-        """Subscribe to events with agent identifier"""
+    async def subscribe(self, agent_id: str, callback: Callable[[Event], None],
+                        policy: OverflowPolicy = OverflowPolicy.BLOCK, maxsize: int = 1000,
+                        topics: Optional[List[str]] = None) -> None:
+        """Subscribe to events with agent identifier and optional topic patterns"""
         print(f"New subscriber: {agent_id}")  # Debug logging
-        self.subscribers[agent_id] = callback
+        self.dispatcher.subscribe(agent_id, callback, policy, maxsize, topics)
+
+    async def query_events(self, source: Optional[str] = None, type: Optional[str] = None,
+                           target: Optional[str] = None, since: Optional[float] = None,
+                           until: Optional[float] = None, limit: Optional[int] = None,
+                           newest_first: bool = False) -> List[Event]:
+        """Find recorded events by source, type, target and timestamp range"""
+        locators = self.index.query(source, type, target, since, until, limit, newest_first)
+        if self.event_log is not None:
+            return [self.event_log.read(locator) for locator in locators]
+        return [self.history[locator - self.history_start] for locator in locators]
+
+    async def flush(self) -> None:
+        """Write buffered event log records to disk"""
+        if self.event_log is not None:
+            self.event_log.flush()
+
+    async def unsubscribe(self, agent_id: str) -> None:
+        """Stop delivering events to a subscriber"""
+        self.dispatcher.unsubscribe(agent_id)
+
+    async def drain_events(self, subscriber_ids: Optional[Set[str]] = None) -> None:
+        """Wait until queued events have reached the given (or all) subscribers"""
+        await self.dispatcher.drain(subscriber_ids)
+
+    def subscription_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Queue depth and delivery counters per subscriber"""
+        return self.dispatcher.metrics()
     
     async def get_agents(self) -> Dict[str, Dict[str, Any]]:
         """Get information about all agents"""
-        return self.agents.copy()  # Return a copy to prevent external modifications
+        return dict(self.agents.items())  # A copy; snapshot() gives a shared read-only view
     
     async def get_agent_state(self, agent_id: str) -> Dict[str, Any]:
         """Get state of a specific agent"""
@@ -0,0 +1,215 @@
+"""Persistent hash map with structural sharing.
+
+A hash array mapped trie: each node covers five bits of the key's hash
+and stores only its occupied slots, found through a 32-bit bitmap. An
+update copies the nodes on the path to the changed key (at most
+``ceil(64 / 5)`` of them, usually two or three) and shares everything
+else with the previous version, so old versions stay valid and cheap.
+"""
+from typing import Any, Iterable, Iterator, Mapping, Optional, Tuple
+
+BITS = 5
+MASK = (1 << BITS) - 1
+HASH_MASK = (1 << 64) - 1
+_MISSING = object()
+
+class _Leaf:
+    __slots__ = ("hash", "key", "value")
+
+    def __init__(self, hash: int, key: Any, value: Any):
+        self.hash = hash
+        self.key = key
+        self.value = value
+
+class _Collision:
+    """Entries whose full hashes are equal"""
+    __slots__ = ("hash", "pairs")
+
+    def __init__(self, hash: int, pairs: Tuple[Tuple[Any, Any], ...]):
+        self.hash = hash
+        self.pairs = pairs
+
+class _Node:
+    __slots__ = ("bitmap", "items")
+
+    def __init__(self, bitmap: int, items: tuple):
+        self.bitmap = bitmap
+        self.items = items
+
+EMPTY_NODE = _Node(0, ())
+
+def _hash(key: Any) -> int:
+    return hash(key) & HASH_MASK
+
+def _slot(bitmap: int, bit: int) -> int:
+    return (bitmap & (bit - 1)).bit_count()
+
+def _replace(node: _Node, index: int, item) -> _Node:
+    items = node.items
+    return _Node(node.bitmap, items[:index] + (item,) + items[index + 1:])
+
+def _merge(a, b, shift: int) -> _Node:
+    """Smallest subtree holding two entries with different hashes"""
+    index_a = (a.hash >> shift) & MASK
+    index_b = (b.hash >> shift) & MASK
+    if index_a == index_b:
+        return _Node(1 << index_a, (_merge(a, b, shift + BITS),))
+    items = (a, b) if index_a < index_b else (b, a)
+    return _Node((1 << index_a) | (1 << index_b), items)
+
+def _lookup(node: _Node, h: int, key: Any) -> Any:
+    shift = 0
+    while True:
+        bit = 1 << ((h >> shift) & MASK)
+        if not node.bitmap & bit:
+            return _MISSING
+        item = node.items[_slot(node.bitmap, bit)]
+        if isinstance(item, _Node):
+            node = item
+            shift += BITS
+        elif isinstance(item, _Leaf):
+            return item.value if item.hash == h and item.key == key else _MISSING
+        else:
+            if item.hash == h:
+                for k, v in item.pairs:
+                    if k == key:
+                        return v
+            return _MISSING
+
+def _assoc(node: _Node, h: int, shift: int, key: Any, value: Any) -> Tuple[_Node, bool]:
+    """Node with key set to value, and whether the key is new"""
+    bit = 1 << ((h >> shift) & MASK)
+    index = _slot(node.bitmap, bit)
+    if not node.bitmap & bit:
+        items = node.items
+        return _Node(node.bitmap | bit, items[:index] + (_Leaf(h, key, value),) + items[index:]), True
+
+    item = node.items[index]
+    if isinstance(item, _Node):
+        child, added = _assoc(item, h, shift + BITS, key, value)
+        return (node if child is item else _replace(node, index, child)), added
+
+    if isinstance(item, _Leaf):
+        if item.hash == h and item.key == key:
+            if item.value is value:
+                return node, False
+            return _replace(node, index, _Leaf(h, key, value)), False
+        if item.hash == h:
+            return _replace(node, index, _Collision(h, ((item.key, item.value), (key, value)))), True
+        return _replace(node, index, _merge(item, _Leaf(h, key, value), shift + BITS)), True
+
+    if item.hash == h:
+        pairs = tuple(pair for pair in item.pairs if pair[0] != key)
+        added = len(pairs) == len(item.pairs)
+        return _replace(node, index, _Collision(h, pairs + ((key, value),))), added
+    return _replace(node, index, _merge(item, _Leaf(h, key, value), shift + BITS)), True
+
+def _dissoc(node: _Node, h: int, shift: int, key: Any) -> Optional[_Node]:
+    """Node without key: the same node if absent, None if it ends up empty"""
+    bit = 1 << ((h >> shift) & MASK)
+    if not node.bitmap & bit:
+        return node
+    index = _slot(node.bitmap, bit)
+    item = node.items[index]
+
+    if isinstance(item, _Node):
+        child = _dissoc(item, h, shift + BITS, key)
+        if child is item:
+            return node
+        if child is not None:
+            # A branch left with a single entry folds back into this node
+            if len(child.items) == 1 and not isinstance(child.items[0], _Node):
+                child = child.items[0]
+            return _replace(node, index, child)
+    elif isinstance(item, _Leaf):
+        if item.hash != h or item.key != key:
+            return node
+    else:
+        if item.hash != h:
+            return node
+        pairs = tuple(pair for pair in item.pairs if pair[0] != key)
+        if len(pairs) == len(item.pairs):
+            return node
+        if len(pairs) == 1:
+            return _replace(node, index, _Leaf(h, *pairs[0]))
+        return _replace(node, index, _Collision(h, pairs))
+
+    if node.bitmap == bit:
+        return None
+    return _Node(node.bitmap & ~bit, node.items[:index] + node.items[index + 1:])
+
+def _walk(node: _Node) -> Iterator[Tuple[Any, Any]]:
+    for item in node.items:
+        if isinstance(item, _Node):
+            yield from _walk(item)
+        elif isinstance(item, _Leaf):
+            yield item.key, item.value
+        else:
+            yield from item.pairs
+
+class PersistentMap(Mapping):
+    """Immutable mapping whose ``set``/``delete`` return a new map sharing structure with this one"""
+    __slots__ = ("_root", "_size")
+
+    def __init__(self, items: Optional[Iterable] = None):
+        self._root = EMPTY_NODE
+        self._size = 0
+        if items is not None:
+            pairs = items.items() if isinstance(items, Mapping) else items
+            for key, value in pairs:
+                self._root, added = _assoc(self._root, _hash(key), 0, key, value)
+                self._size += added
+
+    @classmethod
+    def _make(cls, root: _Node, size: int) -> "PersistentMap":
+        new = cls.__new__(cls)
+        new._root = root
+        new._size = size
+        return new
+
+    def __getitem__(self, key: Any) -> Any:
+        value = _lookup(self._root, _hash(key), key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        value = _lookup(self._root, _hash(key), key)
+        return default if value is _MISSING else value
+
+    def __contains__(self, key: Any) -> bool:
+        return _lookup(self._root, _hash(key), key) is not _MISSING
+
+    def __iter__(self) -> Iterator[Any]:
+        for key, _ in _walk(self._root):
+            yield key
+
+    def items(self):
+        return _walk(self._root)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def set(self, key: Any, value: Any) -> "PersistentMap":
+        """Copy with key set to value"""
+        root, added = _assoc(self._root, _hash(key), 0, key, value)
+        return self if root is self._root else self._make(root, self._size + added)
+
+    def delete(self, key: Any) -> "PersistentMap":
+        """Copy without key; the same map if key is absent"""
+        root = _dissoc(self._root, _hash(key), 0, key)
+        if root is self._root:
+            return self
+        return self._make(root if root is not None else EMPTY_NODE, self._size - 1)
+
+    def update(self, items) -> "PersistentMap":
+        """Copy with every pair from a mapping or iterable of pairs set"""
+        root, size = self._root, self._size
+        pairs = items.items() if isinstance(items, Mapping) else items
+        for key, value in pairs:
+            root, added = _assoc(root, _hash(key), 0, key, value)
+            size += added
+        return self._make(root, size)
+
+    def __repr__(self) -> str:
+        return f"PersistentMap({dict(self.items())!r})"
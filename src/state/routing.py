@@ -0,0 +1,110 @@
+from fnmatch import fnmatchcase
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .interface import Event, EventType
+
+def event_subject(event: Event) -> str:
+    """What an event is about: the state key for state changes, otherwise its source"""
+    if event.type == EventType.STATE_CHANGED:
+        return str(event.data.get("key", ""))
+    return event.source
+
+def has_wildcard(pattern: str) -> bool:
+    return any(c in pattern for c in "*?[")
+
+class TopicPattern:
+    """A ``type[:subject]`` subscription pattern with shell-style wildcards.
+
+    ``agent_action.*`` also matches plain ``agent_action``, so dotted
+    sub-types can be subscribed to as a family.
+    """
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self.type_pattern, _, subject = pattern.partition(":")
+        self.subject_pattern = subject or None
+
+    @property
+    def exact(self) -> bool:
+        """Whether the pattern can be served from a dict lookup"""
+        return not has_wildcard(self.type_pattern) and (
+            self.subject_pattern is None or not has_wildcard(self.subject_pattern)
+        )
+
+    def matches(self, event_type: str, subject: str) -> bool:
+        type_matches = fnmatchcase(event_type, self.type_pattern) or (
+            self.type_pattern.endswith(".*") and event_type == self.type_pattern[:-2]
+        )
+        if not type_matches:
+            return False
+        return self.subject_pattern is None or fnmatchcase(subject, self.subject_pattern)
+
+class EventRouter:
+    """Index from event type and subject to interested subscribers.
+
+    Exact patterns are dictionary lookups. Wildcard patterns are matched
+    once per distinct (type, subject) and the result is cached until the
+    subscriptions change, so routing cost follows the number of
+    interested subscribers rather than the number of subscribers.
+    """
+
+    def __init__(self):
+        self.catch_all: Set[str] = set()
+        self.by_type: Dict[str, Set[str]] = {}
+        self.by_type_subject: Dict[Tuple[str, str], Set[str]] = {}
+        self.wildcards: List[Tuple[str, TopicPattern]] = []
+        self.topics: Dict[str, Optional[List[str]]] = {}
+        self._cache: Dict[Tuple[str, str], Set[str]] = {}
+
+    def add(self, subscriber_id: str, topics: Optional[Iterable[str]] = None) -> None:
+        """Register a subscriber; ``None`` receives every broadcast, ``[]`` only targeted events"""
+        self.remove(subscriber_id)
+        self.topics[subscriber_id] = list(topics) if topics is not None else None
+        if topics is None:
+            self.catch_all.add(subscriber_id)
+        else:
+            for raw in topics:
+                pattern = TopicPattern(raw)
+                if not pattern.exact:
+                    self.wildcards.append((subscriber_id, pattern))
+                elif pattern.subject_pattern is None:
+                    self.by_type.setdefault(pattern.type_pattern, set()).add(subscriber_id)
+                else:
+                    key = (pattern.type_pattern, pattern.subject_pattern)
+                    self.by_type_subject.setdefault(key, set()).add(subscriber_id)
+        self._cache.clear()
+
+    def remove(self, subscriber_id: str) -> None:
+        """Forget a subscriber"""
+        if self.topics.pop(subscriber_id, None) is None and subscriber_id not in self.catch_all:
+            return
+        self.catch_all.discard(subscriber_id)
+        for index in (self.by_type, self.by_type_subject):
+            for key in [k for k, ids in index.items() if subscriber_id in ids]:
+                index[key].discard(subscriber_id)
+                if not index[key]:
+                    del index[key]
+        self.wildcards = [(sid, p) for sid, p in self.wildcards if sid != subscriber_id]
+        self._cache.clear()
+
+    def route(self, event: Event) -> Set[str]:
+        """Subscribers that should receive the event: its targets, plus everyone whose topics match"""
+        subject = event_subject(event)
+        key = (event.type, subject)
+        matched = self._cache.get(key)
+        if matched is None:
+            matched = {sid for sid, pattern in self.wildcards if pattern.matches(event.type, subject)}
+            if len(self._cache) >= 10000:
+                self._cache.clear()
+            self._cache[key] = matched
+
+        subscribers = (
+            self.catch_all
+            | self.by_type.get(event.type, set())
+            | self.by_type_subject.get(key, set())
+            | matched
+        )
+        if event.targets:
+            # Addressed events reach their targets regardless of topic filters, and observers as usual
+            subscribers = subscribers | {target for target in event.targets if target in self.topics}
+        return subscribers
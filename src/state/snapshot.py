@@ -0,0 +1,101 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterable, Mapping, Optional, Set, Tuple
+
+from .pmap import PersistentMap
+
+@dataclass(frozen=True, slots=True)
+class StateSnapshot:
+    """A consistent, immutable view of the world at one version.
+
+    Taking a snapshot costs nothing: it shares structure with the live
+    state and with every other snapshot. ``state`` is ``None`` for
+    backends that keep state values out of memory.
+    """
+    version: int
+    agents: PersistentMap
+    state: Optional[PersistentMap] = None
+
+@dataclass
+class Changes:
+    """State keys and agents written after some version"""
+    state: Set[str]
+    agents: Set[str]
+
+class VersionedStore:
+    """Current snapshot plus a record of when each key was last written.
+
+    Agents and state keys each map to the version that last wrote them,
+    so checking a handful of peers costs a handful of lookups. State keys
+    are also kept in a bounded log, so listing what changed since a
+    version costs what changed, not the number of keys. Keys that merely
+    mirror an agent record (``agent_<id>``) can be left out of the log.
+    """
+
+    def __init__(self, keep_state: bool = True, history: int = 10000):
+        self.keep_state = keep_state
+        self.current = StateSnapshot(0, PersistentMap(), PersistentMap() if keep_state else None)
+        self.modified: Dict[str, Dict[str, int]] = {"state": {}, "agents": {}}  # Key -> last version written
+        self.log: Deque[Tuple[int, str]] = deque(maxlen=history)  # (version, state key)
+        self.floor = 0  # Oldest version changes_since can answer for
+
+    @property
+    def version(self) -> int:
+        return self.current.version
+
+    def commit(self, state: Mapping[str, Any], agents: Mapping[str, Any],
+               log_state: bool = True) -> StateSnapshot:
+        """Apply one write as a single new version"""
+        version = self.current.version + 1
+        new_state = self.current.state
+        if self.keep_state and state:
+            new_state = new_state.update(state)
+        new_agents = self.current.agents.update(agents) if agents else self.current.agents
+        self.current = StateSnapshot(version, new_agents, new_state)
+
+        for kind, keys in (("state", state), ("agents", agents)):
+            modified = self.modified[kind]
+            for key in keys:
+                modified[key] = version
+        if log_state:
+            for key in state:
+                if len(self.log) == self.log.maxlen:
+                    self.floor = self.log[0][0]
+                self.log.append((version, key))
+        return self.current
+
+    def reset(self, state: Mapping[str, Any], agents: Mapping[str, Any]) -> None:
+        """Replace everything, e.g. when loading a checkpoint; older versions can no longer be diffed"""
+        version = self.current.version + 1
+        self.current = StateSnapshot(
+            version, PersistentMap(agents), PersistentMap(state) if self.keep_state else None
+        )
+        self.modified = {
+            "state": dict.fromkeys(state, version),
+            "agents": dict.fromkeys(agents, version)
+        }
+        self.log.clear()
+        self.floor = version
+
+    def written_since(self, kind: str, version: int) -> Set[str]:
+        """Every state key or agent written after ``version``; scans all keys"""
+        return {key for key, written in self.modified[kind].items() if written > version}
+
+    def changes_since(self, version: int, agents: Optional[Iterable[str]] = None) -> Optional[Changes]:
+        """Logged state keys and agents written after ``version``, or None if that is too old to tell.
+
+        Pass ``agents`` to check only those agents instead of all of them.
+        """
+        if version < self.floor or version > self.current.version:
+            return None
+        state = set()
+        for entry_version, key in reversed(self.log):
+            if entry_version <= version:
+                break
+            state.add(key)
+        if agents is None:
+            changed = self.written_since("agents", version)
+        else:
+            modified = self.modified["agents"]
+            changed = {agent_id for agent_id in agents if modified.get(agent_id, 0) > version}
+        return Changes(state, changed)
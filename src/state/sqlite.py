@@ -0,0 +1,275 @@
+import os
+import json
+import asyncio
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from .interface import WorldState, Event, EventType, OverflowPolicy, advance_sequence, agent_records
+from .dispatch import EventDispatcher
+from .codec import encode_event, decode_event
+from .snapshot import StateSnapshot, Changes, VersionedStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS agents (id TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY,
+    type TEXT NOT NULL,
+    source TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    record BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_source ON events (source, seq);
+CREATE INDEX IF NOT EXISTS events_type ON events (type, seq);
+CREATE INDEX IF NOT EXISTS events_timestamp ON events (timestamp);
+CREATE TABLE IF NOT EXISTS event_targets (target TEXT NOT NULL, seq INTEGER NOT NULL, PRIMARY KEY (target, seq));
+"""
+
+# Statement texts are constant so sqlite3's statement cache prepares each one once
+UPSERT_STATE = "INSERT INTO state (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value"
+UPSERT_AGENT = "INSERT INTO agents (id, data) VALUES (?, ?) ON CONFLICT(id) DO UPDATE SET data = excluded.data"
+INSERT_EVENT = "INSERT OR REPLACE INTO events (seq, type, source, timestamp, record) VALUES (?, ?, ?, ?, ?)"
+INSERT_TARGET = "INSERT OR IGNORE INTO event_targets (target, seq) VALUES (?, ?)"
+SELECT_STATE = "SELECT value FROM state WHERE key = ?"
+
+class SQLiteState(WorldState):
+    """World state kept in a SQLite database, for worlds that outgrow RAM or must survive restarts.
+
+    The database runs in WAL mode. Writes are buffered in memory and
+    committed together by ``flush``, which the world calls once per tick,
+    so a tick costs one transaction however many keys and events it
+    wrote. Recently read and written values are served from an LRU cache;
+    pending writes are always visible to reads. Agent records, one per
+    agent, are also mirrored in a versioned in-memory store so that
+    snapshots and change queries never touch the database.
+    """
+
+    def __init__(self, path: str, cache_size: int = 4096):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False, cached_statements=64)
+        self.lock = threading.Lock()  # The connection is shared with flushes running in a worker thread
+        self.flush_lock = asyncio.Lock()  # Commits land in the order their flushes were called
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+        self.cache_size = cache_size
+        self.state_cache: "OrderedDict[str, Any]" = OrderedDict()
+        self.pending_state: Dict[str, Any] = {}
+        self.pending_agents: Dict[str, Dict[str, Any]] = {}
+        self.pending_events: List[Event] = []
+        self.store = VersionedStore(keep_state=False)
+        self.store.reset({}, self._all_rows("SELECT id, data FROM agents"))
+        self.checkpoint_version = self.store.version  # Version covered by the last checkpoint export
+        self.dispatcher = EventDispatcher()
+
+        last_seq = self.db.execute("SELECT MAX(seq) FROM events").fetchone()[0]
+        advance_sequence(last_seq or 0)
+
+    def _remember(self, cache: OrderedDict, key: str, value: Any) -> None:
+        cache[key] = value
+        cache.move_to_end(key)
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
+    def _read(self, sql: str, key: str) -> Any:
+        with self.lock:
+            row = self.db.execute(sql, (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _cached_state(self, key: str) -> Tuple[bool, Any]:
+        """A pending or cached value, without touching the database"""
+        if key in self.pending_state:
+            return True, self.pending_state[key]
+        if key in self.state_cache:
+            self.state_cache.move_to_end(key)
+            return True, self.state_cache[key]
+        return False, None
+
+    def _load_state(self, key: str) -> Any:
+        found, value = self._cached_state(key)
+        if not found:
+            value = self._read(SELECT_STATE, key)
+            self._remember(self.state_cache, key, value)
+        return value
+
+    async def update(self, key: str, value: Any) -> None:
+        """Update state at key with value"""
+        self.pending_state[key] = value
+        agents = agent_records(key, value, self.store.current.agents)
+        self.pending_agents.update(agents)
+        # An agent_<id> key is logged through its agent record
+        self.store.commit({key: value}, agents, log_state=not key.startswith("agent_"))
+
+        await self.publish_event(Event(
+            type=EventType.STATE_CHANGED,
+            data={
+                "key": key,
+                "value": value
+            },
+            source="state_manager"
+        ))
+
+    async def get(self, key: str) -> Any:
+        """Get value at key"""
+        found, value = self._cached_state(key)
+        if found:
+            return value
+        # Misses read in a worker thread, so a commit holding the lock never stalls the event loop
+        value = await asyncio.to_thread(self._read, SELECT_STATE, key)
+        found, current = self._cached_state(key)
+        if found:
+            return current  # Written while the read was running
+        self._remember(self.state_cache, key, value)
+        return value
+
+    async def publish_event(self, event: Event) -> None:
+        """Buffer an event for the next commit and queue it for subscribers"""
+        self.pending_events.append(event)
+        await self.dispatcher.dispatch(event)
+
+    async def subscribe(self, agent_id: str, callback: Callable[[Event], None],
+                        policy: OverflowPolicy = OverflowPolicy.BLOCK, maxsize: int = 1000,
+                        topics: Optional[List[str]] = None) -> None:
+        """Subscribe to events with agent identifier and optional topic patterns"""
+        self.dispatcher.subscribe(agent_id, callback, policy, maxsize, topics)
+
+    async def unsubscribe(self, agent_id: str) -> None:
+        """Stop delivering events to a subscriber"""
+        self.dispatcher.unsubscribe(agent_id)
+
+    async def drain_events(self, subscriber_ids: Optional[Set[str]] = None) -> None:
+        """Wait until queued events have reached the given (or all) subscribers"""
+        await self.dispatcher.drain(subscriber_ids)
+
+    def subscription_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Queue depth and delivery counters per subscriber"""
+        return self.dispatcher.metrics()
+
+    async def flush(self) -> None:
+        """Commit every buffered write in one transaction"""
+        async with self.flush_lock:
+            if not (self.pending_state or self.pending_agents or self.pending_events):
+                return
+            state, agents, events = self.pending_state, self.pending_agents, self.pending_events
+            self.pending_state, self.pending_agents, self.pending_events = {}, {}, []
+            # Written values stay readable from the cache while the commit runs
+            for key, value in state.items():
+                self._remember(self.state_cache, key, value)
+            await asyncio.to_thread(self._commit, state, agents, events)
+
+    def _commit(self, state: Dict[str, Any], agents: Dict[str, Dict[str, Any]], events: List[Event]) -> None:
+        with self.lock, self.db:
+            self.db.executemany(UPSERT_STATE, [
+                (key, json.dumps(value, default=str)) for key, value in state.items()
+            ])
+            self.db.executemany(UPSERT_AGENT, [
+                (agent_id, json.dumps(record, default=str)) for agent_id, record in agents.items()
+            ])
+            self.db.executemany(INSERT_EVENT, [
+                (event.seq, str(event.type), event.source, event.timestamp, encode_event(event))
+                for event in events
+            ])
+            self.db.executemany(INSERT_TARGET, [
+                (target, event.seq) for event in events for target in event.targets or ()
+            ])
+
+    async def query_events(self, source: Optional[str] = None, type: Optional[str] = None,
+                           target: Optional[str] = None, since: Optional[float] = None,
+                           until: Optional[float] = None, limit: Optional[int] = None,
+                           newest_first: bool = False) -> List[Event]:
+        """Find recorded events by source, type, target and timestamp range"""
+        await self.flush()
+        sql = "SELECT e.record FROM events e"
+        clauses, params = [], []
+        if target is not None:
+            sql += " JOIN event_targets t ON t.seq = e.seq AND t.target = ?"
+            params.append(target)
+        for column, value in (("e.source", source), ("e.type", type)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(str(value))
+        if since is not None:
+            clauses.append("e.timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("e.timestamp <= ?")
+            params.append(until)
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY e.seq DESC" if newest_first else " ORDER BY e.seq"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        def run():
+            with self.lock:
+                return self.db.execute(sql, params).fetchall()
+
+        return [decode_event(row[0]) for row in await asyncio.to_thread(run)]
+
+    async def get_agents(self) -> Dict[str, Dict[str, Any]]:
+        """Get information about all agents"""
+        return dict(self.store.current.agents.items())
+
+    async def get_agent_state(self, agent_id: str) -> Dict[str, Any]:
+        """Get state of a specific agent"""
+        return self.store.current.agents.get(agent_id, {})
+
+    async def snapshot(self) -> StateSnapshot:
+        """The current version of the agents; state values stay in the database"""
+        return self.store.current
+
+    async def changes_since(self, version: int, agents: Optional[List[str]] = None) -> Optional[Changes]:
+        """Non-agent state keys and agents written after ``version``"""
+        return self.store.changes_since(version, agents)
+
+    def _all_rows(self, sql: str) -> Dict[str, Any]:
+        with self.lock:
+            return {key: json.loads(value) for key, value in self.db.execute(sql)}
+
+    def export_snapshot(self) -> Dict[str, Any]:
+        """All state and agent records, resetting change tracking"""
+        state = {**self._all_rows("SELECT key, value FROM state"), **self.pending_state}
+        self.checkpoint_version = self.store.version
+        return {"state": state, "agents": dict(self.store.current.agents.items())}
+
+    def export_changes(self) -> Dict[str, Any]:
+        """State keys and agent records written since the last export"""
+        current = self.store.current
+        state = self.store.written_since("state", self.checkpoint_version)
+        agents = self.store.written_since("agents", self.checkpoint_version)
+        self.checkpoint_version = current.version
+        return {
+            "state": {key: self._load_state(key) for key in state},
+            "agents": {agent_id: current.agents[agent_id] for agent_id in agents}
+        }
+
+    def load_snapshot(self, snapshot: Dict[str, Any]) -> None:
+        """Replace state and agents with a checkpoint"""
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM state")
+            self.db.execute("DELETE FROM agents")
+        self.state_cache.clear()
+        self.pending_state = dict(snapshot["state"])
+        self.pending_agents = dict(snapshot["agents"])
+        self.store.reset({}, snapshot["agents"])
+        self.checkpoint_version = self.store.version
+
+    def apply_changes(self, changes: Dict[str, Any]) -> None:
+        """Apply a checkpoint delta on top of a loaded snapshot"""
+        self.pending_state.update(changes["state"])
+        self.pending_agents.update(changes["agents"])
+        self.store.commit(changes["state"], changes["agents"])
+
+    def close(self) -> None:
+        """Commit anything still buffered and close the database"""
+        if self.pending_state or self.pending_agents or self.pending_events:
+            self._commit(self.pending_state, self.pending_agents, self.pending_events)
+            self.pending_state, self.pending_agents, self.pending_events = {}, {}, []
+        self.db.close()
@@ -1,19 +1,8 @@
-from enum import Enum, auto
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Set
 
-class EventType(Enum):
-    STATE_CHANGED = auto()
-    AGENT_SPAWNED = auto()
-    AGENT_ACTION = auto()
-    WORLD_CREATED = auto()
-    WORLD_STARTED = auto()
-    WORLD_STOPPED = auto()
+from ..state.interface import Event, EventType
 
-def create_event(event_type: EventType, data: Dict[str, Any], source: str) -> Dict[str, Any]:
+def create_event(event_type: EventType, data: Dict[str, Any], source: str,
+                 targets: Optional[Set[str]] = None) -> Event:
     """Create a properly formatted event"""
-    return {
-        "type": event_type.name,
-        "data": data,
-        "source": source,
-        "timestamp": None  # You could add actual timestamps here
-    }
\ No newline at end of file
+    return Event(type=event_type, data=data, source=source, targets=targets)
@@ -1,34 +1,98 @@
-from typing import List
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 import asyncio
 from rich.console import Console
-from .state.interface import WorldState, Event
-from .agent import Agent
+from .state.interface import WorldState, Event, EventType, OverflowPolicy
+from .agent import DEFAULT_MAX_IDLE_TICKS, Agent, WakeConditions, StreamListener
+from .actions import AgentAction, batch_tool, check_action
+from .clock import WorldClock
+from .relevance import RelevanceIndex
+from .llm.budget import PromptSection, assemble, batch_output_tokens, budget_for, max_batch_agents
+from .llm import LLMBackend, get_default_backend
 
 console = Console()
 
+RELEVANCE_SUBSCRIBER = "relevance_index"
+
+def batch_sections(prompts: Dict[str, str]) -> List[PromptSection]:
+    """A batched decision's prompt: one untrimmed section per agent, each already within its own budget"""
+    return [
+        PromptSection.from_text("instructions", f"Decide what each of the following {len(prompts)} agents does "
+                                "next. Each agent has its own prompt below."),
+        *(PromptSection.from_text(agent_id, prompt, title=f'### agent_id: "{agent_id}"')
+          for agent_id, prompt in prompts.items()),
+        PromptSection.from_text("closing", "Take one action for every agent_id above.")
+    ]
+
+def split_batch(prompts: Dict[str, str]) -> List[Dict[str, str]]:
+    """Split a batch's prompts, in order, into batches that fit the agent_batch input budget"""
+    budget = budget_for("agent_batch").max_input_tokens
+    overhead = sum(section.tokens() for section in batch_sections({}))
+    batches: List[Dict[str, str]] = []
+    used = budget
+    for agent_id, prompt in prompts.items():
+        size = batch_sections({agent_id: prompt})[1].tokens()
+        if used + size > budget:  # An agent too large for any batch still gets one of its own
+            batches.append({})
+            used = overhead
+        batches[-1][agent_id] = prompt
+        used += size
+    return batches
+
 class WorldSimulation:
-    def __init__(self, world_id: str, state: WorldState, config=None):
+    def __init__(self, world_id: str, state: WorldState, config=None, backend: Optional[LLMBackend] = None,
+                 batch_size: int = 1, clock: Optional[WorldClock] = None, fast_forward: bool = False,
+                 tick_interval: float = 5.0, max_idle_ticks: Optional[int] = DEFAULT_MAX_IDLE_TICKS,
+                 relevance: Optional[RelevanceIndex] = None, restored: bool = False):
         console.print(f"[cyan]Initializing world {world_id}[/cyan]")
         self.world_id = world_id
         self.state = state
         self.config = config
+        self.backend = backend
+        self.batch_size = batch_size  # Agents decided per LLM call; 1 disables batching
+        if clock is None:
+            clock = WorldClock.from_description(config.world_description) if config else WorldClock()
+        self.clock = clock
+        self.fast_forward = fast_forward  # Start the next tick as soon as this one resolves
+        self.tick_interval = tick_interval  # Real seconds per tick when not fast-forwarding
+        self.max_idle_ticks = max_idle_ticks  # Agents with no new events still act this often
+        self.relevance = relevance or RelevanceIndex()  # Whose state each agent gets to see
+        self.relevance_connected = False
         self.agents: List[Agent] = []
         self.running = False
+        self.tick_hooks: List[Callable[[], Awaitable[None]]] = []  # Run after every tick
+        self.stream_listeners: List[StreamListener] = []  # See every agent decision as it streams
         
-        # Initialize world state
-        asyncio.create_task(self.state.update("world_state", {
-            "world_id": world_id,
-            "status": "initialized",
-            "agent_count": 0
-        }))
+        # Initialize world state; a restored world keeps the one from its checkpoint
+        self.initializing: Optional[asyncio.Task] = None
+        if not restored:
+            self.initializing = asyncio.create_task(self.state.update("world_state", {
+                "world_id": world_id,
+                "status": "initialized",
+                "agent_count": 0
+            }))
     
+    async def add_agent(self, agent_id: str, loop_state: Optional[Dict[str, Any]] = None) -> Agent:
+        """Create an agent object and connect it to the world's events"""
+        agent = Agent(agent_id, self.state, self.config, self.backend, clock=self.clock,
+                      wake=WakeConditions(max_idle_ticks=self.max_idle_ticks), relevance=self.relevance,
+                      stream_listeners=self.stream_listeners)
+        self.relevance.add_agent(agent_id, agent.agent_info)
+        if loop_state:
+            agent.restore_loop_state(loop_state)
+            await agent.recover_memory()
+        self.agents.append(agent)
+        
+        # Events reach the agent's mailbox and decide when it next wakes
+        await self.state.subscribe(agent_id, agent.receive, policy=OverflowPolicy.COALESCE,
+                                   topics=agent.topics())
+        return agent
+
     async def spawn_agent(self, agent_id: str) -> Agent:
         """Create a new agent in this world"""
         console.print(f"[yellow]Spawning agent: {agent_id}[/yellow]")
         
         # Create agent
-        agent = Agent(agent_id, self.state, self.config)
-        self.agents.append(agent)
+        agent = await self.add_agent(agent_id)
         
         # Update state
         await self.state.update(f"agent_{agent_id}", {
@@ -40,7 +104,7 @@ class WorldSimulation:
         
         # Notify about new agent
         await self.state.publish_event(Event(
-            type="agent_spawned",
+            type=EventType.AGENT_SPAWNED,
             data={
                 "agent_id": agent_id,
                 "world_id": self.world_id,
@@ -56,7 +120,10 @@ class WorldSimulation:
         console.print(f"[green]Starting world {self.world_id}[/green]")
         self.running = True
         
-        # Update world state
+        # Update world state, after the initial write so it can't land on top
+        if self.initializing:
+            await self.initializing
+        await self.connect_relevance()
         await self.state.update("world_state", {
             "world_id": self.world_id,
             "status": "running",
@@ -65,22 +132,118 @@ class WorldSimulation:
         
         # Publish world started event
         await self.state.publish_event(Event(
-            type="world_started",
+            type=EventType.WORLD_STARTED,
             data={"world_id": self.world_id},
             source=self.world_id
         ))
         
         console.print(f"[cyan]Starting {len(self.agents)} agents...[/cyan]")
         
-        # Start all agents
-        agent_tasks = []
-        for agent in self.agents:
-            task = asyncio.create_task(agent.run())
-            agent_tasks.append(task)
-        
-        # Wait for all agents
-        await asyncio.gather(*agent_tasks)
-    
+        while self.running and not self.clock.finished:
+            await self.run_tick()
+            
+            # Fast-forward moves on as soon as every decision has resolved
+            if not self.fast_forward:
+                await asyncio.sleep(self.tick_interval)
+
+        if self.clock.finished:
+            console.print(f"[green]World {self.world_id} reached tick {self.clock.tick}[/green]")
+
+    async def connect_relevance(self):
+        """Feed the relevance index from existing history, then from a subscription to agent actions"""
+        if self.relevance_connected:
+            return
+        self.relevance_connected = True
+        await self.relevance.catch_up(self.state)
+        await self.state.subscribe(RELEVANCE_SUBSCRIBER, self.relevance.receive,
+                                   topics=[EventType.AGENT_ACTION.value])
+
+    async def run_tick(self):
+        """Run every agent that is due this tick, then advance the clock"""
+        tick = self.clock.tick
+
+        # Let last tick's events reach the mailboxes and relevance index before deciding who wakes
+        await self.state.drain_events({agent.agent_id for agent in self.agents} | {RELEVANCE_SUBSCRIBER})
+        due = [agent for agent in self.agents if agent.is_due(tick)]
+
+        if self.batch_size > 1:
+            # A batch must fit its answers within the model's output limit
+            backend = self.backend or get_default_backend()
+            size = min(self.batch_size, max_batch_agents(backend.model))
+            batches = [due[i:i + size] for i in range(0, len(due), size)]
+            await asyncio.gather(*(self.run_batch(batch) for batch in batches))
+        else:
+            await asyncio.gather(*(agent.step() for agent in due))
+
+        for agent in due:
+            agent.last_tick = tick
+        await self.state.flush()
+        self.clock.advance()
+
+        for hook in self.tick_hooks:
+            await hook()
+
+    async def run_batch(self, agents: List[Agent]):
+        """Decide and execute one action for each agent in the batch"""
+        observations = await asyncio.gather(*(agent.observe() for agent in agents))
+        agent_prompts = {
+            agent.agent_id: agent.build_prompt(observation) for agent, observation in zip(agents, observations)
+        }
+        # Personas differ within a batch, so they travel with each agent's prompt
+        prompts = {
+            agent.agent_id: f"{agent.system_prompt}\n\n{agent_prompts[agent.agent_id]}" for agent in agents
+        }
+        # Agents whose prompts would overflow the batch's input budget go in another request
+        parts = await asyncio.gather(*(self.decide_batch(part) for part in split_batch(prompts)))
+        decisions = {agent_id: decision for part in parts for agent_id, decision in part.items()}
+
+        async def resolve(agent: Agent):
+            decision = decisions.get(agent.agent_id)
+            if decision is not None:
+                action = agent.make_action(decision)
+            else:
+                # Missing or malformed in the batch: ask for this agent alone, with the prompt it already
+                # had; observing again would find its mailbox empty
+                console.print(f"[yellow]No batched decision for {agent.agent_id}, falling back[/yellow]")
+                action = await agent.decide(agent_prompts[agent.agent_id])
+            await agent.act(action)
+
+        await asyncio.gather(*(resolve(agent) for agent in agents))
+
+    async def decide_batch(self, prompts: Dict[str, str]) -> Dict[str, AgentAction]:
+        """Send several agents' prompts in one request and split the answer by agent_id"""
+        prompt = assemble(batch_sections(prompts), budget_for("agent_batch").max_input_tokens)
+
+        backend = self.backend or get_default_backend()
+        try:
+            response = await backend.complete_tool(
+                prompt, batch_tool(list(prompts)), max_tokens=batch_output_tokens(len(prompts), backend.model),
+                prefix=[self.config.system_prompt] if self.config else None
+            )
+        except Exception as e:
+            console.print(f"[red]Batched decision failed for {len(prompts)} agents: {str(e)}[/red]")
+            return {}
+
+        decisions = {}
+        actions = response.tool_input.get("actions")
+        for value in actions if isinstance(actions, list) else ():
+            # A truncated answer still yields the agents it completed
+            if not isinstance(value, dict):
+                continue
+            try:
+                check_action(value)
+            except ValueError:
+                continue
+            agent_id = str(value.get("agent_id", ""))
+            if agent_id in prompts and agent_id not in decisions:
+                decisions[agent_id] = AgentAction.from_dict(value)
+        return decisions
+
+    def start_replay(self, ticks: int):
+        """Re-run a recorded number of ticks as fast as the replayed responses allow"""
+        self.fast_forward = True
+        self.clock.max_ticks = self.clock.tick + ticks
+
     async def stop(self):
         """Stop the world simulation"""
         console.print(f"[yellow]Stopping world {self.world_id}[/yellow]")